@@ -0,0 +1,163 @@
+import json
+import os
+import sys
+import time
+import numpy as np
+from multiply_matrices_hybrid_pro import lib
+from utils import DTYPES, matrix_from_numpy
+from typing import Dict, List, Tuple
+
+# Default location of the cache of tuned tiles, next to this module
+TILES_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tiles_cache.json")
+
+# Cache sizes in bytes assumed when sysfs is not available
+DEFAULT_CACHE_SIZES = {1: 32 * 1024, 2: 1024 * 1024, 3: 8 * 1024 * 1024}
+
+# Tile sizes tried by the autotuner: powers of two and 1.5 times powers of two
+TILE_SIZES = sorted({base * factor for base in (8, 12) for factor in (1, 2, 4, 8, 16, 32, 64, 128)})
+
+# Fraction of candidates kept after every round of successive halving
+HALVING_FACTOR = 2
+
+def read_cache_sizes(path: str = "/sys/devices/system/cpu/cpu0/cache") -> Dict[int, int]:
+    """Read the size in bytes of the data caches of a CPU from sysfs.
+
+    Args:
+        path (str): sysfs directory with one indexN entry per cache.
+
+    Returns:
+        Dict[int, int]: Size in bytes of the data (or unified) cache of every level.
+        Levels missing from sysfs keep the values of DEFAULT_CACHE_SIZES.
+    """
+    cache_sizes = dict(DEFAULT_CACHE_SIZES)
+    if not os.path.isdir(path):
+        return cache_sizes
+
+    units = {"K": 1024, "M": 1024 * 1024, "G": 1024 * 1024 * 1024}
+    for entry in sorted(os.listdir(path)):
+        try:
+            with open(os.path.join(path, entry, "type")) as f:
+                cache_type = f.read().strip()
+            with open(os.path.join(path, entry, "level")) as f:
+                level = int(f.read())
+            with open(os.path.join(path, entry, "size")) as f:
+                size = f.read().strip()
+        except (OSError, ValueError):
+            continue
+        if cache_type == "Instruction" or not size:
+            continue
+        cache_sizes[level] = int(size[:-1]) * units[size[-1]] if size[-1] in units else int(size)
+    return cache_sizes
+
+def candidate_tiles(matrix_size: int, cache_sizes: Dict[int, int], itemsize: int = 4) -> List[Tuple[int, int, int]]:
+    """Propose (L3, L2, L1) tile triples for the multi-level blocked multiplication.
+    The tiles of a level are the largest TILE_SIZES whose three blocks (of A, B
+    and C) fit in that cache, down to a quarter of that size.
+
+    Args:
+        matrix_size (int): Size of the matrix.
+        cache_sizes (Dict[int, int]): Size in bytes of the cache of every level.
+        itemsize (int): Size in bytes of an element of the matrices.
+
+    Returns:
+        List[Tuple[int, int, int]]: Candidate (l3_block, l2_block, l1_block) triples.
+    """
+    levels = {}
+    for level in (1, 2, 3):
+        bound = int((cache_sizes[level] / (3 * itemsize)) ** 0.5)
+        tiles = [tile for tile in TILE_SIZES if bound // 4 <= tile <= bound and tile < matrix_size]
+        if not tiles or bound >= matrix_size:
+            tiles.append(min(bound, matrix_size))
+        levels[level] = tiles
+
+    return [(l3, l2, l1) for l3 in levels[3] for l2 in levels[2] for l1 in levels[1] if l1 <= l2 <= l3]
+
+def time_tiles(A: np.ndarray, B: np.ndarray, tiles: Tuple[int, int, int], num_threads: int, runs: int) -> float:
+    """Best execution time in seconds of the multi-level multiplication with some tiles.
+
+    Args:
+        A (np.ndarray): First matrix.
+        B (np.ndarray): Second matrix.
+        tiles (Tuple[int, int, int]): (l3_block, l2_block, l1_block) to try.
+        num_threads (int): Number of OpenMP threads used by the C kernel.
+        runs (int): Number of runs.
+
+    Returns:
+        float: Shortest time of the runs.
+    """
+    a_c, b_c = matrix_from_numpy(A), matrix_from_numpy(B)
+    best = float("inf")
+    for _ in range(runs):
+        c_c = matrix_from_numpy(np.zeros((A.shape[0], B.shape[1]), dtype=A.dtype))
+        start = time.perf_counter()
+        lib.multilevel_mul(a_c, b_c, c_c, *tiles, num_threads)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def tune(matrix_size: int, num_threads: int = 1, cache_sizes: Dict[int, int] = None, dtype: str = "int32") -> Tuple[Tuple[int, int, int], float]:
+    """Find the best tiles for a matrix size with successive halving.
+    Every candidate is first run once; after every round only the fastest
+    1/HALVING_FACTOR of them are kept and the number of runs is doubled.
+
+    Args:
+        matrix_size (int): Size of the matrix.
+        num_threads (int): Number of OpenMP threads used by the C kernel.
+        cache_sizes (Dict[int, int]): Size in bytes of the cache of every level
+            (read from sysfs by default).
+        dtype (str): Element type of the matrices (a key of utils.DTYPES).
+
+    Returns:
+        Tuple[Tuple[int, int, int], float]: Best (l3_block, l2_block, l1_block) and its time in seconds.
+    """
+    A = np.random.randint(0, 10, size=(matrix_size, matrix_size)).astype(DTYPES[dtype][1])
+    B = np.random.randint(0, 10, size=(matrix_size, matrix_size)).astype(DTYPES[dtype][1])
+
+    candidates = candidate_tiles(matrix_size, cache_sizes or read_cache_sizes(), A.itemsize)
+    runs = 1
+    while True:
+        times = {tiles: time_tiles(A, B, tiles, num_threads, runs) for tiles in candidates}
+        candidates = sorted(candidates, key=times.get)
+        if len(candidates) == 1:
+            return candidates[0], times[candidates[0]]
+        candidates = candidates[:max(1, len(candidates) // HALVING_FACTOR)]
+        runs *= 2
+
+def get_tiles(matrix_size: int, num_threads: int = 1, dtype: str = "int32", cache_file: str = TILES_CACHE) -> Tuple[int, int, int]:
+    """Tiles for the multi-level blocked multiplication, tuning them if needed.
+    The winning tiles are stored in a JSON file keyed by matrix size, element
+    type and number of threads so later runs reuse them.
+
+    Args:
+        matrix_size (int): Size of the matrix.
+        num_threads (int): Number of OpenMP threads used by the C kernel.
+        dtype (str): Element type of the matrices (a key of utils.DTYPES).
+        cache_file (str): JSON file with the tuned tiles.
+
+    Returns:
+        Tuple[int, int, int]: (l3_block, l2_block, l1_block).
+    """
+    key = f"{matrix_size};{dtype};{num_threads}"
+    cache = {}
+    if os.path.exists(cache_file):
+        with open(cache_file) as f:
+            cache = json.load(f)
+
+    if key not in cache:
+        tiles, exec_time = tune(matrix_size, num_threads, dtype=dtype)
+        cache[key] = {"l3": tiles[0], "l2": tiles[1], "l1": tiles[2], "time": exec_time}
+        with open(cache_file, "w") as f:
+            json.dump(cache, f, indent=4, sort_keys=True)
+
+    return cache[key]["l3"], cache[key]["l2"], cache[key]["l1"]
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python autotune.py <matrix_size> [num_threads]")
+        sys.exit(1)
+
+    matrix_size = int(sys.argv[1])
+    num_threads = int(sys.argv[2]) if len(sys.argv) == 3 else 1
+
+    print(f"Cache sizes: {read_cache_sizes()}")
+    l3, l2, l1 = get_tiles(matrix_size, num_threads)
+    print(f"Tiles for {matrix_size}x{matrix_size} with {num_threads} threads: L3 {l3}, L2 {l2}, L1 {l1}")
@@ -0,0 +1,105 @@
+import json
+import math
+import os
+from typing import Dict, List, Optional, Set, Tuple
+
+# Configuration of a measurement: phase, matrix size, threads, element type,
+# algorithm and block size (or tiles), as written in the benchmark output
+Key = Tuple[int, int, int, str, str, str]
+
+class Checkpoint:
+    """Append-only JSON Lines store of the runs of a benchmark sweep.
+    Every run is written as soon as it is measured, as a line with the key of
+    its configuration, its index and its times (null for missing counters).
+    A line marking the configuration as done follows its last run. Resuming
+    reads the file back: done configurations are not measured again and the
+    runs of an interrupted one are kept. A partial last line, left by a job
+    killed while writing, is ignored and cut off before appending new runs.
+    """
+
+    def __init__(self, path: Optional[str] = None, resume: bool = False):
+        """Open the store at path (None keeps nothing), starting a new one
+        unless resume is set and the file exists."""
+        self.path = path
+        self.runs: Dict[Key, List[tuple]] = {}
+        self.done: Set[Key] = set()
+        self.file = None
+
+        if path is None:
+            return
+        if resume and os.path.exists(path):
+            self.load()
+            self.truncate_partial_line()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.file = open(path, "a" if resume else "w")
+
+    @classmethod
+    def read(cls, path: str) -> "Checkpoint":
+        """Read a store without opening it for writing, e.g. a baseline."""
+        checkpoint = cls()
+        checkpoint.path = path
+        checkpoint.load()
+        return checkpoint
+
+    def load(self) -> None:
+        """Read the runs and done configurations of the store."""
+        with open(self.path) as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                key = tuple(record["key"])
+                if record.get("done"):
+                    self.done.add(key)
+                else:
+                    self.runs.setdefault(key, []).append(
+                        tuple(math.nan if value is None else value for value in record["values"]))
+
+    def truncate_partial_line(self) -> None:
+        """Cut the store after its last complete line, so that the next record
+        does not get glued to a line left unfinished by a killed job."""
+        with open(self.path, "rb+") as file:
+            size = end = file.seek(0, os.SEEK_END)
+            while end > 0:
+                start = max(0, end - 4096)
+                file.seek(start)
+                newline = file.read(end - start).rfind(b"\n")
+                if newline >= 0:
+                    end = start + newline + 1
+                    break
+                end = start
+            if end < size:
+                file.truncate(end)
+
+    def write(self, record: dict) -> None:
+        """Append a record to the store, flushed so that a killed job keeps it."""
+        if self.file is None:
+            return
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+    def completed(self, key: Key) -> Optional[List[tuple]]:
+        """Runs of a configuration measured to the end, or None."""
+        return self.runs.get(key, []) if key in self.done else None
+
+    def record(self, key: Key, values: tuple) -> None:
+        """Store a new run of a configuration."""
+        runs = self.runs.setdefault(key, [])
+        runs.append(values)
+        self.write({"key": list(key), "run": len(runs) - 1,
+                    "values": [None if math.isnan(value) else value for value in values]})
+
+    def complete(self, key: Key) -> None:
+        """Mark a configuration as done and sync the store to disk."""
+        self.done.add(key)
+        self.write({"key": list(key), "done": True})
+        if self.file is not None:
+            os.fsync(self.file.fileno())
+
+    def close(self) -> None:
+        """Close the store."""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,85 @@
+import math
+import numpy as np
+from dataclasses import dataclass
+from typing import Callable, List, Tuple, Union
+
+# Two-sided 95% critical values of Student's t distribution by degrees of freedom
+T_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+        2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+        2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+# Critical value used beyond the table (normal approximation)
+Z_95 = 1.960
+
+@dataclass
+class Stats:
+    """Summary of the times in seconds of the runs of a measurement."""
+    runs: int
+    mean: float
+    minimum: float
+    median: float
+    p95: float
+    stddev: float
+    ci_low: float
+    ci_high: float
+
+    # Columns added by the harness to the benchmark output
+    HEADER = "Min(s);Median(s);P95(s);Stddev(s);CI95 low(s);CI95 high(s);Runs"
+
+    def columns(self) -> str:
+        """Statistics formatted as the columns of HEADER."""
+        return (f"{self.minimum:f};{self.median:f};{self.p95:f};{self.stddev:f};"
+                f"{self.ci_low:f};{self.ci_high:f};{self.runs}")
+
+def t_critical(degrees: int) -> float:
+    """Two-sided 95% critical value of Student's t distribution."""
+    return T_95[degrees - 1] if degrees <= len(T_95) else Z_95
+
+def summarize(samples: List[float]) -> Stats:
+    """Compute the statistics of a list of times in seconds."""
+    values = np.asarray(samples, dtype=np.float64)
+    mean = float(values.mean())
+    stddev = float(values.std(ddof=1)) if len(values) > 1 else 0.0
+    half_width = t_critical(len(values) - 1) * stddev / math.sqrt(len(values)) if len(values) > 1 else math.inf
+    return Stats(len(values), mean, float(values.min()), float(np.median(values)),
+                 float(np.percentile(values, 95)), stddev, mean - half_width, mean + half_width)
+
+def measure(run: Callable[[], Union[float, Tuple[float, ...]]], warmup: int = 1, min_runs: int = 5,
+            max_runs: int = 32, rel_ci: float = 0.05, key: int = 0, samples: List[tuple] = None,
+            record: Callable[[tuple], None] = None) -> List[Stats]:
+    """Run a measurement until its 95% confidence interval is tight enough.
+    The warmup runs are discarded. Afterwards the measurement is repeated at
+    least min_runs and at most max_runs times, stopping as soon as the half
+    width of the confidence interval of the mean is below rel_ci times the mean.
+    Runs kept from an interrupted measurement can be passed in samples: they
+    count towards the runs and the measurement goes on after the warmup.
+
+    Args:
+        run (Callable): Function returning one time in seconds or a tuple of
+            times (e.g. one per stage of a run).
+        warmup (int): Number of discarded runs.
+        min_runs (int): Minimum number of measured runs.
+        max_runs (int): Maximum number of measured runs.
+        rel_ci (float): Target half width of the confidence interval relative to the mean.
+        key (int): Position of the time that drives the stopping rule.
+        samples (List[tuple]): Runs measured earlier, as tuples of times.
+        record (Callable): Function called with every new run, e.g. to persist it.
+
+    Returns:
+        List[Stats]: Statistics of every time returned by run.
+    """
+    for _ in range(warmup):
+        run()
+
+    samples = list(samples or [])
+    while len(samples) < max(1, max_runs):
+        result = run()
+        samples.append(result if isinstance(result, tuple) else (result,))
+        if record is not None:
+            record(samples[-1])
+        if len(samples) >= min_runs:
+            stats = summarize([sample[key] for sample in samples])
+            if stats.ci_high - stats.mean <= rel_ci * stats.mean:
+                break
+
+    return [summarize(list(times)) for times in zip(*samples)]
@@ -1,6 +1,12 @@
-sbatch --wrap="python3 mul_benchmark.py" \
+# Runs are stored in CHECKPOINT as they finish; requeued or resubmitted jobs
+# with the same CHECKPOINT resume the sweep instead of starting it again
+CHECKPOINT=${CHECKPOINT:-logs/checkpoints/mul_benchmark_$(date +%Y-%m-%d_%H-%M-%S).jsonl}
+
+sbatch --wrap="python3 mul_benchmark.py --threads 1 2 4 8 16 --checkpoint $CHECKPOINT --resume" \
   --job-name=mul_benchmark \
   --output=logs/phase2_3/big_mul_benchmark_2_3_$(date +%Y-%m-%d_%H-%M-%S).log \
   --error=logs/phase2_3/big_mul_benchmark_2_3_error_$(date +%Y-%m-%d_%H-%M-%S).log \
   --nodes=1 \
-  --ntasks=1
+  --ntasks=1 \
+  --cpus-per-task=16 \
+  --requeue
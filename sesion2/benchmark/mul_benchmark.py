@@ -1,92 +1,506 @@
+import argparse
+import contextlib
+import math
+import os
 import time
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
 
 sys.path.append("..")
 
-from multiply_matrices import run_phase_1_row_col, run_phase_1_zorder
-from multiply_matrices_hybrid import run_phase_2_row_col, run_phase_2_zorder
-from multiply_matrices_hybrid_pro import run_phase_3_row_col, run_phase_3_zorder
-from typing import List, Dict
+from multiply_matrices import run_phase_1_row_col, run_phase_1_zorder, run_phase_1_morton
+from multiply_matrices_hybrid import run_phase_2_row_col, run_phase_2_zorder, run_phase_2_morton, run_phase_2_multilevel, run_phase_2_strassen
+from multiply_matrices_hybrid_pro import lib, run_phase_3_row_col, run_phase_3_zorder, run_phase_3_morton, run_phase_3_multilevel, run_phase_3_strassen
+from multiply_matrices_numpy import run_phase_4
+from autotune import get_tiles
+from checkpoint import Checkpoint, Key
+from harness import Stats, measure, summarize
+from planner import CostModel, Task, array_script, merge_outputs, pack, read_plan, write_plan
+from regression import compare, load_samples, report
+from utils import COUNTERS, DTYPES, STAGES, StageTimes, verification
+from typing import Any, Callable, Dict, List
 
 row_major_str = "Row-major order"
 column_major_str = "Column-major order"
+ikj_order_str = "i-k-j order"
+transposed_str = "Transposed B"
+gemm_str = "Packed GEMM"
 z_order_str = "Z order"
+morton_str = "Morton order"
+multilevel_str = "Multi-level Z order"
+strassen_str = "Strassen-Winograd"
+numpy_blas_str = "NumPy BLAS"
+numpy_row_band_str = "NumPy row bands"
+numpy_tiled_str = "NumPy tiles"
 
-def run_phase(phase_id: int, matrix_sizes: List[int], iterations: int):
-    """Runs a phase of the experiment."""
+# Non-blocked algorithms: name used in the output -> key in the results dictionary
+algorithms = {
+    "row": row_major_str,
+    "col": column_major_str,
+    "ikj": ikj_order_str,
+    "trn": transposed_str,
+    "gem": gemm_str
+}
+
+# Algorithms only implemented in C, skipped in phase 1
+c_only_algorithms = {"gem", "str"}
+
+# Blocked algorithms: name used in the output -> key in the results dictionary.
+# The block size of Strassen-Winograd is the cutoff of its recursion
+blocked_algorithms = {
+    "zor": z_order_str,
+    "mor": morton_str,
+    "str": strassen_str
+}
+
+# Smallest cutoff swept for Strassen-Winograd: below it the recursion overhead
+# dominates (the matrix size itself, a plain Z-order product, is always run)
+min_strassen_cutoff = 16
+
+# Vectorized NumPy algorithms of phase 4, non-blocked and blocked
+numpy_algorithms = {
+    "npb": numpy_blas_str
+}
+
+numpy_blocked_algorithms = {
+    "npr": numpy_row_band_str,
+    "npt": numpy_tiled_str
+}
+
+# Options of the statistical harness (see harness.measure), set from the command line
+harness_options = {"warmup": 1, "min_runs": 5, "max_runs": 32, "rel_ci": 0.05}
+
+# Store of the runs measured so far (see checkpoint.Checkpoint), set from the command line
+checkpoint = Checkpoint()
+
+# Stages reported after the statistics of the compute stage, as mean times
+reported_stages = [stage for stage in STAGES if stage != "compute"]
+stages_header = ";".join(f"{stage.replace('_', ' ').capitalize()}(s)" for stage in reported_stages)
+
+# Hardware counters of the compute stage, reported as means ('-' where unavailable)
+counters_header = "Cycles;Instructions;L1d misses;LLC misses;dTLB misses"
+
+def run_phase(phase_id: int, matrix_sizes: List[int], threads: List[int] = [1],
+              block_mode: str = "divisors", workers: int = 1, dtype: str = "int32"):
+    """Runs a phase of the experiment.
+    Phases 2 and 3 are repeated for every number of threads; phase 1 is pure
+    Python and runs with a single thread, split among worker processes when
+    workers is greater than 1 (reported in the Threads column). Phase 4 is the
+    vectorized NumPy baseline. Phases 2 to 4 multiply matrices of elements of
+    dtype; phase 1 uses Python ints (reported as '-' in the Dtype column)."""
+    print_header()
+    for task in enumerate_tasks([phase_id], matrix_sizes, threads, workers):
+        run_task(task, block_mode, dtype)
+
+def print_header():
+    """Print the header of the output."""
+    print(f"Matrix size;Block size;Phase;Algorithm;Time(s);Threads;Dtype;{Stats.HEADER};{stages_header};{counters_header}")
+
+def enumerate_tasks(phases: List[int], matrix_sizes: List[int], threads: List[int] = [1], workers: int = 1) -> List[Task]:
+    """Tasks of a sweep in the order they are run: phase, matrix size and
+    number of threads (the workers in phase 1 and a single thread in phase 4)."""
+    return [Task(phase_id, matrix_size, num_threads)
+            for phase_id in phases
+            for matrix_size in matrix_sizes
+            for num_threads in {1: [workers], 2: threads, 3: threads}.get(phase_id, [1])]
+
+def run_task(task: Task, block_mode: str = "divisors", dtype: str = "int32"):
+    """Measure and print every algorithm and block size of a task."""
+    block_sizes = calculate_block_sizes(task.matrix_size, block_mode)
     results = {}
-    
-    print("Matrix size;Block size;Phase;Algorithm;Time(s)")
-    
-    for matrix_size in matrix_sizes:
-        block_sizes = calculate_block_sizes(matrix_size)
-        initialize_results(results, matrix_size, block_sizes)
-        process_block_sizes(phase_id, matrix_size, block_sizes, iterations, results)
-        print_results(phase_id, matrix_size, iterations, results)
-
-def calculate_block_sizes(matrix_size: int) -> List[int]:
-    """Calculate the block sizes for the given matrix size."""
+    initialize_results(results, task.matrix_size)
+    process_block_sizes(task.phase, task.matrix_size, block_sizes, results, task.threads, dtype)
+    print_results(task.phase, task.matrix_size, results, task.threads, dtype)
+
+def calculate_block_sizes(matrix_size: int, block_mode: str = "divisors") -> List[int]:
+    """Calculate the block sizes for the given matrix size.
+    'divisors' uses the divisors of the matrix size; 'pow2' uses the powers of
+    two below it, which need not divide it since the kernels handle edge blocks."""
     block_sizes = []
     for block_size in range(1, matrix_size + 1):
-        if matrix_size % block_size == 0 and matrix_size // block_size >= 2:
+        if block_mode == "pow2":
+            if block_size & (block_size - 1) == 0 and block_size < matrix_size:
+                block_sizes.append(block_size)
+        elif matrix_size % block_size == 0 and matrix_size // block_size >= 2:
             block_sizes.append(block_size)
     block_sizes.append(matrix_size)
     return block_sizes
 
-def initialize_results(results: Dict[str, float], matrix_size: int, block_sizes: List[int]):
-    """Initialize the results dictionary."""
+def initialize_results(results: Dict[int, Dict[str, Any]], matrix_size: int):
+    """Initialize the results dictionary.
+    Blocked algorithms keep the statistics of every block size in a nested dictionary."""
     if matrix_size not in results:
-        results[matrix_size] = {
-            row_major_str: 0.0,
-            column_major_str: 0.0,
-            z_order_str: {block_size: 0 for block_size in block_sizes}
-        }
-
-def process_block_sizes(phase_id: int, matrix_size: int, block_sizes: List[int], iterations: int, results: Dict[str, float]):
-    """Process the block sizes for the given matrix size."""
-    for _ in range(iterations):
+        results[matrix_size] = {}
+        for algorithm_str in list(blocked_algorithms.values()) + list(numpy_blocked_algorithms.values()):
+            results[matrix_size][algorithm_str] = {}
+
+def config_key(phase_id: int, matrix_size: int, num_threads: int, dtype: str, algorithm: str, block: Any = "-") -> Key:
+    """Key of a configuration in the checkpoint, with the values of the output columns."""
+    return (phase_id, matrix_size, num_threads, "-" if phase_id == 1 else dtype, algorithm, str(block))
+
+def measure_stages(run: Callable[[], StageTimes], key: Key) -> Dict[str, Stats]:
+    """Measure a run_phase_* function with the harness, stopping on its compute time.
+    Hardware counters missing from a run (pure Python phases, containers) are NaN.
+    Every call is a new configuration for the verification policy. Runs are
+    stored in the checkpoint as they finish; a configuration already done
+    there is summarized from its stored runs instead of being measured."""
+    runs = checkpoint.completed(key)
+    if runs is not None:
+        return dict(zip(STAGES + COUNTERS, [summarize(list(times)) for times in zip(*runs)]))
+
+    verification.new_configuration()
+
+    def sample() -> tuple:
+        times = run()
+        return (tuple(getattr(times, stage) for stage in STAGES) +
+                tuple(float(times.counters.get(counter, "nan")) for counter in COUNTERS))
+
+    stats = measure(sample, key=STAGES.index("compute"), samples=checkpoint.runs.get(key),
+                    record=lambda values: checkpoint.record(key, values), **harness_options)
+    checkpoint.complete(key)
+    return dict(zip(STAGES + COUNTERS, stats))
+
+def process_block_sizes(phase_id: int, matrix_size: int, block_sizes: List[int],
+                        results: Dict[int, Dict[str, Any]], num_threads: int = 1, dtype: str = "int32"):
+    """Process the block sizes for the given matrix size.
+    Every algorithm and block size is measured stage by stage with the statistical harness."""
+    if phase_id == 4:
+        process_numpy(matrix_size, block_sizes, results, dtype)
+        return
+
+    for algorithm, algorithm_str in algorithms.items():
+        if phase_id == 1 and algorithm in c_only_algorithms:
+            continue
         if phase_id == 1:
-            row_time, col_time = run_phase_1_row_col(matrix_size)
+            run = lambda: run_phase_1_row_col(matrix_size, algorithm, num_threads)
         elif phase_id == 2:
-            row_time = run_phase_2_row_col(matrix_size, "row")
-            col_time = run_phase_2_row_col(matrix_size, "col")
+            run = lambda: run_phase_2_row_col(matrix_size, algorithm, num_threads=num_threads, dtype=dtype)
         else:
-            row_time = run_phase_3_row_col(matrix_size, "row")
-            col_time = run_phase_3_row_col(matrix_size, "col")
-        
-        results[matrix_size][row_major_str] += row_time
-        results[matrix_size][column_major_str] += col_time
-        for block_size in block_sizes:
-            if phase_id == 1:
-                zorder_time = run_phase_1_zorder(matrix_size, block_size)
-            elif phase_id == 2:
-                zorder_time = run_phase_2_zorder(matrix_size, block_size)
+            run = lambda: run_phase_3_row_col(matrix_size, algorithm, num_threads, dtype=dtype)
+        results[matrix_size][algorithm_str] = measure_stages(
+            run, config_key(phase_id, matrix_size, num_threads, dtype, algorithm))
+
+    for block_size in block_sizes:
+        if phase_id == 1:
+            run = lambda: run_phase_1_zorder(matrix_size, block_size, num_threads)
+        elif phase_id == 2:
+            run = lambda: run_phase_2_zorder(matrix_size, block_size, num_threads=num_threads, dtype=dtype)
+        else:
+            run = lambda: run_phase_3_zorder(matrix_size, block_size, num_threads, dtype=dtype)
+        results[matrix_size][z_order_str][block_size] = measure_stages(
+            run, config_key(phase_id, matrix_size, num_threads, dtype, "zor", block_size))
+
+        # Phase 1 converts to and from Z order in this process, without workers
+        if phase_id == 1:
+            run = lambda: run_phase_1_morton(matrix_size, block_size)
+        elif phase_id == 2:
+            run = lambda: run_phase_2_morton(matrix_size, block_size, num_threads=num_threads, dtype=dtype)
+        else:
+            run = lambda: run_phase_3_morton(matrix_size, block_size, num_threads, dtype=dtype)
+        results[matrix_size][morton_str][block_size] = measure_stages(
+            run, config_key(phase_id, matrix_size, 1 if phase_id == 1 else num_threads, dtype, "mor", block_size))
+
+        if phase_id != 1 and (block_size >= min_strassen_cutoff or block_size == matrix_size):
+            if phase_id == 2:
+                run = lambda: run_phase_2_strassen(matrix_size, block_size, num_threads=num_threads, dtype=dtype)
             else:
-                zorder_time = run_phase_3_zorder(matrix_size, block_size)
-            results[matrix_size][z_order_str][block_size] += zorder_time
+                run = lambda: run_phase_3_strassen(matrix_size, block_size, num_threads, dtype=dtype)
+            results[matrix_size][strassen_str][block_size] = measure_stages(
+                run, config_key(phase_id, matrix_size, num_threads, dtype, "str", block_size))
 
-def print_results(phase_id: int, matrix_size: int, iterations: int, results: Dict[str, float]):
-    """Print the results stored in the dictionary."""
-    row_major_avg = results[matrix_size][row_major_str] / iterations
-    column_major_avg = results[matrix_size][column_major_str] / iterations
-    
-    print(f"{matrix_size};-;{phase_id};row;{row_major_avg:f}")
-    print(f"{matrix_size};-;{phase_id};col;{column_major_avg:f}")
+    # The multi-level variant uses the tiles of the autotuner instead of sweeping block sizes
+    if phase_id != 1:
+        tiles = get_tiles(matrix_size, num_threads, dtype)
+        if phase_id == 2:
+            run = lambda: run_phase_2_multilevel(matrix_size, tiles, num_threads=num_threads, dtype=dtype)
+        else:
+            run = lambda: run_phase_3_multilevel(matrix_size, tiles, num_threads, dtype=dtype)
+        results[matrix_size][multilevel_str] = measure_stages(
+            run, config_key(phase_id, matrix_size, num_threads, dtype, "mlz", "/".join(map(str, tiles))))
+
+def process_numpy(matrix_size: int, block_sizes: List[int], results: Dict[int, Dict[str, Any]], dtype: str = "int32"):
+    """Process the NumPy algorithms of phase 4 for the given matrix size."""
+    for algorithm, algorithm_str in numpy_algorithms.items():
+        results[matrix_size][algorithm_str] = measure_stages(
+            lambda: run_phase_4(matrix_size, algorithm, dtype=dtype), config_key(4, matrix_size, 1, dtype, algorithm))
+
+    for block_size in block_sizes:
+        for algorithm, algorithm_str in numpy_blocked_algorithms.items():
+            results[matrix_size][algorithm_str][block_size] = measure_stages(
+                lambda: run_phase_4(matrix_size, algorithm, block_size, dtype=dtype),
+                config_key(4, matrix_size, 1, dtype, algorithm, block_size))
+
+def format_stages(stages: Dict[str, Stats], num_threads: int, dtype: str) -> str:
+    """Output columns from Time(s) on: mean compute time, threads, element type,
+    statistics of the compute time, mean time of the other stages and mean counters."""
+    compute = stages["compute"]
+    other_stages = ";".join(f"{stages[stage].mean:f}" for stage in reported_stages)
+    counters = ";".join("-" if math.isnan(stages[counter].mean) else f"{stages[counter].mean:.0f}" for counter in COUNTERS)
+    return f"{compute.mean:f};{num_threads};{dtype};{compute.columns()};{other_stages};{counters}"
+
+def print_results(phase_id: int, matrix_size: int, results: Dict[int, Dict[str, Any]], num_threads: int = 1,
+                  dtype: str = "int32"):
+    """Print the results stored in the dictionary.
+    Time(s) is the mean compute time of the runs, followed by the columns of
+    the harness and the mean time of the other stages."""
+    if phase_id == 1:
+        dtype = "-"
+
+    if phase_id == 4:
+        non_blocked, blocked = numpy_algorithms, numpy_blocked_algorithms
+    else:
+        non_blocked, blocked = algorithms, blocked_algorithms
+
+    for algorithm, algorithm_str in non_blocked.items():
+        if phase_id == 1 and algorithm in c_only_algorithms:
+            continue
+        columns = format_stages(results[matrix_size][algorithm_str], num_threads, dtype)
+        print(f"{matrix_size};-;{phase_id};{algorithm};{columns}")
+
+    for algorithm, algorithm_str in blocked.items():
+        threads = 1 if phase_id == 1 and algorithm == "mor" else num_threads
+        for block_size, stages in results[matrix_size][algorithm_str].items():
+            columns = format_stages(stages, threads, dtype)
+            print(f"{matrix_size};{block_size};{phase_id};{algorithm};{columns}")
+
+    if phase_id in (2, 3):
+        tiles = "/".join(map(str, get_tiles(matrix_size, num_threads, dtype)))
+        columns = format_stages(results[matrix_size][multilevel_str], num_threads, dtype)
+        print(f"{matrix_size};{tiles};{phase_id};mlz;{columns}")
+
+def task_configurations(task: Task, block_mode: str = "divisors") -> List[int]:
+    """Block size of every measurement of a task (0 for non-blocked algorithms)."""
+    block_sizes = calculate_block_sizes(task.matrix_size, block_mode)
+    if task.phase == 1:
+        return [0] * len(set(algorithms) - c_only_algorithms) + block_sizes * 2
+    if task.phase == 4:
+        return [0] * len(numpy_algorithms) + block_sizes * len(numpy_blocked_algorithms)
+    cutoffs = [block_size for block_size in block_sizes
+               if block_size >= min_strassen_cutoff or block_size == task.matrix_size]
+    return [0] * (len(algorithms) + 1) + block_sizes * 2 + cutoffs
+
+# Matrix sizes and block size timed to calibrate the cost model of every phase
+calibration_sizes = {1: (8, 48), 2: (8, 192), 3: (8, 192), 4: (8, 192)}
+calibration_block_size = 4
+
+def calibrate(dtype: str = "int32") -> Dict[int, CostModel]:
+    """Fit the cost model of every phase to runs of its row-major (phase 4:
+    BLAS) multiplication for the calibration sizes and a run of its Z-order
+    (phase 4: tiled) multiplication with small blocks, each timed after a
+    discarded run."""
+    runners = {
+        1: (lambda n: run_phase_1_row_col(n, "row"), lambda n, b: run_phase_1_zorder(n, b)),
+        2: (lambda n: run_phase_2_row_col(n, "row", dtype=dtype), lambda n, b: run_phase_2_zorder(n, b, dtype=dtype)),
+        3: (lambda n: run_phase_3_row_col(n, "row", dtype=dtype), lambda n, b: run_phase_3_zorder(n, b, dtype=dtype)),
+        4: (lambda n: run_phase_4(n, "npb", dtype=dtype), lambda n, b: run_phase_4(n, "npt", b, dtype=dtype)),
+    }
+
+    def seconds(run: Callable[[], Any]) -> float:
+        run()
+        start = time.perf_counter()
+        run()
+        return time.perf_counter() - start
+
+    models = {}
+    for phase_id, (run, run_blocked) in runners.items():
+        timings = [(n, seconds(lambda: run(n))) for n in calibration_sizes[phase_id]]
+        n = calibration_sizes[phase_id][-1]
+        blocked = (n, calibration_block_size, seconds(lambda: run_blocked(n, calibration_block_size)))
+        models[phase_id] = CostModel.fit(*timings, blocked)
+    return models
+
+def estimate_costs(tasks: List[Task], models: Dict[int, CostModel], block_mode: str = "divisors") -> Dict[Task, float]:
+    """Estimated time in seconds of every task: its measurements, each taking
+    the warmup and minimum runs of the harness."""
+    runs = harness_options["warmup"] + harness_options["min_runs"]
+    return {task: runs * sum(models[task.phase].run_time(task.matrix_size, task.threads, block_size)
+                             for block_size in task_configurations(task, block_mode))
+            for task in tasks}
 
-    for block_size, time in results[matrix_size][z_order_str].items():
-        zorder_avg = time / iterations
-        print(f"{matrix_size};{block_size};{phase_id};zor;{zorder_avg:f}")
+def run_shard(tasks: List[Task], block_mode: str = "divisors", dtype: str = "int32"):
+    """Run the tasks of a shard, printing a single header."""
+    print_header()
+    for task in tasks:
+        run_task(task, block_mode, dtype)
+
+def run_shard_to_file(tasks: List[Task], output: str, checkpoint_path: str, resume: bool,
+                      block_mode: str = "divisors", dtype: str = "int32"):
+    """Run a shard in a worker process, writing its output to a file and its
+    runs to a checkpoint of its own."""
+    global checkpoint
+    checkpoint = Checkpoint(checkpoint_path, resume)
+    with open(output, "w") as file, contextlib.redirect_stdout(file):
+        run_shard(tasks, block_mode, dtype)
+    checkpoint.close()
+
+def run_local(shards: List[List[Task]], log_dir: str, resume: bool = False,
+              block_mode: str = "divisors", dtype: str = "int32") -> List[str]:
+    """Run the shards of a plan concurrently in a local process pool, with the
+    same outputs and checkpoints as the tasks of the Slurm job array.
+    Shards compete for the CPUs, so the times are only comparable with a CPU
+    per shard and thread.
+
+    Returns:
+        List[str]: Paths of the outputs of the shards.
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    outputs = [os.path.join(log_dir, f"shard_{shard}.log") for shard in range(len(shards))]
+    with ProcessPoolExecutor(max_workers=len(shards), mp_context=get_context("fork")) as executor:
+        futures = [executor.submit(run_shard_to_file, tasks, outputs[shard],
+                                   os.path.join(log_dir, f"shard_{shard}.jsonl"), resume, block_mode, dtype)
+                   for shard, tasks in enumerate(shards)]
+        for future in futures:
+            future.result()
+    return outputs
+
+def shard_arguments(args: argparse.Namespace) -> List[str]:
+    """Command line options shared by every shard of a plan (the tasks carry
+    the phases, matrix sizes and numbers of threads)."""
+    arguments = ["--block-sizes", args.block_sizes, "--warmup", str(args.warmup),
+                 "--min-runs", str(args.min_runs), "--max-runs", str(args.max_runs),
+                 "--rel-ci", str(args.rel_ci), "--dtype", args.dtype, "--verify", args.verify,
+                 "--trials", str(args.trials), "--pool-mb", str(args.pool_mb)]
+    if args.verify_first:
+        arguments.append("--verify-first")
+    if args.no_huge_pages:
+        arguments.append("--no-huge-pages")
+    return arguments
 
 if __name__ == "__main__":
-    matrix_sizes = [2, 4, 8, 16, 32, 64, 128, 256, 398, 512, 636, 774, 892, 1024, 1152, 1280, 1408, 1536]
-    iterations = 32
-    
-    start = time.time()
-    run_phase(1, matrix_sizes, iterations)
-    run_phase(2, matrix_sizes, iterations)
-    run_phase(3, matrix_sizes, iterations)
-    end = time.time()
-    
-    print(f"\nTotal execution time: {end - start:f} seconds")
-    print(f"\nIterations: {iterations}")
-    print("Benchmark completed.")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Matrix multiplication benchmark.")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1],
+                        help="Numbers of threads to sweep in phases 2 and 3 (default: 1)")
+    parser.add_argument("--block-sizes", choices=["divisors", "pow2"], default="divisors",
+                        help="Block sizes to sweep: divisors of the matrix size or powers of two (default: divisors)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes for the non-blocked and Z order runs of phase 1 (default: 1)")
+    parser.add_argument("--warmup", type=int, default=harness_options["warmup"],
+                        help="Discarded runs before every measurement (default: %(default)s)")
+    parser.add_argument("--min-runs", type=int, default=harness_options["min_runs"],
+                        help="Minimum measured runs (default: %(default)s)")
+    parser.add_argument("--max-runs", type=int, default=harness_options["max_runs"],
+                        help="Maximum measured runs (default: %(default)s)")
+    parser.add_argument("--rel-ci", type=float, default=harness_options["rel_ci"],
+                        help="Stop when the 95%% confidence interval is within this fraction of the mean (default: %(default)s)")
+    parser.add_argument("--dtype", choices=list(DTYPES), default="int32",
+                        help="Element type of the matrices of phases 2 to 4 (default: %(default)s)")
+    parser.add_argument("--verify", choices=["freivalds", "exact"], default=verification.method,
+                        help="Check products with Freivalds' algorithm or against the full product (default: %(default)s)")
+    parser.add_argument("--trials", type=int, default=verification.trials,
+                        help="Freivalds trials per product, each halving the chance of missing an error (default: %(default)s)")
+    parser.add_argument("--verify-first", action="store_true",
+                        help="Only verify the first run of every algorithm, block size and number of threads")
+    parser.add_argument("--pool-mb", type=int, default=1024,
+                        help="MiB of buffers the C library keeps for reuse across calls, 0 to disable (default: %(default)s)")
+    parser.add_argument("--no-huge-pages", action="store_true",
+                        help="Do not back large buffers of the C library with transparent huge pages")
+    parser.add_argument("--checkpoint", default="checkpoint.jsonl",
+                        help="JSON Lines file where every run is stored as it finishes (default: %(default)s)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Keep the runs of the checkpoint and skip the configurations it completed")
+    parser.add_argument("--phases", type=int, nargs="+", choices=[1, 2, 3, 4], default=[1, 2, 3, 4],
+                        help="Phases to run (default: all)")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[2, 4, 8, 16, 32, 64, 128, 256, 398, 512, 636, 774, 892, 1024, 1152, 1280, 1408, 1536],
+                        help="Matrix sizes to sweep (default: 2 to 1536)")
+    parser.add_argument("--plan", metavar="PLAN",
+                        help="Plan file of a sharded sweep: written with --shards, run with --shard")
+    parser.add_argument("--shards", type=int,
+                        help="Split the sweep into this many balanced shards, writing the plan and a Slurm job array script")
+    parser.add_argument("--shard", type=int,
+                        help="Run this shard of the plan (the index of the job array task)")
+    parser.add_argument("--local", type=int, metavar="SHARDS",
+                        help="Split the sweep into this many shards and run them in a local process pool")
+    parser.add_argument("--log-dir", default="logs/shards",
+                        help="Directory of the outputs and checkpoints of the shards (default: %(default)s)")
+    parser.add_argument("--merge", nargs="+", metavar="LOG",
+                        help="Merge the outputs of the shards of a sweep and exit")
+    parser.add_argument("--compare", nargs="+", metavar="BASELINE",
+                        help="Checkpoints of a baseline sweep: compare the runs of this sweep with them and "
+                             "exit with status 1 if any configuration got significantly slower")
+    parser.add_argument("--candidate", nargs="+", metavar="CHECKPOINT",
+                        help="Compare these checkpoints with the baseline instead of running a sweep")
+    parser.add_argument("--alpha", type=float, default=0.05,
+                        help="False discovery rate of the comparison (default: %(default)s); "
+                             "with many configurations, more runs (--min-runs) are needed to detect changes")
+    parser.add_argument("--threshold", type=float, default=0.05,
+                        help="Smallest relative change of the median compute time reported (default: %(default)s)")
+    parser.add_argument("--min-difference", type=float, default=1e-4,
+                        help="Smallest absolute change in seconds of the median compute time reported (default: %(default)s)")
+    args = parser.parse_args()
+    if args.shard is not None and not args.plan:
+        parser.error("--shard requires --plan")
+
+    def check_regressions(candidates: List[str]):
+        """Compare the compute times of candidates with the baseline and exit, failing on regressions."""
+        compute = STAGES.index("compute")
+        comparisons = compare(load_samples(args.compare, compute), load_samples(candidates, compute),
+                              args.alpha, args.threshold, args.min_difference, args.min_runs)
+        regressions, _ = report(comparisons)
+        sys.exit(1 if regressions else 0)
+
+    if args.merge:
+        print("\n".join(merge_outputs(args.merge)))
+        sys.exit(0)
+
+    if args.compare and args.candidate:
+        check_regressions(args.candidate)
+
+    harness_options.update(warmup=args.warmup, min_runs=args.min_runs, max_runs=args.max_runs, rel_ci=args.rel_ci)
+    verification.method, verification.trials, verification.first_only = args.verify, args.trials, args.verify_first
+    lib.configure_matrix_pool(args.pool_mb << 20, not args.no_huge_pages)
+
+    tasks = enumerate_tasks(sorted(args.phases), args.sizes, args.threads, args.workers)
+
+    if args.shards or args.local:
+        # Plan a sharded sweep with the cost model calibrated on this machine
+        costs = estimate_costs(tasks, calibrate(args.dtype), args.block_sizes)
+        shards = pack(costs, args.shards or args.local)
+        for shard, shard_tasks in enumerate(shards):
+            print(f"Shard {shard}: {len(shard_tasks)} tasks, {sum(costs[task] for task in shard_tasks):f} s estimated",
+                  file=sys.stderr)
+
+    if args.shards:
+        plan = args.plan or "plan.json"
+        os.makedirs(args.log_dir, exist_ok=True)
+        write_plan(plan, shards, costs, shard_arguments(args))
+        script = os.path.splitext(plan)[0] + ".sh"
+        with open(script, "w") as file:
+            file.write(array_script(plan, len(shards), shard_arguments(args), args.log_dir,
+                                    max(args.threads + [args.workers])))
+        print(f"Plan written to {plan}; submit the job array with: sbatch {script}")
+        sys.exit(0)
+
+    start = time.perf_counter_ns()
+    if args.shard is not None:
+        shards = read_plan(args.plan)[0]
+        if not 0 <= args.shard < len(shards):
+            parser.error(f"--shard must be between 0 and {len(shards) - 1} for {args.plan}")
+        checkpoint = Checkpoint(args.checkpoint, args.resume)
+        run_shard(shards[args.shard], args.block_sizes, args.dtype)
+        checkpoint.close()
+    elif args.local:
+        outputs = run_local(shards, args.log_dir, args.resume, args.block_sizes, args.dtype)
+        print("\n".join(merge_outputs(outputs)))
+    else:
+        checkpoint = Checkpoint(args.checkpoint, args.resume)
+        for phase_id in sorted(args.phases):
+            run_phase(phase_id, args.sizes, args.threads, args.block_sizes, args.workers, args.dtype)
+        checkpoint.close()
+    end = time.perf_counter_ns()
+
+    print(f"\nTotal execution time: {(end - start) / 1e9:f} seconds")
+    print(f"\nRuns: {args.min_runs}-{args.max_runs} (warmup {args.warmup}, CI within {args.rel_ci:.0%} of the mean)")
+    print(f"\nThreads: {' '.join(map(str, args.threads))}")
+    print(f"\nElement type: {args.dtype}")
+    print(f"\nBuffer pool: {args.pool_mb} MiB{'' if args.no_huge_pages else ', huge pages'}")
+    print(f"\nVerification: {args.verify}{f' ({args.trials} trials)' if args.verify == 'freivalds' else ''}"
+          f"{', first run only' if args.verify_first else ''}")
+    print("Benchmark completed.")
+
+    if args.compare:
+        print()
+        if args.local:
+            check_regressions([os.path.join(args.log_dir, f"shard_{shard}.jsonl") for shard in range(len(shards))])
+        check_regressions([args.checkpoint])
@@ -0,0 +1,121 @@
+import heapq
+import json
+import shlex
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterable, List, Tuple
+
+@dataclass(frozen=True)
+class Task:
+    """Unit of work of a sharded sweep: every algorithm and block size of a
+    phase for a matrix size and number of threads (workers in phase 1)."""
+    phase: int
+    matrix_size: int
+    threads: int
+
+@dataclass
+class CostModel:
+    """Time in seconds of a run of a phase: overhead + scale * n^3 / threads,
+    plus block_overhead for each of the (n / b)^3 block products of a
+    blocked algorithm with block size b (loop and call overheads that
+    dominate for small blocks)."""
+    overhead: float
+    scale: float
+    block_overhead: float = 0.0
+
+    def run_time(self, matrix_size: int, threads: int = 1, block_size: int = 0) -> float:
+        """Estimated time in seconds of a run of a matrix size (block_size 0: non-blocked)."""
+        blocks = -(-matrix_size // block_size) ** 3 if block_size > 0 else 0
+        return self.overhead + (self.scale * matrix_size ** 3 + self.block_overhead * blocks) / max(1, threads)
+
+    @staticmethod
+    def fit(small: Tuple[int, float], large: Tuple[int, float], blocked: Tuple[int, int, float] = None) -> "CostModel":
+        """Fit the model to the times of a run of a small and a larger matrix
+        size and, optionally, of a blocked run (matrix size, block size, time)."""
+        (n_small, t_small), (n_large, t_large) = small, large
+        scale = max(0.0, (t_large - t_small) / (n_large ** 3 - n_small ** 3))
+        model = CostModel(max(0.0, t_small - scale * n_small ** 3), scale)
+        if blocked is not None:
+            matrix_size, block_size, seconds = blocked
+            model.block_overhead = max(0.0, (seconds - model.run_time(matrix_size)) / -(-matrix_size // block_size) ** 3)
+        return model
+
+def pack(costs: Dict[Task, float], shards: int) -> List[List[Task]]:
+    """Split tasks into balanced shards, assigning the most expensive tasks
+    first to the least loaded shard (longest processing time first).
+    Every shard keeps its tasks in the order of the sweep."""
+    heap = [(0.0, shard) for shard in range(max(1, shards))]
+    assigned: List[List[Task]] = [[] for _ in heap]
+    for task in sorted(costs, key=costs.get, reverse=True):
+        load, shard = heapq.heappop(heap)
+        assigned[shard].append(task)
+        heapq.heappush(heap, (load + costs[task], shard))
+
+    order = {task: index for index, task in enumerate(costs)}
+    return [sorted(tasks, key=order.get) for tasks in assigned if tasks]
+
+def write_plan(path: str, shards: List[List[Task]], costs: Dict[Task, float], arguments: List[str]) -> None:
+    """Write a plan: the tasks of every shard with their estimated cost in
+    seconds, and the benchmark options shared by all the shards."""
+    plan = {
+        "arguments": arguments,
+        "shards": [[dict(asdict(task), cost=costs[task]) for task in tasks] for tasks in shards],
+    }
+    with open(path, "w") as file:
+        json.dump(plan, file, indent=1)
+
+def read_plan(path: str) -> Tuple[List[List[Task]], List[str]]:
+    """Read the shards and benchmark options of a plan."""
+    with open(path) as file:
+        plan = json.load(file)
+    shards = [[Task(entry["phase"], entry["matrix_size"], entry["threads"]) for entry in tasks]
+              for tasks in plan["shards"]]
+    return shards, plan["arguments"]
+
+def array_script(plan_path: str, shards: int, arguments: List[str], log_dir: str, cpus: int) -> str:
+    """Slurm script running every shard of a plan as a task of a job array.
+    Each task writes its output to log_dir/shard_<index>.log and its runs to
+    a checkpoint of its own, so requeued tasks resume where they stopped."""
+    command = " ".join(["python3 mul_benchmark.py"] + [shlex.quote(argument) for argument in arguments] +
+                       ["--plan", shlex.quote(plan_path), "--shard", "$SLURM_ARRAY_TASK_ID",
+                        "--checkpoint", shlex.quote(log_dir) + "/shard_${SLURM_ARRAY_TASK_ID}.jsonl", "--resume"])
+    return "\n".join([
+        "#!/bin/bash",
+        "#SBATCH --job-name=mul_benchmark",
+        f"#SBATCH --array=0-{shards - 1}",
+        f"#SBATCH --output={log_dir}/shard_%a.log",
+        f"#SBATCH --error={log_dir}/shard_%a_error.log",
+        "#SBATCH --nodes=1",
+        "#SBATCH --ntasks=1",
+        f"#SBATCH --cpus-per-task={cpus}",
+        "#SBATCH --requeue",
+        "",
+        "# Submit with: sbatch <this script>. When every task has finished, merge the shards with:",
+        f"#   python3 mul_benchmark.py --merge {log_dir}/shard_*.log > mul_benchmark.log",
+        command,
+        "",
+    ])
+
+def merge_outputs(paths: Iterable[str]) -> List[str]:
+    """Merge the outputs of the shards of a sweep into the output of a single run:
+    the rows of every phase under its header, sorted by matrix size and threads.
+    The rows of a task keep their order; summary lines of the shards are dropped."""
+    header = None
+    rows = []
+    for path in paths:
+        with open(path) as file:
+            for line in file:
+                line = line.rstrip("\n")
+                if line.startswith("Matrix size;"):
+                    header = line
+                elif line.count(";") >= 5:
+                    fields = line.split(";")
+                    rows.append(((int(fields[2]), int(fields[0]), int(fields[5])), line))
+
+    lines = []
+    phase = None
+    for key, line in sorted(rows, key=lambda row: row[0]):
+        if key[0] != phase:
+            phase = key[0]
+            lines.append(header)
+        lines.append(line)
+    return lines
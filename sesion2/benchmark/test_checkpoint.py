@@ -0,0 +1,38 @@
+import json
+from checkpoint import Checkpoint
+
+KEY = (2, 64, 1, "int32", "zor", "16")
+
+def test_resume_after_partial_line(tmp_path):
+    """A run written after resuming from a killed write is not lost."""
+    path = str(tmp_path / "checkpoint.jsonl")
+    checkpoint = Checkpoint(path)
+    for run in range(3):
+        checkpoint.record(KEY, (float(run), float("nan")))
+    checkpoint.close()
+
+    # The job is killed in the middle of the fourth run
+    with open(path, "a") as file:
+        file.write(json.dumps({"key": list(KEY), "run": 3, "values": [3.0, None]})[:20])
+
+    checkpoint = Checkpoint(path, resume=True)
+    assert len(checkpoint.runs[KEY]) == 3
+    checkpoint.record(KEY, (3.0, float("nan")))
+    checkpoint.complete(KEY)
+    checkpoint.close()
+
+    resumed = Checkpoint.read(path)
+    assert [run[0] for run in resumed.runs[KEY]] == [0.0, 1.0, 2.0, 3.0]
+    assert resumed.completed(KEY) is not None
+
+def test_resume_without_partial_line(tmp_path):
+    """Resuming a cleanly closed store keeps every line."""
+    path = str(tmp_path / "checkpoint.jsonl")
+    checkpoint = Checkpoint(path)
+    checkpoint.record(KEY, (1.0,))
+    checkpoint.close()
+    size = (tmp_path / "checkpoint.jsonl").stat().st_size
+
+    Checkpoint(path, resume=True).close()
+    assert (tmp_path / "checkpoint.jsonl").stat().st_size == size
+    assert Checkpoint.read(path).runs[KEY] == [(1.0,)]
@@ -1,130 +1,1858 @@
+#ifdef __linux__
+#define _GNU_SOURCE /* syscall() */
+#endif
+
+#include <stdint.h>
 #include <stdio.h>
 #include <stdlib.h>
+#include <string.h>
 #include <time.h>
 
+#include <fcntl.h>
+#include <pthread.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+#ifdef __linux__
+#include <linux/perf_event.h>
+#include <sys/ioctl.h>
+#include <sys/syscall.h>
+#endif
+
+#ifdef _OPENMP
+#include <omp.h>
+#define THREAD_NUM() omp_get_thread_num()
+#else
+#define THREAD_NUM() 0
+#endif
+
+/* Element types of the matrices (also stored in the matrix files) */
+#define MATRIX_DTYPE_INT32 0
+#define MATRIX_DTYPE_INT64 1
+#define MATRIX_DTYPE_FLOAT32 2
+#define MATRIX_DTYPE_FLOAT64 3
+
+/*
+ * Applies X(code, C type, suffix) to every element type. The kernels are
+ * written once as macros and instantiated for every type with it, e.g.
+ * row_major_mul_int32 ... row_major_mul_float64.
+ */
+#define FOR_EACH_DTYPE(X)                   \
+    X(MATRIX_DTYPE_INT32, int32_t, int32)   \
+    X(MATRIX_DTYPE_INT64, int64_t, int64)   \
+    X(MATRIX_DTYPE_FLOAT32, float, float32) \
+    X(MATRIX_DTYPE_FLOAT64, double, float64)
+
+/**
+ * Matrix stored as a single contiguous row-major buffer.
+ * Element (i, j) lives at data[i * stride + j], so stride >= columns.
+ */
+typedef struct
+{
+    int rows;    /* Number of rows */
+    int columns; /* Number of columns */
+    int stride;  /* Distance in elements between two consecutive rows */
+    int dtype;   /* Element type (MATRIX_DTYPE_*) */
+    void *data;  /* Row-major buffer of rows * stride elements */
+} Matrix;
+
+/* Offset of element (i, j) in a row-major buffer with leading dimension ld */
+#define IDX(i, j, ld) ((size_t)(i) * (ld) + (j))
+
+#define MIN(a, b) ((a) < (b) ? (a) : (b))
+#define MAX(a, b) ((a) > (b) ? (a) : (b))
+
+/* Status codes returned by the multiplication functions */
+#define MUL_OK 0
+#define MUL_ERROR_DIMENSIONS 1 /* A is not M x K, B is not K x N or C is not M x N */
+#define MUL_ERROR_BLOCK_SIZE 2 /* Invalid block or tile size */
+#define MUL_ERROR_MEMORY 3     /* Out of memory */
+#define MUL_ERROR_FILE 4       /* Matrix file missing, unreadable or malformed */
+#define MUL_ERROR_DTYPE 5      /* Unknown or mismatched element types */
+
+/* Recursion levels of morton_mul that still spawn OpenMP tasks */
+#define MORTON_TASK_DEPTH 3
+
+/* Block size of the zorder_mul leaves of strassen_mul (smaller cutoffs are used as they are) */
+#define STRASSEN_LEAF_BLOCK 64
+
+/* Register blocking of the gemm_mul micro-kernel (MR x NR accumulators) */
+#define GEMM_MR 6
+#define GEMM_NR 16
+
+/* Cache blocking of gemm_mul: MC x KC panels of A, KC x NC panels of B */
+#define GEMM_MC 120
+#define GEMM_KC 256
+#define GEMM_NC 2048
+
+/* Alignment in bytes of the buffers of the pool (one cache line) */
+#define MATRIX_POOL_ALIGNMENT 64
+
+/* Number of buffers tracked by the pool and default size in bytes of the cached ones */
+#define MATRIX_POOL_SLOTS 64
+#define MATRIX_POOL_MAX_BYTES ((size_t)1 << 30)
+
+/* Size in bytes of a transparent huge page (x86-64 and most 64-bit Linux systems) */
+#define HUGE_PAGE_SIZE ((size_t)2 << 20)
+
+/* Magic number and version of the matrix files */
+#define MATRIX_FILE_MAGIC "CAPMATRX"
+#define MATRIX_FILE_VERSION 1
+
+/* Size in bytes of the header of the matrix files (the data follows it, aligned) */
+#define MATRIX_FILE_HEADER 64
+
+/* Layouts of the matrix files */
+#define MATRIX_LAYOUT_ROW_MAJOR 0 /* Rows one after another */
+#define MATRIX_LAYOUT_TILED 1     /* Row-major grid of row-major tiles, edge tiles padded with zeros */
+
+/**
+ * Header of a matrix file, stored little-endian at the start of the file.
+ * Mirrored by matrix_file.HEADER in Python.
+ */
+typedef struct
+{
+    char magic[8];      /* MATRIX_FILE_MAGIC, not NUL-terminated */
+    uint32_t version;   /* MATRIX_FILE_VERSION */
+    uint32_t dtype;     /* Element type (MATRIX_DTYPE_*) */
+    int32_t rows;       /* Number of rows */
+    int32_t columns;    /* Number of columns */
+    int32_t tile_size;  /* Side of the tiles (0 in row-major layout) */
+    int32_t layout;     /* MATRIX_LAYOUT_* */
+    char reserved[MATRIX_FILE_HEADER - 32];
+} MatrixFileHeader;
+
+/**
+ * Matrix file mapped in memory with mmap.
+ */
+typedef struct
+{
+    MatrixFileHeader header; /* Copy of the header of the file */
+    void *data;              /* First element, right after the header */
+    void *map;               /* Whole mapping, header included */
+    size_t length;           /* Length in bytes of the mapping */
+} MappedMatrix;
+
+/* Hardware events counted by perf_begin and perf_end */
+#define PERF_EVENTS 5
+
+/**
+ * Hardware counters of the code run between perf_begin and perf_end.
+ * Counters that could not be opened are -1; available is 0 when none was.
+ */
+typedef struct
+{
+    int available;          /* 1 when at least one counter was read */
+    long long cycles;       /* CPU cycles */
+    long long instructions; /* Retired instructions */
+    long long l1d_misses;   /* L1 data cache read misses */
+    long long llc_misses;   /* Last level cache misses */
+    long long dtlb_misses;  /* Data TLB read misses */
+} PerfCounters;
+
+#ifdef __linux__
+/* File descriptors of the counters, opened on the first call to perf_begin (-1 if unavailable) */
+static int perf_fds[PERF_EVENTS];
+static int perf_opened = 0;
+
+/**
+ * Opens one hardware counter of the calling thread, counting user space only
+ * so that it also works with the default perf_event_paranoid of most systems.
+ * @param type Type of the event (PERF_TYPE_HARDWARE or PERF_TYPE_HW_CACHE).
+ * @param config Event of that type.
+ * @return File descriptor of the counter or -1 if it is not available.
+ */
+static int perf_open(unsigned int type, unsigned long long config)
+{
+    struct perf_event_attr attr;
+
+    memset(&attr, 0, sizeof(attr));
+    attr.size = sizeof(attr);
+    attr.type = type;
+    attr.config = config;
+    attr.disabled = 1;
+    attr.exclude_kernel = 1;
+    attr.exclude_hv = 1;
+
+    return (int)syscall(SYS_perf_event_open, &attr, 0, -1, -1, 0);
+}
+
+/* Encodes a read miss of a hardware cache event */
+#define PERF_CACHE_MISS(cache) \
+    ((cache) | (PERF_COUNT_HW_CACHE_OP_READ << 8) | (PERF_COUNT_HW_CACHE_RESULT_MISS << 16))
+#endif
+
+/**
+ * Resets and starts the hardware counters of the calling thread.
+ * The counters are opened on the first call; in environments without them
+ * (containers, virtual machines, restrictive perf_event_paranoid) this does nothing.
+ * Only the calling thread is counted, so with several OpenMP threads the counts
+ * are those of the master thread.
+ * @return Number of counters running.
+ */
+int perf_begin(void)
+{
+    int running = 0;
+
+#ifdef __linux__
+    if (!perf_opened)
+    {
+        perf_fds[0] = perf_open(PERF_TYPE_HARDWARE, PERF_COUNT_HW_CPU_CYCLES);
+        perf_fds[1] = perf_open(PERF_TYPE_HARDWARE, PERF_COUNT_HW_INSTRUCTIONS);
+        perf_fds[2] = perf_open(PERF_TYPE_HW_CACHE, PERF_CACHE_MISS(PERF_COUNT_HW_CACHE_L1D));
+        perf_fds[3] = perf_open(PERF_TYPE_HW_CACHE, PERF_CACHE_MISS(PERF_COUNT_HW_CACHE_LL));
+        perf_fds[4] = perf_open(PERF_TYPE_HW_CACHE, PERF_CACHE_MISS(PERF_COUNT_HW_CACHE_DTLB));
+        perf_opened = 1;
+    }
+
+    for (int event = 0; event < PERF_EVENTS; event++)
+        if (perf_fds[event] >= 0)
+        {
+            ioctl(perf_fds[event], PERF_EVENT_IOC_RESET, 0);
+            ioctl(perf_fds[event], PERF_EVENT_IOC_ENABLE, 0);
+            running++;
+        }
+#endif
+
+    return running;
+}
+
+/**
+ * Stops the hardware counters started by perf_begin and reads them.
+ * @param counters Pointer to the structure where the counters are stored.
+ */
+void perf_end(PerfCounters *counters)
+{
+    long long values[PERF_EVENTS];
+
+    counters->available = 0;
+    for (int event = 0; event < PERF_EVENTS; event++)
+    {
+        values[event] = -1;
+#ifdef __linux__
+        if (perf_opened && perf_fds[event] >= 0)
+        {
+            long long value;
+
+            ioctl(perf_fds[event], PERF_EVENT_IOC_DISABLE, 0);
+            if (read(perf_fds[event], &value, sizeof(value)) == (ssize_t)sizeof(value))
+            {
+                values[event] = value;
+                counters->available = 1;
+            }
+        }
+#endif
+    }
+
+    counters->cycles = values[0];
+    counters->instructions = values[1];
+    counters->l1d_misses = values[2];
+    counters->llc_misses = values[3];
+    counters->dtlb_misses = values[4];
+}
+
+/* Buffers of the pool: cached (in_use 0) or handed out (in_use 1); empty slots have no data */
+typedef struct
+{
+    void *data;      /* Aligned buffer */
+    size_t capacity; /* Size in bytes of the buffer */
+    int in_use;      /* 1 while it is handed out */
+} PoolBuffer;
+
+static PoolBuffer matrix_pool[MATRIX_POOL_SLOTS];
+static pthread_mutex_t matrix_pool_lock = PTHREAD_MUTEX_INITIALIZER;
+static size_t matrix_pool_max_bytes = MATRIX_POOL_MAX_BYTES;
+static int matrix_pool_huge_pages = 1;
+
+/**
+ * Configures the buffer pool shared by the matrices and the scratch buffers
+ * of the kernels.
+ * @param max_bytes Maximum total size in bytes of the cached buffers (0 disables the cache).
+ * @param huge_pages Nonzero to back buffers of at least a huge page with
+ *                   transparent huge pages (madvise(MADV_HUGEPAGE)).
+ */
+void configure_matrix_pool(size_t max_bytes, int huge_pages)
+{
+    pthread_mutex_lock(&matrix_pool_lock);
+    matrix_pool_max_bytes = max_bytes;
+    matrix_pool_huge_pages = huge_pages;
+    pthread_mutex_unlock(&matrix_pool_lock);
+}
+
 /**
- * Allocates memory for a matrix.
+ * Takes a buffer of at least a number of bytes from the pool. A cached buffer
+ * is reused when one is big enough but not more than twice as big as needed;
+ * otherwise a new one is allocated, aligned to MATRIX_POOL_ALIGNMENT bytes
+ * (to a huge page, and advised as such, when it is at least that big).
+ * The contents of the buffer are undefined.
+ * @param bytes Number of bytes needed.
+ * @return Pointer to the buffer or NULL.
+ */
+static void *pool_alloc(size_t bytes)
+{
+    int best = -1, huge_pages;
+    size_t alignment, capacity;
+    void *data;
+
+    pthread_mutex_lock(&matrix_pool_lock);
+    for (int slot = 0; slot < MATRIX_POOL_SLOTS; slot++)
+    {
+        PoolBuffer *buffer = &matrix_pool[slot];
+        if (buffer->data != NULL && !buffer->in_use && buffer->capacity >= bytes &&
+            buffer->capacity <= 2 * bytes + MATRIX_POOL_ALIGNMENT &&
+            (best < 0 || buffer->capacity < matrix_pool[best].capacity))
+            best = slot;
+    }
+    if (best >= 0)
+        matrix_pool[best].in_use = 1;
+    huge_pages = matrix_pool_huge_pages;
+    pthread_mutex_unlock(&matrix_pool_lock);
+
+    if (best >= 0)
+        return matrix_pool[best].data;
+
+    alignment = huge_pages && bytes >= HUGE_PAGE_SIZE ? HUGE_PAGE_SIZE : MATRIX_POOL_ALIGNMENT;
+    capacity = (MAX(bytes, 1) + alignment - 1) / alignment * alignment;
+    data = aligned_alloc(alignment, capacity);
+    if (data == NULL)
+        return NULL;
+
+#ifdef MADV_HUGEPAGE
+    if (alignment == HUGE_PAGE_SIZE)
+        madvise(data, capacity, MADV_HUGEPAGE);
+#endif
+
+    // Track the buffer if there is an empty slot; otherwise it is freed on release
+    pthread_mutex_lock(&matrix_pool_lock);
+    for (int slot = 0; slot < MATRIX_POOL_SLOTS; slot++)
+        if (matrix_pool[slot].data == NULL)
+        {
+            matrix_pool[slot].data = data;
+            matrix_pool[slot].capacity = capacity;
+            matrix_pool[slot].in_use = 1;
+            break;
+        }
+    pthread_mutex_unlock(&matrix_pool_lock);
+
+    return data;
+}
+
+/**
+ * Gives a buffer taken with pool_alloc back to the pool. It stays cached for
+ * later calls unless the cached buffers would exceed the configured maximum,
+ * in which case it is freed.
+ * @param data Pointer to the buffer (NULL does nothing).
+ */
+static void pool_release(void *data)
+{
+    size_t cached = 0;
+    int slot = -1;
+
+    if (data == NULL)
+        return;
+
+    pthread_mutex_lock(&matrix_pool_lock);
+    for (int s = 0; s < MATRIX_POOL_SLOTS; s++)
+    {
+        if (matrix_pool[s].data == data)
+            slot = s;
+        else if (matrix_pool[s].data != NULL && !matrix_pool[s].in_use)
+            cached += matrix_pool[s].capacity;
+    }
+
+    if (slot >= 0 && cached + matrix_pool[slot].capacity <= matrix_pool_max_bytes)
+    {
+        matrix_pool[slot].in_use = 0;
+        data = NULL;
+    }
+    else if (slot >= 0)
+        matrix_pool[slot].data = NULL;
+    pthread_mutex_unlock(&matrix_pool_lock);
+
+    free(data);
+}
+
+/**
+ * Frees the buffers cached by the pool. Buffers still in use are kept.
+ */
+void trim_matrix_pool(void)
+{
+    pthread_mutex_lock(&matrix_pool_lock);
+    for (int slot = 0; slot < MATRIX_POOL_SLOTS; slot++)
+        if (matrix_pool[slot].data != NULL && !matrix_pool[slot].in_use)
+        {
+            free(matrix_pool[slot].data);
+            matrix_pool[slot].data = NULL;
+        }
+    pthread_mutex_unlock(&matrix_pool_lock);
+}
+
+/**
+ * Calculates the size in bytes of the elements of a type.
+ * @param dtype Element type (MATRIX_DTYPE_*).
+ * @return Size in bytes, or 0 if the type is unknown.
+ */
+static size_t dtype_size(int dtype)
+{
+    switch (dtype)
+    {
+#define DTYPE_SIZE(code, T, suffix) \
+    case code:                      \
+        return sizeof(T);
+        FOR_EACH_DTYPE(DTYPE_SIZE)
+#undef DTYPE_SIZE
+    default:
+        return 0;
+    }
+}
+
+/**
+ * Stores a value in an element of a matrix, converted to its element type.
+ * @param matrix Pointer to the matrix.
+ * @param i Row of the element.
+ * @param j Column of the element.
+ * @param value Value to store.
+ */
+static void set_element(Matrix *matrix, int i, int j, double value)
+{
+    size_t offset = IDX(i, j, matrix->stride);
+
+    switch (matrix->dtype)
+    {
+#define SET_ELEMENT(code, T, suffix)              \
+    case code:                                    \
+        ((T *)matrix->data)[offset] = (T)value;   \
+        break;
+        FOR_EACH_DTYPE(SET_ELEMENT)
+#undef SET_ELEMENT
+    }
+}
+
+/**
+ * Allocates memory for a matrix in a single contiguous buffer.
+ * The buffer comes from the pool, so it is aligned and may be reused from a
+ * matrix freed earlier: its contents are undefined (see fill_matrix).
  * @param rows Number of rows in the matrix.
  * @param columns Number of columns in the matrix.
+ * @param dtype Element type (MATRIX_DTYPE_*).
  * @return Pointer to the matrix.
  */
-int **allocate_matrix(int rows, int columns)
+Matrix *allocate_matrix(int rows, int columns, int dtype)
 {
-    int **matrix = (int **)malloc(rows * sizeof(int *));
+    if (dtype_size(dtype) == 0)
+    {
+        fprintf(stderr, "Error: unknown element type %d\n", dtype);
+        return NULL;
+    }
+
+    Matrix *matrix = (Matrix *)malloc(sizeof(Matrix));
     if (matrix == NULL)
     {
         fprintf(stderr, "Error: Out of memory\n");
         return NULL;
     }
 
-    for (int i = 0; i < rows; i++)
+    matrix->data = pool_alloc((size_t)rows * columns * dtype_size(dtype));
+    if (matrix->data == NULL)
     {
-        matrix[i] = (int *)malloc(columns * sizeof(int));
-        if (matrix[i] == NULL)
-        {
-            fprintf(stderr, "Error: Out of memory\n");
-            return NULL;
-        }
+        fprintf(stderr, "Error: Out of memory\n");
+        free(matrix);
+        return NULL;
     }
 
+    matrix->rows = rows;
+    matrix->columns = columns;
+    matrix->stride = columns;
+    matrix->dtype = dtype;
+
     return matrix;
 }
 
 /**
- * Frees memory allocated for a matrix.
- * @param rows Number of rows in the matrix.
+ * Frees memory allocated for a matrix. Its buffer goes back to the pool.
  * @param matrix Pointer to the matrix.
  */
-void free_matrix(int rows, int **matrix)
+void free_matrix(Matrix *matrix)
 {
-    for (int i = 0; i < rows; i++)
-        free(matrix[i]);
-
+    pool_release(matrix->data);
     free(matrix);
 }
 
 /**
  * Generates random numbers for a matrix.
- * @param rows Number of rows in the matrix.
- * @param columns Number of columns in the matrix.
  * @param matrix Pointer to the matrix.
  */
-void generate_matrix(int rows, int columns, int **matrix)
+void generate_matrix(Matrix *matrix)
 {
     srand(clock());
-    for (int i = 0; i < rows; i++)
-        for (int j = 0; j < columns; j++)
-            matrix[i][j] = rand() % 10; // Generate numbers between 0 and 9
+    for (int i = 0; i < matrix->rows; i++)
+        for (int j = 0; j < matrix->columns; j++)
+            set_element(matrix, i, j, rand() % 10); // Generate numbers between 0 and 9
 }
 
 /**
  * Fills a matrix with a specific value.
- * @param rows Number of rows in the matrix.
- * @param columns Number of columns in the matrix.
+ * Zero is all bits zero in every element type, so it is filled with memset.
  * @param matrix Pointer to the matrix.
- * @param value Value to fill the matrix with.
+ * @param value Value to fill the matrix with (converted to its element type).
  */
-void fill_matrix(int rows, int columns, int **matrix, int value)
+void fill_matrix(Matrix *matrix, double value)
 {
-    for (int i = 0; i < rows; i++)
-        for (int j = 0; j < columns; j++)
-            matrix[i][j] = value;
+    if (value == 0)
+    {
+        size_t row_bytes = (size_t)matrix->columns * dtype_size(matrix->dtype);
+        if (matrix->stride == matrix->columns)
+            memset(matrix->data, 0, row_bytes * matrix->rows);
+        else
+            for (int i = 0; i < matrix->rows; i++)
+                memset((char *)matrix->data + IDX(i, 0, matrix->stride) * dtype_size(matrix->dtype), 0, row_bytes);
+        return;
+    }
+
+    for (int i = 0; i < matrix->rows; i++)
+        for (int j = 0; j < matrix->columns; j++)
+            set_element(matrix, i, j, value);
 }
 
 /**
- * Multiplies two matrices in row-major order.
- * @param rows Number of rows in the matrices.
- * @param columns Number of columns in the matrices.
+ * Checks that C = A * B is well defined: A is M x K, B is K x N and C is M x N,
+ * and the three matrices have the same known element type.
  * @param A Pointer to the first matrix.
  * @param B Pointer to the second matrix.
  * @param C Pointer to the resulting matrix.
+ * @return MUL_OK, MUL_ERROR_DIMENSIONS or MUL_ERROR_DTYPE.
  */
-void row_major_mul(int rows, int columns, int **A, int **B, int **C)
+static int check_dimensions(const Matrix *A, const Matrix *B, const Matrix *C)
 {
-    for (int i = 0; i < rows; i++)
-        for (int j = 0; j < columns; j++)
-            for (int k = 0; k < columns; k++)
-                C[i][j] += A[i][k] * B[k][j];
+    if (A->columns != B->rows || C->rows != A->rows || C->columns != B->columns)
+    {
+        fprintf(stderr, "Error: cannot multiply a %dx%d matrix by a %dx%d matrix into a %dx%d matrix\n",
+                A->rows, A->columns, B->rows, B->columns, C->rows, C->columns);
+        return MUL_ERROR_DIMENSIONS;
+    }
+
+    if (A->dtype != B->dtype || A->dtype != C->dtype || dtype_size(A->dtype) == 0)
+    {
+        fprintf(stderr, "Error: element types %d, %d and %d do not match or are unknown\n",
+                A->dtype, B->dtype, C->dtype);
+        return MUL_ERROR_DTYPE;
+    }
+
+    return MUL_OK;
 }
 
+/**
+ * Calls the version of a kernel for an element type (kernel_int32, kernel_int64,
+ * kernel_float32 or kernel_float64) and returns its status.
+ */
+#define DISPATCH_DTYPE(dtype, kernel, ...)           \
+    switch (dtype)                                   \
+    {                                                \
+    case MATRIX_DTYPE_INT32:                         \
+        return kernel##_int32(__VA_ARGS__);          \
+    case MATRIX_DTYPE_INT64:                         \
+        return kernel##_int64(__VA_ARGS__);          \
+    case MATRIX_DTYPE_FLOAT32:                       \
+        return kernel##_float32(__VA_ARGS__);        \
+    case MATRIX_DTYPE_FLOAT64:                       \
+        return kernel##_float64(__VA_ARGS__);        \
+    default:                                         \
+        fprintf(stderr, "Error: unknown element type %d\n", dtype); \
+        return MUL_ERROR_DTYPE;                      \
+    }
+
+/* Row-major order multiplication for elements of type T (see row_major_mul) */
+#define DEFINE_ROW_MAJOR_MUL(code, T, suffix)                                                 \
+    static int row_major_mul_##suffix(const Matrix *A, const Matrix *B, Matrix *C, int threads) \
+    {                                                                                         \
+        int rows = A->rows, inner = A->columns, columns = B->columns;                         \
+        int lda = A->stride, ldb = B->stride, ldc = C->stride;                                \
+        const T *a = A->data, *b = B->data;                                                   \
+        T *c = C->data;                                                                       \
+                                                                                              \
+        _Pragma("omp parallel for num_threads(threads) if (threads > 1) schedule(static)")    \
+        for (int i = 0; i < rows; i++)                                                        \
+            for (int j = 0; j < columns; j++)                                                 \
+                for (int k = 0; k < inner; k++)                                               \
+                    c[IDX(i, j, ldc)] += a[IDX(i, k, lda)] * b[IDX(k, j, ldb)];               \
+                                                                                              \
+        return MUL_OK;                                                                        \
+    }
+
+FOR_EACH_DTYPE(DEFINE_ROW_MAJOR_MUL)
+
+/**
+ * Multiplies two matrices in row-major order.
+ * Output rows are distributed among the threads.
+ * @param A Pointer to the first matrix (M x K).
+ * @param B Pointer to the second matrix (K x N).
+ * @param C Pointer to the resulting matrix (M x N).
+ * @param num_threads Number of OpenMP threads to use (1 runs serially).
+ * @return MUL_OK or an error code.
+ */
+int row_major_mul(const Matrix *A, const Matrix *B, Matrix *C, int num_threads)
+{
+    int threads = num_threads > 1 ? num_threads : 1;
+    int status = check_dimensions(A, B, C);
+
+    if (status != MUL_OK)
+        return status;
+
+    DISPATCH_DTYPE(A->dtype, row_major_mul, A, B, C, threads)
+}
+
+/* Column-major order multiplication for elements of type T (see column_major_mul) */
+#define DEFINE_COLUMN_MAJOR_MUL(code, T, suffix)                                                 \
+    static int column_major_mul_##suffix(const Matrix *A, const Matrix *B, Matrix *C, int threads) \
+    {                                                                                            \
+        int rows = A->rows, inner = A->columns, columns = B->columns;                            \
+        int lda = A->stride, ldb = B->stride, ldc = C->stride;                                   \
+        const T *a = A->data, *b = B->data;                                                      \
+        T *c = C->data;                                                                          \
+                                                                                                 \
+        _Pragma("omp parallel for num_threads(threads) if (threads > 1) schedule(static)")       \
+        for (int j = 0; j < columns; j++)                                                        \
+            for (int i = 0; i < rows; i++)                                                       \
+                for (int k = 0; k < inner; k++)                                                  \
+                    c[IDX(i, j, ldc)] += a[IDX(i, k, lda)] * b[IDX(k, j, ldb)];                  \
+                                                                                                 \
+        return MUL_OK;                                                                           \
+    }
+
+FOR_EACH_DTYPE(DEFINE_COLUMN_MAJOR_MUL)
+
 /**
  * Multiplies two matrices in column-major order.
- * @param rows Number of rows in the matrices.
- * @param columns Number of columns in the matrices.
- * @param A Pointer to the first matrix.
- * @param B Pointer to the second matrix.
- * @param C Pointer to the resulting matrix.
+ * Output columns are distributed among the threads.
+ * @param A Pointer to the first matrix (M x K).
+ * @param B Pointer to the second matrix (K x N).
+ * @param C Pointer to the resulting matrix (M x N).
+ * @param num_threads Number of OpenMP threads to use (1 runs serially).
+ * @return MUL_OK or an error code.
+ */
+int column_major_mul(const Matrix *A, const Matrix *B, Matrix *C, int num_threads)
+{
+    int threads = num_threads > 1 ? num_threads : 1;
+    int status = check_dimensions(A, B, C);
+
+    if (status != MUL_OK)
+        return status;
+
+    DISPATCH_DTYPE(A->dtype, column_major_mul, A, B, C, threads)
+}
+
+/* i-k-j order multiplication for elements of type T (see ikj_mul) */
+#define DEFINE_IKJ_MUL(code, T, suffix)                                                    \
+    static int ikj_mul_##suffix(const Matrix *A, const Matrix *B, Matrix *C, int threads)  \
+    {                                                                                      \
+        int rows = A->rows, inner = A->columns, columns = B->columns;                      \
+        int lda = A->stride, ldb = B->stride, ldc = C->stride;                             \
+        const T *a = A->data, *b = B->data;                                                \
+        T *c = C->data;                                                                    \
+                                                                                           \
+        _Pragma("omp parallel for num_threads(threads) if (threads > 1) schedule(static)") \
+        for (int i = 0; i < rows; i++)                                                     \
+            for (int k = 0; k < inner; k++)                                                \
+            {                                                                              \
+                T a_ik = a[IDX(i, k, lda)];                                                \
+                for (int j = 0; j < columns; j++)                                          \
+                    c[IDX(i, j, ldc)] += a_ik * b[IDX(k, j, ldb)];                         \
+            }                                                                              \
+                                                                                           \
+        return MUL_OK;                                                                     \
+    }
+
+FOR_EACH_DTYPE(DEFINE_IKJ_MUL)
+
+/**
+ * Multiplies two matrices in i-k-j order.
+ * The innermost loop walks rows of B and C contiguously instead of striding
+ * down a column of B. Output rows are distributed among the threads.
+ * @param A Pointer to the first matrix (M x K).
+ * @param B Pointer to the second matrix (K x N).
+ * @param C Pointer to the resulting matrix (M x N).
+ * @param num_threads Number of OpenMP threads to use (1 runs serially).
+ * @return MUL_OK or an error code.
+ */
+int ikj_mul(const Matrix *A, const Matrix *B, Matrix *C, int num_threads)
+{
+    int threads = num_threads > 1 ? num_threads : 1;
+    int status = check_dimensions(A, B, C);
+
+    if (status != MUL_OK)
+        return status;
+
+    DISPATCH_DTYPE(A->dtype, ikj_mul, A, B, C, threads)
+}
+
+/* Multiplication with B transposed for elements of type T (see transposed_mul) */
+#define DEFINE_TRANSPOSED_MUL(code, T, suffix)                                                    \
+    static int transposed_mul_##suffix(const Matrix *A, const Matrix *B, Matrix *C, int threads)  \
+    {                                                                                             \
+        int rows = A->rows, inner = A->columns, columns = B->columns;                             \
+        int lda = A->stride, ldb = B->stride, ldc = C->stride;                                    \
+        const T *a = A->data, *b = B->data;                                                       \
+        T *c = C->data;                                                                           \
+                                                                                                  \
+        T *bt = (T *)pool_alloc((size_t)columns * inner * sizeof(T));                             \
+        if (bt == NULL && (size_t)columns * inner > 0)                                            \
+        {                                                                                         \
+            fprintf(stderr, "Error: Out of memory\n");                                            \
+            return MUL_ERROR_MEMORY;                                                              \
+        }                                                                                         \
+                                                                                                  \
+        _Pragma("omp parallel num_threads(threads) if (threads > 1)")                             \
+        {                                                                                         \
+            _Pragma("omp for schedule(static)")                                                   \
+            for (int j = 0; j < columns; j++)                                                     \
+                for (int k = 0; k < inner; k++)                                                   \
+                    bt[IDX(j, k, inner)] = b[IDX(k, j, ldb)];                                     \
+                                                                                                  \
+            _Pragma("omp for schedule(static)")                                                   \
+            for (int i = 0; i < rows; i++)                                                        \
+                for (int j = 0; j < columns; j++)                                                 \
+                {                                                                                 \
+                    T sum = 0;                                                                    \
+                    for (int k = 0; k < inner; k++)                                               \
+                        sum += a[IDX(i, k, lda)] * bt[IDX(j, k, inner)];                          \
+                    c[IDX(i, j, ldc)] += sum;                                                     \
+                }                                                                                 \
+        }                                                                                         \
+                                                                                                  \
+        pool_release(bt);                                                                         \
+                                                                                                  \
+        return MUL_OK;                                                                            \
+    }
+
+FOR_EACH_DTYPE(DEFINE_TRANSPOSED_MUL)
+
+/**
+ * Multiplies two matrices transposing B first.
+ * Every element of C is then the dot product of two contiguous rows, one of A
+ * and one of B^T. Output rows are distributed among the threads.
+ * @param A Pointer to the first matrix (M x K).
+ * @param B Pointer to the second matrix (K x N).
+ * @param C Pointer to the resulting matrix (M x N).
+ * @param num_threads Number of OpenMP threads to use (1 runs serially).
+ * @return MUL_OK or an error code.
  */
-void column_major_mul(int rows, int columns, int **A, int **B, int **C)
+int transposed_mul(const Matrix *A, const Matrix *B, Matrix *C, int num_threads)
 {
-    for (int j = 0; j < columns; j++)
-        for (int i = 0; i < rows; i++)
-            for (int k = 0; k < columns; k++)
-                C[i][j] += A[i][k] * B[k][j];
+    int threads = num_threads > 1 ? num_threads : 1;
+    int status = check_dimensions(A, B, C);
+
+    if (status != MUL_OK)
+        return status;
+
+    DISPATCH_DTYPE(A->dtype, transposed_mul, A, B, C, threads)
 }
 
+/* Z-order multiplication for elements of type T (see zorder_mul) */
+#define DEFINE_ZORDER_MUL(code, T, suffix)                                                                    \
+    static int zorder_mul_##suffix(const Matrix *A, const Matrix *B, Matrix *C, int block_size, int threads)  \
+    {                                                                                                         \
+        int rows = A->rows, inner = A->columns, columns = B->columns;                                         \
+        int lda = A->stride, ldb = B->stride, ldc = C->stride;                                                \
+        const T *a = A->data, *b = B->data;                                                                   \
+        T *c = C->data;                                                                                       \
+                                                                                                              \
+        _Pragma("omp parallel for collapse(2) num_threads(threads) if (threads > 1) schedule(static)")        \
+        for (int i = 0; i < rows; i += block_size)                                                            \
+            for (int j = 0; j < columns; j += block_size)                                                     \
+                for (int k = 0; k < inner; k += block_size)                                                   \
+                {                                                                                             \
+                    int i_end = MIN(i + block_size, rows);                                                    \
+                    int j_end = MIN(j + block_size, columns);                                                 \
+                    int k_end = MIN(k + block_size, inner);                                                   \
+                    for (int ii = i; ii < i_end; ii++)                                                        \
+                        for (int jj = j; jj < j_end; jj++)                                                    \
+                            for (int kk = k; kk < k_end; kk++)                                                \
+                                c[IDX(ii, jj, ldc)] += a[IDX(ii, kk, lda)] * b[IDX(kk, jj, ldb)];             \
+                }                                                                                             \
+                                                                                                              \
+        return MUL_OK;                                                                                        \
+    }
+
+FOR_EACH_DTYPE(DEFINE_ZORDER_MUL)
+
 /**
  * Multiplies two matrices in Z-order.
- * @param rows Number of rows in the matrices.
- * @param columns Number of columns in the matrices.
- * @param A Pointer to the first matrix.
- * @param B Pointer to the second matrix.
- * @param C Pointer to the resulting matrix.
- * @param block_size Size of the block to be processed. Must be a divisor of rows and columns.
+ * The blocks are traversed over the row-major layout; see morton_mul for a
+ * multiplication over matrices actually stored in Z-order. The block size does
+ * not need to divide the dimensions: edge blocks are simply smaller.
+ * Output tiles are distributed among the threads.
+ * @param A Pointer to the first matrix (M x K).
+ * @param B Pointer to the second matrix (K x N).
+ * @param C Pointer to the resulting matrix (M x N).
+ * @param block_size Size of the block to be processed.
+ * @param num_threads Number of OpenMP threads to use (1 runs serially).
+ * @return MUL_OK or an error code.
+ */
+int zorder_mul(const Matrix *A, const Matrix *B, Matrix *C, int block_size, int num_threads)
+{
+    int threads = num_threads > 1 ? num_threads : 1;
+    int status = check_dimensions(A, B, C);
+
+    if (status != MUL_OK)
+        return status;
+
+    if (block_size < 1)
+    {
+        fprintf(stderr, "Error: block_size must be positive\n");
+        return MUL_ERROR_BLOCK_SIZE;
+    }
+
+    DISPATCH_DTYPE(A->dtype, zorder_mul, A, B, C, block_size, threads)
+}
+
+/*
+ * Multi-level blocked multiplication for elements of type T (see multilevel_mul).
+ * multilevel_block_<suffix> multiplies the blocks recursively: every level
+ * splits its block of the iteration space, {i_begin, i_end, j_begin, j_end,
+ * k_begin, k_end}, in tiles of the next (smaller) level, tiles[level], and the
+ * innermost tiles (level -1) are multiplied in i-k-j order.
+ */
+#define DEFINE_MULTILEVEL_MUL(code, T, suffix)                                                                        \
+    static void multilevel_block_##suffix(const T *a, const T *b, T *c, int lda, int ldb, int ldc,                    \
+                                          const int bounds[6], const int *tiles, int level)                          \
+    {                                                                                                                 \
+        if (level < 0)                                                                                                \
+        {                                                                                                             \
+            for (int i = bounds[0]; i < bounds[1]; i++)                                                               \
+                for (int k = bounds[4]; k < bounds[5]; k++)                                                           \
+                {                                                                                                     \
+                    T a_ik = a[IDX(i, k, lda)];                                                                       \
+                    for (int j = bounds[2]; j < bounds[3]; j++)                                                       \
+                        c[IDX(i, j, ldc)] += a_ik * b[IDX(k, j, ldb)];                                                \
+                }                                                                                                     \
+            return;                                                                                                   \
+        }                                                                                                             \
+                                                                                                                      \
+        int tile = tiles[level];                                                                                      \
+        for (int i = bounds[0]; i < bounds[1]; i += tile)                                                             \
+            for (int j = bounds[2]; j < bounds[3]; j += tile)                                                         \
+                for (int k = bounds[4]; k < bounds[5]; k += tile)                                                     \
+                {                                                                                                     \
+                    int block[6] = {i, MIN(i + tile, bounds[1]), j, MIN(j + tile, bounds[3]), k, MIN(k + tile, bounds[5])}; \
+                    multilevel_block_##suffix(a, b, c, lda, ldb, ldc, block, tiles, level - 1);                       \
+                }                                                                                                     \
+    }                                                                                                                 \
+                                                                                                                      \
+    static int multilevel_mul_##suffix(const Matrix *A, const Matrix *B, Matrix *C, const int tiles[3], int threads)  \
+    {                                                                                                                 \
+        int rows = A->rows, inner = A->columns, columns = B->columns;                                                 \
+        int l3_block = tiles[2];                                                                                      \
+                                                                                                                      \
+        _Pragma("omp parallel for collapse(2) num_threads(threads) if (threads > 1) schedule(dynamic)")               \
+        for (int i = 0; i < rows; i += l3_block)                                                                      \
+            for (int j = 0; j < columns; j += l3_block)                                                               \
+                for (int k = 0; k < inner; k += l3_block)                                                             \
+                {                                                                                                     \
+                    int block[6] = {i, MIN(i + l3_block, rows), j, MIN(j + l3_block, columns), k, MIN(k + l3_block, inner)}; \
+                    multilevel_block_##suffix(A->data, B->data, C->data, A->stride, B->stride, C->stride, block, tiles, 1); \
+                }                                                                                                     \
+                                                                                                                      \
+        return MUL_OK;                                                                                                \
+    }
+
+FOR_EACH_DTYPE(DEFINE_MULTILEVEL_MUL)
+
+/**
+ * Multiplies two matrices in Z-order with one level of blocking per cache level.
+ * The outermost blocks are sized for L3, split in blocks sized for L2 and then
+ * in blocks sized for L1. Outermost output tiles are distributed among the threads.
+ * @param A Pointer to the first matrix (M x K).
+ * @param B Pointer to the second matrix (K x N).
+ * @param C Pointer to the resulting matrix (M x N).
+ * @param l3_block Size of the outermost blocks.
+ * @param l2_block Size of the intermediate blocks.
+ * @param l1_block Size of the innermost blocks.
+ * @param num_threads Number of OpenMP threads to use (1 runs serially).
+ * @return MUL_OK or an error code.
+ */
+int multilevel_mul(const Matrix *A, const Matrix *B, Matrix *C, int l3_block, int l2_block, int l1_block, int num_threads)
+{
+    int tiles[3] = {l1_block, l2_block, l3_block};
+    int threads = num_threads > 1 ? num_threads : 1;
+    int status = check_dimensions(A, B, C);
+
+    if (status != MUL_OK)
+        return status;
+
+    if (l1_block < 1 || l2_block < l1_block || l3_block < l2_block)
+    {
+        fprintf(stderr, "Error: block sizes must satisfy 1 <= l1_block <= l2_block <= l3_block\n");
+        return MUL_ERROR_BLOCK_SIZE;
+    }
+
+    DISPATCH_DTYPE(A->dtype, multilevel_mul, A, B, C, tiles, threads)
+}
+
+/**
+ * Computes the position of a tile in Z-order (Morton order) by interleaving
+ * the bits of its coordinates, the row bit being the most significant one.
+ * @param i Row of the tile.
+ * @param j Column of the tile.
+ * @return Index of the tile along the Z curve.
+ */
+static size_t morton_index(unsigned int i, unsigned int j)
+{
+    size_t index = 0;
+
+    for (unsigned int bit = 0; (i >> bit) != 0 || (j >> bit) != 0; bit++)
+        index |= ((size_t)((j >> bit) & 1) << (2 * bit)) | ((size_t)((i >> bit) & 1) << (2 * bit + 1));
+
+    return index;
+}
+
+/**
+ * Calculates the number of tiles per side of a matrix stored in Z-order.
+ * It is the smallest power of two that covers the matrix, so the tile grid
+ * can be split recursively into quadrants.
+ * @param size Largest dimension of the matrices involved.
+ * @param tile_size Number of rows and columns of a tile.
+ * @return Number of tiles per side, or 0 if tile_size is not positive.
+ */
+int morton_tiles(int size, int tile_size)
+{
+    int tiles = 1;
+
+    if (tile_size < 1)
+        return 0;
+
+    while ((long)tiles * tile_size < size)
+        tiles *= 2;
+
+    return tiles;
+}
+
+/**
+ * Allocates a zeroed buffer for a matrix stored in Z-order (from the pool).
+ * Tiles are stored contiguously along the Z curve and each tile is row-major.
+ * Every operand of a multiplication must use the same size and tile size, so
+ * rectangular matrices are padded up to the largest dimension involved.
+ * @param size Largest dimension of the matrices involved.
+ * @param tile_size Number of rows and columns of a tile.
+ * @param dtype Element type (MATRIX_DTYPE_*).
+ * @return Pointer to the buffer, or NULL for a tile size below 1, an unknown
+ *         element type or without memory.
+ */
+void *allocate_morton(int size, int tile_size, int dtype)
+{
+    size_t tiles, bytes;
+    void *buffer;
+
+    if (tile_size < 1)
+    {
+        fprintf(stderr, "Error: invalid tile size %d\n", tile_size);
+        return NULL;
+    }
+    tiles = morton_tiles(size, tile_size);
+
+    if (dtype_size(dtype) == 0)
+    {
+        fprintf(stderr, "Error: unknown element type %d\n", dtype);
+        return NULL;
+    }
+
+    bytes = tiles * tiles * tile_size * tile_size * dtype_size(dtype);
+    buffer = pool_alloc(bytes);
+    if (buffer == NULL)
+        fprintf(stderr, "Error: Out of memory\n");
+    else
+        memset(buffer, 0, bytes);
+
+    return buffer;
+}
+
+/**
+ * Frees a buffer allocated with allocate_morton (it goes back to the pool).
+ * @param buffer Pointer to the buffer.
+ */
+void free_morton(void *buffer)
+{
+    pool_release(buffer);
+}
+
+/*
+ * Z-order layout conversions for elements of type T (see to_morton and
+ * from_morton). Every tile of the matrix is copied to (or from) its position
+ * along the Z curve; padding is left untouched.
+ */
+#define DEFINE_MORTON_COPY(code, T, suffix)                                                                   \
+    static void morton_copy_##suffix(Matrix *matrix, T *buffer, int tile_size, int to_buffer)                 \
+    {                                                                                                         \
+        int rows = matrix->rows, columns = matrix->columns;                                                   \
+        size_t tile_area = (size_t)tile_size * tile_size;                                                     \
+        T *data = matrix->data;                                                                               \
+                                                                                                              \
+        for (int ti = 0; ti * tile_size < rows; ti++)                                                         \
+            for (int tj = 0; tj * tile_size < columns; tj++)                                                  \
+            {                                                                                                 \
+                T *tile = buffer + morton_index(ti, tj) * tile_area;                                          \
+                int i_end = MIN((ti + 1) * tile_size, rows);                                                  \
+                int j_end = MIN((tj + 1) * tile_size, columns);                                               \
+                for (int i = ti * tile_size; i < i_end; i++)                                                  \
+                    for (int j = tj * tile_size; j < j_end; j++)                                              \
+                    {                                                                                         \
+                        T *element = &tile[IDX(i - ti * tile_size, j - tj * tile_size, tile_size)];           \
+                        if (to_buffer)                                                                        \
+                            *element = data[IDX(i, j, matrix->stride)];                                       \
+                        else                                                                                  \
+                            data[IDX(i, j, matrix->stride)] = *element;                                       \
+                    }                                                                                         \
+            }                                                                                                 \
+    }
+
+FOR_EACH_DTYPE(DEFINE_MORTON_COPY)
+
+/**
+ * Copies a matrix into or out of a Z-order buffer of its element type.
+ * @param matrix Pointer to the matrix.
+ * @param buffer Buffer allocated with allocate_morton.
+ * @param tile_size Number of rows and columns of a tile.
+ * @param to_buffer Nonzero to copy the matrix into the buffer, 0 to copy it back.
+ */
+static void morton_copy(Matrix *matrix, void *buffer, int tile_size, int to_buffer)
+{
+    switch (matrix->dtype)
+    {
+#define MORTON_COPY(code, T, suffix)                                     \
+    case code:                                                           \
+        morton_copy_##suffix(matrix, (T *)buffer, tile_size, to_buffer); \
+        break;
+        FOR_EACH_DTYPE(MORTON_COPY)
+#undef MORTON_COPY
+    }
+}
+
+/**
+ * Copies a matrix into a Z-order buffer. Padding is left untouched.
+ * @param matrix Pointer to the matrix.
+ * @param buffer Buffer allocated with allocate_morton for the element type of the matrix.
+ * @param tile_size Number of rows and columns of a tile.
+ */
+void to_morton(const Matrix *matrix, void *buffer, int tile_size)
+{
+    morton_copy((Matrix *)matrix, buffer, tile_size, 1);
+}
+
+/**
+ * Copies a Z-order buffer back into a matrix, dropping the padding.
+ * @param buffer Buffer allocated with allocate_morton for the element type of the matrix.
+ * @param matrix Pointer to the matrix.
+ * @param tile_size Number of rows and columns of a tile.
+ */
+void from_morton(const void *buffer, Matrix *matrix, int tile_size)
+{
+    morton_copy(matrix, (void *)buffer, tile_size, 0);
+}
+
+/*
+ * Recursive Z-order multiplication for elements of type T (see morton_mul_rec
+ * and morton_mul). morton_tile_mul_<suffix> multiplies two contiguous row-major
+ * tiles in i-k-j order.
+ */
+#define DEFINE_MORTON_MUL(code, T, suffix)                                                                       \
+    static void morton_tile_mul_##suffix(const T *a, const T *b, T *c, int tile_size)                            \
+    {                                                                                                            \
+        for (int i = 0; i < tile_size; i++)                                                                      \
+            for (int k = 0; k < tile_size; k++)                                                                  \
+            {                                                                                                    \
+                T a_ik = a[IDX(i, k, tile_size)];                                                                \
+                for (int j = 0; j < tile_size; j++)                                                              \
+                    c[IDX(i, j, tile_size)] += a_ik * b[IDX(k, j, tile_size)];                                   \
+            }                                                                                                    \
+    }                                                                                                            \
+                                                                                                                 \
+    static void morton_mul_rec_##suffix(const T *a, const T *b, T *c, int tiles, int tile_size,                  \
+                                        int ti, int tj, int tk, const int used[3], int depth)                    \
+    {                                                                                                            \
+        if (ti >= used[0] || tj >= used[1] || tk >= used[2])                                                     \
+            return;                                                                                              \
+                                                                                                                 \
+        if (tiles == 1)                                                                                          \
+        {                                                                                                        \
+            morton_tile_mul_##suffix(a, b, c, tile_size);                                                        \
+            return;                                                                                              \
+        }                                                                                                        \
+                                                                                                                 \
+        int half = tiles / 2;                                                                                    \
+        size_t quadrant = (size_t)half * half * tile_size * tile_size;                                           \
+                                                                                                                 \
+        /* The quadrants of C are independent: C_ij += A_i0 * B_0j + A_i1 * B_1j */                             \
+        for (int i = 0; i < 2; i++)                                                                              \
+            for (int j = 0; j < 2; j++)                                                                          \
+            {                                                                                                    \
+                _Pragma("omp task if (depth > 0)")                                                               \
+                for (int k = 0; k < 2; k++)                                                                      \
+                    morton_mul_rec_##suffix(a + (2 * i + k) * quadrant, b + (2 * k + j) * quadrant,              \
+                                            c + (2 * i + j) * quadrant, half, tile_size,                         \
+                                            ti + i * half, tj + j * half, tk + k * half, used, depth - 1);       \
+            }                                                                                                    \
+        _Pragma("omp taskwait")                                                                                  \
+    }                                                                                                            \
+                                                                                                                 \
+    static int morton_mul_##suffix(const void *A, const void *B, void *C, int tiles, int tile_size,              \
+                                   const int used[3], int threads)                                               \
+    {                                                                                                            \
+        _Pragma("omp parallel num_threads(threads) if (threads > 1)")                                            \
+        _Pragma("omp single")                                                                                    \
+        morton_mul_rec_##suffix(A, B, C, tiles, tile_size, 0, 0, 0, used, MORTON_TASK_DEPTH);                    \
+                                                                                                                 \
+        return MUL_OK;                                                                                           \
+    }
+
+FOR_EACH_DTYPE(DEFINE_MORTON_MUL)
+
+/**
+ * Multiplies two matrices stored in Z-order with a recursive divide and conquer
+ * algorithm. The buffers must come from allocate_morton with the same size
+ * (the largest of M, K and N), tile size and element type. The four quadrants
+ * of a Z-order buffer are contiguous (top-left, top-right, bottom-left,
+ * bottom-right), so every recursion level works on smaller contiguous pieces
+ * of memory until a single tile is reached. Products whose quadrants lie
+ * entirely in the padding are skipped. The quadrants of C are distributed
+ * among the threads as tasks.
+ * @param A First buffer (M x K).
+ * @param B Second buffer (K x N).
+ * @param C Resulting buffer (M x N).
+ * @param rows Number of rows of A and C (M).
+ * @param inner Number of columns of A and rows of B (K).
+ * @param columns Number of columns of B and C (N).
+ * @param tile_size Number of rows and columns of a tile.
+ * @param dtype Element type of the buffers (MATRIX_DTYPE_*).
+ * @param num_threads Number of OpenMP threads to use (1 runs serially).
+ * @return MUL_OK or an error code.
+ */
+int morton_mul(const void *A, const void *B, void *C, int rows, int inner, int columns, int tile_size, int dtype, int num_threads)
+{
+    if (tile_size < 1)
+    {
+        fprintf(stderr, "Error: tile_size must be positive\n");
+        return MUL_ERROR_BLOCK_SIZE;
+    }
+
+    int tiles = morton_tiles(MAX(rows, MAX(inner, columns)), tile_size);
+    int used[3] = {(rows + tile_size - 1) / tile_size,
+                   (columns + tile_size - 1) / tile_size,
+                   (inner + tile_size - 1) / tile_size};
+    int threads = num_threads > 1 ? num_threads : 1;
+
+    DISPATCH_DTYPE(dtype, morton_mul, A, B, C, tiles, tile_size, used, threads)
+}
+
+/* Instruction sets of the gemm_mul micro-kernels */
+#define GEMM_ISA_GENERIC 0
+#define GEMM_ISA_AVX2 1
+#define GEMM_ISA_AVX512 2
+
+/**
+ * Selects the widest instruction set supported by the CPU running the library.
+ * @param isa Set to the name of the selected instruction set.
+ * @return GEMM_ISA_GENERIC, GEMM_ISA_AVX2 or GEMM_ISA_AVX512.
  */
-void zorder_mul(int rows, int columns, int **A, int **B, int **C, int block_size)
+static int select_isa(const char **isa)
 {
-    if (rows % block_size != 0 || columns % block_size != 0)
+#if defined(__GNUC__) && (defined(__x86_64__) || defined(__i386__))
+    __builtin_cpu_init();
+    if (__builtin_cpu_supports("avx512f"))
     {
-        fprintf(stderr, "Error: block_size must be a divisor of rows and columns\n");
-        exit(1);
+        *isa = "avx512f";
+        return GEMM_ISA_AVX512;
     }
+    if (__builtin_cpu_supports("avx2"))
+    {
+        *isa = "avx2";
+        return GEMM_ISA_AVX2;
+    }
+#endif
+    *isa = "generic";
+    return GEMM_ISA_GENERIC;
+}
+
+/**
+ * Returns the instruction set of the micro-kernel used by gemm_mul.
+ * @return Name of the instruction set ("avx512f", "avx2" or "generic").
+ */
+const char *gemm_isa(void)
+{
+    const char *isa;
+    select_isa(&isa);
+    return isa;
+}
+
+/**
+ * Takes a buffer for packed panels from the pool (aligned to MATRIX_POOL_ALIGNMENT bytes).
+ * @param elements Number of elements of the buffer.
+ * @param element_size Size in bytes of an element.
+ * @return Pointer to the buffer or NULL.
+ */
+static void *gemm_alloc(size_t elements, size_t element_size)
+{
+    return pool_alloc(elements * element_size);
+}
+
+#if defined(__GNUC__) && (defined(__x86_64__) || defined(__i386__))
+/* Same micro-kernel compiled for AVX2 and AVX-512 */
+#define DEFINE_GEMM_ISA_KERNELS(T, suffix)                                                                              \
+    __attribute__((target("avx2"))) static void gemm_micro_kernel_avx2_##suffix(int kc, const T *restrict a,            \
+                                                                                const T *restrict b, T *restrict c,     \
+                                                                                int ldc, int m, int n)                  \
+    {                                                                                                                   \
+        gemm_micro_kernel_##suffix(kc, a, b, c, ldc, m, n);                                                             \
+    }                                                                                                                   \
+                                                                                                                        \
+    __attribute__((target("avx512f"))) static void gemm_micro_kernel_avx512_##suffix(int kc, const T *restrict a,       \
+                                                                                     const T *restrict b, T *restrict c, \
+                                                                                     int ldc, int m, int n)             \
+    {                                                                                                                   \
+        gemm_micro_kernel_##suffix(kc, a, b, c, ldc, m, n);                                                             \
+    }
+
+/* Micro-kernel of an element type for an instruction set */
+#define GEMM_ISA_KERNEL(suffix, isa)                                           \
+    ((isa) == GEMM_ISA_AVX512 ? gemm_micro_kernel_avx512_##suffix              \
+     : (isa) == GEMM_ISA_AVX2 ? gemm_micro_kernel_avx2_##suffix                \
+                              : gemm_micro_kernel_generic_##suffix)
+#else
+#define DEFINE_GEMM_ISA_KERNELS(T, suffix)
+#define GEMM_ISA_KERNEL(suffix, isa) gemm_micro_kernel_generic_##suffix
+#endif
+
+/*
+ * Packed, register-blocked multiplication for elements of type T (see gemm_mul).
+ *
+ * gemm_micro_kernel_<suffix> computes an MR x NR block of C from a packed
+ * MR-row panel of A (kc groups of MR consecutive values) and a packed NR-column
+ * panel of B (kc groups of NR consecutive values); only the m x n part of the
+ * block inside C is stored. The accumulators stay in registers along the whole
+ * panel and C is only loaded and stored once. The fixed trip counts of the two
+ * inner loops let the compiler unroll and vectorize them; it is compiled once
+ * per instruction set and the widest one supported is selected at runtime.
+ *
+ * gemm_pack_a_<suffix> packs an mc x kc block of A into MR-row panels, filling
+ * rows beyond mc with zeros; gemm_pack_b_<suffix> packs a kc x NR panel of B,
+ * filling columns beyond nr with zeros.
+ */
+#define DEFINE_GEMM_MUL(code, T, suffix)                                                                                \
+    typedef void (*MicroKernel_##suffix)(int kc, const T *restrict a, const T *restrict b, T *restrict c,               \
+                                         int ldc, int m, int n);                                                        \
+                                                                                                                        \
+    static inline __attribute__((always_inline)) void gemm_micro_kernel_##suffix(int kc, const T *restrict a,           \
+                                                                                 const T *restrict b, T *restrict c,    \
+                                                                                 int ldc, int m, int n)                 \
+    {                                                                                                                   \
+        T acc[GEMM_MR][GEMM_NR] = {{0}};                                                                                \
+                                                                                                                        \
+        for (int p = 0; p < kc; p++)                                                                                    \
+        {                                                                                                               \
+            const T *b_p = b + p * GEMM_NR;                                                                             \
+            for (int i = 0; i < GEMM_MR; i++)                                                                           \
+            {                                                                                                           \
+                T a_ip = a[p * GEMM_MR + i];                                                                            \
+                _Pragma("omp simd")                                                                                     \
+                for (int j = 0; j < GEMM_NR; j++)                                                                       \
+                    acc[i][j] += a_ip * b_p[j];                                                                         \
+            }                                                                                                           \
+        }                                                                                                               \
+                                                                                                                        \
+        for (int i = 0; i < m; i++)                                                                                     \
+            for (int j = 0; j < n; j++)                                                                                 \
+                c[IDX(i, j, ldc)] += acc[i][j];                                                                         \
+    }                                                                                                                   \
+                                                                                                                        \
+    static void gemm_micro_kernel_generic_##suffix(int kc, const T *restrict a, const T *restrict b, T *restrict c,     \
+                                                   int ldc, int m, int n)                                               \
+    {                                                                                                                   \
+        gemm_micro_kernel_##suffix(kc, a, b, c, ldc, m, n);                                                             \
+    }                                                                                                                   \
+                                                                                                                        \
+    DEFINE_GEMM_ISA_KERNELS(T, suffix)                                                                                  \
+                                                                                                                        \
+    static void gemm_pack_a_##suffix(const T *a, int lda, int mc, int kc, T *restrict packed)                           \
+    {                                                                                                                   \
+        for (int ir = 0; ir < mc; ir += GEMM_MR)                                                                        \
+            for (int p = 0; p < kc; p++)                                                                                \
+                for (int i = 0; i < GEMM_MR; i++)                                                                       \
+                    *packed++ = ir + i < mc ? a[IDX(ir + i, p, lda)] : 0;                                               \
+    }                                                                                                                   \
+                                                                                                                        \
+    static void gemm_pack_b_##suffix(const T *b, int ldb, int kc, int nr, T *restrict packed)                           \
+    {                                                                                                                   \
+        for (int p = 0; p < kc; p++)                                                                                    \
+            for (int j = 0; j < GEMM_NR; j++)                                                                           \
+                *packed++ = j < nr ? b[IDX(p, j, ldb)] : 0;                                                             \
+    }                                                                                                                   \
+                                                                                                                        \
+    static int gemm_mul_##suffix(const Matrix *A, const Matrix *B, Matrix *C, int threads)                              \
+    {                                                                                                                   \
+        int rows = A->rows, inner = A->columns, columns = B->columns;                                                   \
+        int lda = A->stride, ldb = B->stride, ldc = C->stride;                                                          \
+        const T *a = A->data, *b = B->data;                                                                             \
+        T *c = C->data;                                                                                                 \
+        const char *isa;                                                                                                \
+        MicroKernel_##suffix micro_kernel = GEMM_ISA_KERNEL(suffix, select_isa(&isa));                                  \
+                                                                                                                        \
+        T *packed_b = gemm_alloc((size_t)GEMM_KC * (GEMM_NC + GEMM_NR), sizeof(T));                                     \
+        T *packed_a = gemm_alloc((size_t)threads * GEMM_MC * GEMM_KC, sizeof(T));                                       \
+        if (packed_a == NULL || packed_b == NULL)                                                                       \
+        {                                                                                                               \
+            fprintf(stderr, "Error: Out of memory\n");                                                                  \
+            pool_release(packed_a);                                                                                     \
+            pool_release(packed_b);                                                                                     \
+            return MUL_ERROR_MEMORY;                                                                                    \
+        }                                                                                                               \
+                                                                                                                        \
+        _Pragma("omp parallel num_threads(threads) if (threads > 1)")                                                   \
+        {                                                                                                               \
+            T *packed_a_thread = packed_a + (size_t)THREAD_NUM() * GEMM_MC * GEMM_KC;                                   \
+                                                                                                                        \
+            for (int jc = 0; jc < columns; jc += GEMM_NC)                                                               \
+            {                                                                                                           \
+                int nc = MIN(GEMM_NC, columns - jc);                                                                    \
+                                                                                                                        \
+                for (int pc = 0; pc < inner; pc += GEMM_KC)                                                             \
+                {                                                                                                       \
+                    int kc = MIN(GEMM_KC, inner - pc);                                                                  \
+                                                                                                                        \
+                    _Pragma("omp for schedule(static)")                                                                 \
+                    for (int jr = 0; jr < nc; jr += GEMM_NR)                                                            \
+                        gemm_pack_b_##suffix(b + IDX(pc, jc + jr, ldb), ldb, kc, MIN(GEMM_NR, nc - jr),                 \
+                                             packed_b + (size_t)jr * kc);                                               \
+                                                                                                                        \
+                    _Pragma("omp for schedule(dynamic)")                                                                \
+                    for (int ic = 0; ic < rows; ic += GEMM_MC)                                                          \
+                    {                                                                                                   \
+                        int mc = MIN(GEMM_MC, rows - ic);                                                               \
+                        gemm_pack_a_##suffix(a + IDX(ic, pc, lda), lda, mc, kc, packed_a_thread);                       \
+                                                                                                                        \
+                        for (int jr = 0; jr < nc; jr += GEMM_NR)                                                        \
+                            for (int ir = 0; ir < mc; ir += GEMM_MR)                                                    \
+                                micro_kernel(kc, packed_a_thread + (size_t)ir * kc, packed_b + (size_t)jr * kc,         \
+                                             c + IDX(ic + ir, jc + jr, ldc), ldc,                                       \
+                                             MIN(GEMM_MR, mc - ir), MIN(GEMM_NR, nc - jr));                             \
+                    }                                                                                                   \
+                }                                                                                                       \
+            }                                                                                                           \
+        }                                                                                                               \
+                                                                                                                        \
+        pool_release(packed_a);                                                                                         \
+        pool_release(packed_b);                                                                                         \
+                                                                                                                        \
+        return MUL_OK;                                                                                                  \
+    }
+
+FOR_EACH_DTYPE(DEFINE_GEMM_MUL)
+
+/**
+ * Multiplies two matrices with a packed, register-blocked algorithm.
+ * B is split in KC x NC blocks and A in MC x KC blocks that are packed into
+ * aligned buffers sized for the L3/L2 caches, and a micro-kernel selected at
+ * runtime for the instruction set of the CPU computes MR x NR blocks of C.
+ * MC blocks of A are distributed among the threads.
+ * @param A Pointer to the first matrix (M x K).
+ * @param B Pointer to the second matrix (K x N).
+ * @param C Pointer to the resulting matrix (M x N).
+ * @param num_threads Number of OpenMP threads to use (1 runs serially).
+ * @return MUL_OK or an error code.
+ */
+int gemm_mul(const Matrix *A, const Matrix *B, Matrix *C, int num_threads)
+{
+    int threads = num_threads > 1 ? num_threads : 1;
+    int status = check_dimensions(A, B, C);
+
+    if (status != MUL_OK)
+        return status;
+
+    DISPATCH_DTYPE(A->dtype, gemm_mul, A, B, C, threads)
+}
 
-    for (int i = 0; i < rows; i += block_size)
-        for (int j = 0; j < columns; j += block_size)
-            for (int k = 0; k < columns; k += block_size)
-                for (int ii = i; ii < i + block_size && ii < rows; ii++)
-                    for (int jj = j; jj < j + block_size && jj < columns; jj++)
-                        for (int kk = k; kk < k + block_size && kk < columns; kk++)
-                            C[ii][jj] += A[ii][kk] * B[kk][jj];
-}
\ No newline at end of file
+/**
+ * Calculates the number of elements of the scratch buffer of strassen_mul.
+ * Every recursion level needs an M/2 x K/2 sum of quadrants of A, a K/2 x N/2
+ * sum of quadrants of B and two M/2 x N/2 products, and the levels below it
+ * reuse the rest of the buffer.
+ * @param rows Number of rows of A and C (M).
+ * @param inner Number of columns of A and rows of B (K).
+ * @param columns Number of columns of B and C (N).
+ * @param cutoff Size below which the recursion stops.
+ * @return Number of elements of the buffer.
+ */
+static size_t strassen_workspace(int rows, int inner, int columns, int cutoff)
+{
+    size_t elements = 0;
+
+    while (rows > cutoff && inner > cutoff && columns > cutoff)
+    {
+        rows /= 2;
+        inner /= 2;
+        columns /= 2;
+        elements += (size_t)rows * inner + (size_t)inner * columns + 2 * (size_t)rows * columns;
+    }
+
+    return elements;
+}
+
+/*
+ * Strassen-Winograd multiplication for elements of type T (see strassen_mul).
+ *
+ * strassen_combine_<suffix> computes the m x n block z = x + sign * y, where a
+ * NULL x or y counts as zero (so it also copies and clears blocks). Blocks may
+ * alias z, since every element is only read before it is written.
+ *
+ * strassen_rec_<suffix> computes C += A * B for an M x K block of A and a
+ * K x N block of B. Blocks with a dimension of at most cutoff are multiplied
+ * with zorder_mul; larger ones are split in quadrants and multiplied with the
+ * 7 products and 15 additions of Winograd's variant:
+ *
+ *   S1 = A21 + A22  S2 = S1 - A11  S3 = A11 - A21  S4 = A12 - S2
+ *   T1 = B12 - B11  T2 = B22 - T1  T3 = B22 - B12  T4 = T2 - B21
+ *   P1 = A11 B11  P2 = A12 B21  P3 = S4 B22  P4 = A22 T4
+ *   P5 = S1 T1    P6 = S2 T2    P7 = S3 T3
+ *   U2 = P1 + P6  U3 = U2 + P7
+ *   C11 += P1 + P2  C12 += U2 + P5 + P3  C21 += U3 - P4  C22 += U3 + P5
+ *
+ * The sums go to x (of A) and y (of B), the products to p, and u accumulates
+ * U2 and then U3, all four in the scratch buffer. An odd last row, column or
+ * inner index is left out of the quadrants and added with dot products.
+ */
+#define DEFINE_STRASSEN_MUL(code, T, suffix)                                                                            \
+    static void strassen_combine_##suffix(int m, int n, const T *x, int ldx, const T *y, int ldy, int sign,            \
+                                          T *z, int ldz, int threads)                                                   \
+    {                                                                                                                   \
+        _Pragma("omp parallel for num_threads(threads) if (threads > 1 && (size_t)m * n > 65536) schedule(static)")    \
+        for (int i = 0; i < m; i++)                                                                                     \
+            for (int j = 0; j < n; j++)                                                                                 \
+            {                                                                                                           \
+                T value = x != NULL ? x[IDX(i, j, ldx)] : 0;                                                            \
+                if (y != NULL)                                                                                          \
+                    value = sign > 0 ? value + y[IDX(i, j, ldy)] : value - y[IDX(i, j, ldy)];                           \
+                z[IDX(i, j, ldz)] = value;                                                                              \
+            }                                                                                                           \
+    }                                                                                                                   \
+                                                                                                                        \
+    static void strassen_rec_##suffix(const T *a, int lda, const T *b, int ldb, T *c, int ldc,                         \
+                                      int m, int k, int n, int cutoff, T *work, int threads)                            \
+    {                                                                                                                   \
+        if (m <= cutoff || k <= cutoff || n <= cutoff)                                                                  \
+        {                                                                                                               \
+            Matrix leaf_a = {m, k, lda, code, (void *)a};                                                               \
+            Matrix leaf_b = {k, n, ldb, code, (void *)b};                                                               \
+            Matrix leaf_c = {m, n, ldc, code, c};                                                                       \
+            zorder_mul_##suffix(&leaf_a, &leaf_b, &leaf_c, MIN(cutoff, STRASSEN_LEAF_BLOCK), threads);                  \
+            return;                                                                                                     \
+        }                                                                                                               \
+                                                                                                                        \
+        int m2 = m / 2, k2 = k / 2, n2 = n / 2;                                                                         \
+        const T *a11 = a, *a12 = a + k2, *a21 = a + IDX(m2, 0, lda), *a22 = a21 + k2;                                   \
+        const T *b11 = b, *b12 = b + n2, *b21 = b + IDX(k2, 0, ldb), *b22 = b21 + n2;                                   \
+        T *c11 = c, *c12 = c + n2, *c21 = c + IDX(m2, 0, ldc), *c22 = c21 + n2;                                         \
+        T *x = work, *y = x + (size_t)m2 * k2, *p = y + (size_t)k2 * n2, *u = p + (size_t)m2 * n2;                      \
+        T *next = u + (size_t)m2 * n2;                                                                                  \
+                                                                                                                        \
+        /* P1 and P2 */                                                                                                 \
+        strassen_combine_##suffix(m2, n2, NULL, 0, NULL, 0, 1, p, n2, threads);                                         \
+        strassen_rec_##suffix(a11, lda, b11, ldb, p, n2, m2, k2, n2, cutoff, next, threads);                            \
+        strassen_combine_##suffix(m2, n2, NULL, 0, p, n2, 1, u, n2, threads);                                           \
+        strassen_combine_##suffix(m2, n2, c11, ldc, p, n2, 1, c11, ldc, threads);                                       \
+        strassen_combine_##suffix(m2, n2, NULL, 0, NULL, 0, 1, p, n2, threads);                                         \
+        strassen_rec_##suffix(a12, lda, b21, ldb, p, n2, m2, k2, n2, cutoff, next, threads);                            \
+        strassen_combine_##suffix(m2, n2, c11, ldc, p, n2, 1, c11, ldc, threads);                                       \
+                                                                                                                        \
+        /* P5 = S1 T1 */                                                                                                \
+        strassen_combine_##suffix(m2, k2, a21, lda, a22, lda, 1, x, k2, threads);                                       \
+        strassen_combine_##suffix(k2, n2, b12, ldb, b11, ldb, -1, y, n2, threads);                                      \
+        strassen_combine_##suffix(m2, n2, NULL, 0, NULL, 0, 1, p, n2, threads);                                         \
+        strassen_rec_##suffix(x, k2, y, n2, p, n2, m2, k2, n2, cutoff, next, threads);                                  \
+        strassen_combine_##suffix(m2, n2, c12, ldc, p, n2, 1, c12, ldc, threads);                                       \
+        strassen_combine_##suffix(m2, n2, c22, ldc, p, n2, 1, c22, ldc, threads);                                       \
+                                                                                                                        \
+        /* U2 = P1 + S2 T2 */                                                                                           \
+        strassen_combine_##suffix(m2, k2, x, k2, a11, lda, -1, x, k2, threads);                                         \
+        strassen_combine_##suffix(k2, n2, b22, ldb, y, n2, -1, y, n2, threads);                                         \
+        strassen_rec_##suffix(x, k2, y, n2, u, n2, m2, k2, n2, cutoff, next, threads);                                  \
+                                                                                                                        \
+        /* P3 = S4 B22 */                                                                                               \
+        strassen_combine_##suffix(m2, k2, a12, lda, x, k2, -1, x, k2, threads);                                         \
+        strassen_combine_##suffix(m2, n2, NULL, 0, NULL, 0, 1, p, n2, threads);                                         \
+        strassen_rec_##suffix(x, k2, b22, ldb, p, n2, m2, k2, n2, cutoff, next, threads);                               \
+        strassen_combine_##suffix(m2, n2, c12, ldc, p, n2, 1, c12, ldc, threads);                                       \
+        strassen_combine_##suffix(m2, n2, c12, ldc, u, n2, 1, c12, ldc, threads);                                       \
+                                                                                                                        \
+        /* U3 = U2 + S3 T3 */                                                                                           \
+        strassen_combine_##suffix(m2, k2, a11, lda, a21, lda, -1, x, k2, threads);                                      \
+        strassen_combine_##suffix(k2, n2, b22, ldb, b12, ldb, -1, y, n2, threads);                                      \
+        strassen_rec_##suffix(x, k2, y, n2, u, n2, m2, k2, n2, cutoff, next, threads);                                  \
+        strassen_combine_##suffix(m2, n2, c21, ldc, u, n2, 1, c21, ldc, threads);                                       \
+        strassen_combine_##suffix(m2, n2, c22, ldc, u, n2, 1, c22, ldc, threads);                                       \
+                                                                                                                        \
+        /* P4 = A22 T4, with T4 = T3 + B11 - B21 */                                                                     \
+        strassen_combine_##suffix(k2, n2, y, n2, b11, ldb, 1, y, n2, threads);                                          \
+        strassen_combine_##suffix(k2, n2, y, n2, b21, ldb, -1, y, n2, threads);                                         \
+        strassen_combine_##suffix(m2, n2, NULL, 0, NULL, 0, 1, p, n2, threads);                                         \
+        strassen_rec_##suffix(a22, lda, y, n2, p, n2, m2, k2, n2, cutoff, next, threads);                               \
+        strassen_combine_##suffix(m2, n2, c21, ldc, p, n2, -1, c21, ldc, threads);                                      \
+                                                                                                                        \
+        /* Odd inner index: rank-1 update of the even part of C */                                                      \
+        if (k % 2 != 0)                                                                                                 \
+            for (int i = 0; i < 2 * m2; i++)                                                                            \
+            {                                                                                                           \
+                T a_ik = a[IDX(i, k - 1, lda)];                                                                         \
+                for (int j = 0; j < 2 * n2; j++)                                                                        \
+                    c[IDX(i, j, ldc)] += a_ik * b[IDX(k - 1, j, ldb)];                                                  \
+            }                                                                                                           \
+                                                                                                                        \
+        /* Odd last column of C, then odd last row (without its last column) */                                         \
+        if (n % 2 != 0)                                                                                                 \
+            for (int i = 0; i < m; i++)                                                                                 \
+            {                                                                                                           \
+                T sum = 0;                                                                                              \
+                for (int kk = 0; kk < k; kk++)                                                                          \
+                    sum += a[IDX(i, kk, lda)] * b[IDX(kk, n - 1, ldb)];                                                 \
+                c[IDX(i, n - 1, ldc)] += sum;                                                                           \
+            }                                                                                                           \
+                                                                                                                        \
+        if (m % 2 != 0)                                                                                                 \
+            for (int kk = 0; kk < k; kk++)                                                                              \
+            {                                                                                                           \
+                T a_mk = a[IDX(m - 1, kk, lda)];                                                                        \
+                for (int j = 0; j < 2 * n2; j++)                                                                        \
+                    c[IDX(m - 1, j, ldc)] += a_mk * b[IDX(kk, j, ldb)];                                                 \
+            }                                                                                                           \
+    }                                                                                                                   \
+                                                                                                                        \
+    static int strassen_mul_##suffix(const Matrix *A, const Matrix *B, Matrix *C, int cutoff, int threads)              \
+    {                                                                                                                   \
+        size_t elements = strassen_workspace(A->rows, A->columns, B->columns, cutoff);                                  \
+        T *work = (T *)pool_alloc(elements * sizeof(T));                                                                \
+                                                                                                                        \
+        if (work == NULL)                                                                                               \
+        {                                                                                                               \
+            fprintf(stderr, "Error: Out of memory\n");                                                                  \
+            return MUL_ERROR_MEMORY;                                                                                    \
+        }                                                                                                               \
+                                                                                                                        \
+        strassen_rec_##suffix(A->data, A->stride, B->data, B->stride, C->data, C->stride,                               \
+                              A->rows, A->columns, B->columns, cutoff, work, threads);                                  \
+        pool_release(work);                                                                                             \
+                                                                                                                        \
+        return MUL_OK;                                                                                                  \
+    }
+
+FOR_EACH_DTYPE(DEFINE_STRASSEN_MUL)
+
+/**
+ * Multiplies two matrices with the Strassen-Winograd algorithm, which needs
+ * O(n^2.81) operations instead of O(n^3). The matrices are split recursively
+ * in quadrants until a dimension is at most cutoff, and those blocks are
+ * multiplied with zorder_mul. A single scratch buffer, allocated once for all
+ * the recursion levels, holds the intermediate sums and products. The leaves
+ * and the additions are distributed among the threads.
+ * Floating-point results may differ slightly from the classic algorithm.
+ * @param A Pointer to the first matrix (M x K).
+ * @param B Pointer to the second matrix (K x N).
+ * @param C Pointer to the resulting matrix (M x N).
+ * @param cutoff Size below which the blocks are multiplied with zorder_mul.
+ * @param num_threads Number of OpenMP threads to use (1 runs serially).
+ * @return MUL_OK or an error code.
+ */
+int strassen_mul(const Matrix *A, const Matrix *B, Matrix *C, int cutoff, int num_threads)
+{
+    int threads = num_threads > 1 ? num_threads : 1;
+    int status = check_dimensions(A, B, C);
+
+    if (status != MUL_OK)
+        return status;
+
+    if (cutoff < 1)
+    {
+        fprintf(stderr, "Error: cutoff must be positive\n");
+        return MUL_ERROR_BLOCK_SIZE;
+    }
+
+    DISPATCH_DTYPE(A->dtype, strassen_mul, A, B, C, cutoff, threads)
+}
+
+/**
+ * Calculates the number of elements stored in a matrix file, padding included.
+ * @param header Header of the file.
+ * @return Number of elements after the header.
+ */
+static size_t matrix_file_elements(const MatrixFileHeader *header)
+{
+    if (header->layout == MATRIX_LAYOUT_TILED)
+    {
+        size_t tile_rows = (size_t)(header->rows + header->tile_size - 1) / header->tile_size;
+        size_t tile_columns = (size_t)(header->columns + header->tile_size - 1) / header->tile_size;
+        return tile_rows * tile_columns * header->tile_size * header->tile_size;
+    }
+
+    return (size_t)header->rows * header->columns;
+}
+
+/**
+ * Creates a zeroed matrix file. The file is sparse until it is written.
+ * @param path Path of the file (overwritten if it exists).
+ * @param rows Number of rows.
+ * @param columns Number of columns.
+ * @param tile_size Side of the tiles, or 0 for the row-major layout.
+ * @param dtype Element type (MATRIX_DTYPE_*).
+ * @return MUL_OK or an error code.
+ */
+int create_matrix_file(const char *path, int rows, int columns, int tile_size, int dtype)
+{
+    MatrixFileHeader header;
+    int fd;
+
+    if (rows < 1 || columns < 1)
+        return MUL_ERROR_DIMENSIONS;
+    if (tile_size < 0)
+        return MUL_ERROR_BLOCK_SIZE;
+    if (dtype_size(dtype) == 0)
+    {
+        fprintf(stderr, "Error: unknown element type %d\n", dtype);
+        return MUL_ERROR_DTYPE;
+    }
+
+    memset(&header, 0, sizeof(header));
+    memcpy(header.magic, MATRIX_FILE_MAGIC, sizeof(header.magic));
+    header.version = MATRIX_FILE_VERSION;
+    header.dtype = (uint32_t)dtype;
+    header.rows = rows;
+    header.columns = columns;
+    header.tile_size = tile_size;
+    header.layout = tile_size > 0 ? MATRIX_LAYOUT_TILED : MATRIX_LAYOUT_ROW_MAJOR;
+
+    fd = open(path, O_RDWR | O_CREAT | O_TRUNC, 0644);
+    if (fd < 0)
+    {
+        fprintf(stderr, "Error: cannot create %s\n", path);
+        return MUL_ERROR_FILE;
+    }
+
+    if (write(fd, &header, sizeof(header)) != (ssize_t)sizeof(header) ||
+        ftruncate(fd, (off_t)(sizeof(header) + matrix_file_elements(&header) * dtype_size(dtype))) != 0)
+    {
+        fprintf(stderr, "Error: cannot write %s\n", path);
+        close(fd);
+        return MUL_ERROR_FILE;
+    }
+
+    close(fd);
+    return MUL_OK;
+}
+
+/**
+ * Maps a matrix file in memory, checking its header.
+ * @param path Path of the file.
+ * @param writable Nonzero to map it for reading and writing.
+ * @return Pointer to the mapped matrix, or NULL on error.
+ */
+MappedMatrix *map_matrix_file(const char *path, int writable)
+{
+    MappedMatrix *matrix;
+    struct stat status;
+    int fd = open(path, writable ? O_RDWR : O_RDONLY);
+
+    if (fd < 0 || fstat(fd, &status) != 0 || (size_t)status.st_size < sizeof(MatrixFileHeader))
+    {
+        fprintf(stderr, "Error: cannot read %s\n", path);
+        if (fd >= 0)
+            close(fd);
+        return NULL;
+    }
+
+    matrix = (MappedMatrix *)malloc(sizeof(MappedMatrix));
+    if (matrix == NULL)
+    {
+        fprintf(stderr, "Error: Out of memory\n");
+        close(fd);
+        return NULL;
+    }
+
+    matrix->length = (size_t)status.st_size;
+    matrix->map = mmap(NULL, matrix->length, writable ? PROT_READ | PROT_WRITE : PROT_READ, MAP_SHARED, fd, 0);
+    close(fd);
+    if (matrix->map == MAP_FAILED)
+    {
+        fprintf(stderr, "Error: cannot map %s\n", path);
+        free(matrix);
+        return NULL;
+    }
+
+    memcpy(&matrix->header, matrix->map, sizeof(MatrixFileHeader));
+    matrix->data = (char *)matrix->map + MATRIX_FILE_HEADER;
+
+    if (memcmp(matrix->header.magic, MATRIX_FILE_MAGIC, sizeof(matrix->header.magic)) != 0 ||
+        matrix->header.version != MATRIX_FILE_VERSION || dtype_size((int)matrix->header.dtype) == 0 ||
+        (matrix->header.layout == MATRIX_LAYOUT_TILED && matrix->header.tile_size < 1) ||
+        MATRIX_FILE_HEADER + matrix_file_elements(&matrix->header) * dtype_size((int)matrix->header.dtype) > matrix->length)
+    {
+        fprintf(stderr, "Error: %s is not a valid matrix file\n", path);
+        munmap(matrix->map, matrix->length);
+        free(matrix);
+        return NULL;
+    }
+
+    return matrix;
+}
+
+/**
+ * Unmaps a matrix file mapped with map_matrix_file.
+ * Changes to writable mappings reach the file.
+ * @param matrix Pointer to the mapped matrix.
+ */
+void unmap_matrix_file(MappedMatrix *matrix)
+{
+    if (matrix != NULL)
+    {
+        munmap(matrix->map, matrix->length);
+        free(matrix);
+    }
+}
+
+/**
+ * Drops the pages of a range of a mapping from the working set of the process.
+ * Only the pages entirely inside the range are released; file-backed pages are
+ * read back (or were already written back) when they are needed again.
+ * @param start Start of the range.
+ * @param length Length in bytes of the range.
+ */
+static void release_pages(void *start, size_t length)
+{
+#ifdef MADV_DONTNEED
+    uintptr_t page = (uintptr_t)sysconf(_SC_PAGESIZE);
+    uintptr_t first = ((uintptr_t)start + page - 1) / page * page;
+    uintptr_t last = ((uintptr_t)start + length) / page * page;
+
+    if (last > first)
+        madvise((void *)first, last - first, MADV_DONTNEED);
+#else
+    (void)start;
+    (void)length;
+#endif
+}
+
+/*
+ * Out-of-core multiplication of tiled matrix files with elements of type T
+ * (see out_of_core_mul). Tiles are multiplied with morton_tile_mul_<suffix>.
+ */
+#define DEFINE_OUT_OF_CORE_MUL(code, T, suffix)                                                                    \
+    static int out_of_core_mul_##suffix(const MappedMatrix *A, const MappedMatrix *B, MappedMatrix *C, int threads) \
+    {                                                                                                              \
+        int tile_size = A->header.tile_size;                                                                       \
+        int tile_rows = (A->header.rows + tile_size - 1) / tile_size;                                              \
+        int tile_inner = (A->header.columns + tile_size - 1) / tile_size;                                          \
+        int tile_columns = (B->header.columns + tile_size - 1) / tile_size;                                        \
+        size_t tile_area = (size_t)tile_size * tile_size;                                                          \
+        const T *a_data = A->data, *b_data = B->data;                                                              \
+        T *c_data = C->data;                                                                                       \
+        int status = MUL_OK;                                                                                       \
+                                                                                                                   \
+        for (int ti = 0; ti < tile_rows && status == MUL_OK; ti++)                                                 \
+        {                                                                                                          \
+            _Pragma("omp parallel num_threads(threads) if (threads > 1)")                                          \
+            {                                                                                                      \
+                T *c_tile = (T *)malloc(tile_area * sizeof(T));                                                    \
+                                                                                                                   \
+                if (c_tile == NULL)                                                                                \
+                {                                                                                                  \
+                    _Pragma("omp atomic write")                                                                    \
+                    status = MUL_ERROR_MEMORY;                                                                     \
+                }                                                                                                  \
+                                                                                                                   \
+                _Pragma("omp for schedule(dynamic)")                                                               \
+                for (int tj = 0; tj < tile_columns; tj++)                                                          \
+                {                                                                                                  \
+                    if (c_tile == NULL)                                                                            \
+                        continue;                                                                                  \
+                                                                                                                   \
+                    memset(c_tile, 0, tile_area * sizeof(T));                                                      \
+                    for (int tk = 0; tk < tile_inner; tk++)                                                        \
+                        morton_tile_mul_##suffix(a_data + ((size_t)ti * tile_inner + tk) * tile_area,              \
+                                                 b_data + ((size_t)tk * tile_columns + tj) * tile_area,            \
+                                                 c_tile, tile_size);                                               \
+                    memcpy(c_data + ((size_t)ti * tile_columns + tj) * tile_area, c_tile, tile_area * sizeof(T));  \
+                }                                                                                                  \
+                                                                                                                   \
+                free(c_tile);                                                                                      \
+            }                                                                                                      \
+                                                                                                                   \
+            release_pages((void *)(a_data + (size_t)ti * tile_inner * tile_area),                                  \
+                          (size_t)tile_inner * tile_area * sizeof(T));                                             \
+            release_pages(c_data + (size_t)ti * tile_columns * tile_area,                                          \
+                          (size_t)tile_columns * tile_area * sizeof(T));                                           \
+        }                                                                                                          \
+                                                                                                                   \
+        if (status == MUL_ERROR_MEMORY)                                                                            \
+            fprintf(stderr, "Error: Out of memory\n");                                                             \
+        return status;                                                                                             \
+    }
+
+FOR_EACH_DTYPE(DEFINE_OUT_OF_CORE_MUL)
+
+/**
+ * Calls the version of the out-of-core multiplication for the element type of A.
+ * @param A First matrix, mapped for reading.
+ * @param B Second matrix, mapped for reading.
+ * @param C Resulting matrix, mapped for writing.
+ * @param threads Number of OpenMP threads to use.
+ * @return MUL_OK or an error code.
+ */
+static int out_of_core_tiles(const MappedMatrix *A, const MappedMatrix *B, MappedMatrix *C, int threads)
+{
+    DISPATCH_DTYPE((int)A->header.dtype, out_of_core_mul, A, B, C, threads)
+}
+
+/**
+ * Multiplies two matrix files in tiled layout out of core, storing the result
+ * in a third one. Tiles of A and B are read through their mappings and every
+ * tile of C is accumulated in a buffer of its thread, so only a row of tiles
+ * of A and C and the tiles of B in use have to be in memory; rows of tiles are
+ * released when they are finished. Tiles of C are distributed among the threads.
+ * @param a_path Path of the first matrix (M x K).
+ * @param b_path Path of the second matrix (K x N).
+ * @param c_path Path of the resulting matrix (M x N), created with create_matrix_file.
+ * @param num_threads Number of OpenMP threads to use (1 runs serially).
+ * @return MUL_OK or an error code.
+ */
+int out_of_core_mul(const char *a_path, const char *b_path, const char *c_path, int num_threads)
+{
+    MappedMatrix *A = map_matrix_file(a_path, 0);
+    MappedMatrix *B = map_matrix_file(b_path, 0);
+    MappedMatrix *C = map_matrix_file(c_path, 1);
+    int threads = num_threads > 1 ? num_threads : 1;
+    int status = MUL_OK;
+
+    if (A == NULL || B == NULL || C == NULL)
+        status = MUL_ERROR_FILE;
+    else if (A->header.columns != B->header.rows || C->header.rows != A->header.rows ||
+             C->header.columns != B->header.columns)
+    {
+        fprintf(stderr, "Error: incompatible matrix dimensions\n");
+        status = MUL_ERROR_DIMENSIONS;
+    }
+    else if (A->header.layout != MATRIX_LAYOUT_TILED || B->header.layout != MATRIX_LAYOUT_TILED ||
+             C->header.layout != MATRIX_LAYOUT_TILED || A->header.tile_size != B->header.tile_size ||
+             A->header.tile_size != C->header.tile_size)
+    {
+        fprintf(stderr, "Error: out-of-core multiplication needs tiled files with the same tile size\n");
+        status = MUL_ERROR_BLOCK_SIZE;
+    }
+    else if (A->header.dtype != B->header.dtype || A->header.dtype != C->header.dtype)
+    {
+        fprintf(stderr, "Error: matrices of different element types\n");
+        status = MUL_ERROR_DTYPE;
+    }
+
+    if (status == MUL_OK)
+        status = out_of_core_tiles(A, B, C, threads);
+
+    unmap_matrix_file(A);
+    unmap_matrix_file(B);
+    unmap_matrix_file(C);
+
+    return status;
+}
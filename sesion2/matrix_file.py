@@ -0,0 +1,165 @@
+import os
+import sys
+import time
+import numpy as np
+from multiply_matrices_hybrid_pro import lib
+from utils import verify_multiplication, DTYPES as ELEMENT_TYPES
+
+# Header of the matrix files (mirrors MatrixFileHeader in liboperations.c)
+HEADER = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("dtype", "<u4"),
+    ("rows", "<i4"),
+    ("columns", "<i4"),
+    ("tile_size", "<i4"),
+    ("layout", "<i4"),
+    ("reserved", "V32"),
+])
+
+MAGIC = b"CAPMATRX"
+VERSION = 1
+
+# Element types by their code in the header
+DTYPES = {code: np.dtype(np_dtype).newbyteorder("<") for code, np_dtype, _ in ELEMENT_TYPES.values()}
+
+# Layouts: rows one after another, or a row-major grid of row-major tiles
+# (edge tiles padded with zeros)
+ROW_MAJOR = 0
+TILED = 1
+
+def read_header(path: str) -> np.void:
+    """Read and check the header of a matrix file."""
+    header = np.fromfile(path, dtype=HEADER, count=1)
+    if len(header) != 1 or header[0]["magic"] != MAGIC or header[0]["version"] != VERSION:
+        raise ValueError(f"{path} is not a matrix file.")
+    if header[0]["dtype"] not in DTYPES:
+        raise ValueError(f"{path} has an unknown element type.")
+    return header[0]
+
+def tile_grid(rows: int, columns: int, tile_size: int) -> tuple:
+    """Number of rows and columns of tiles of a tiled matrix."""
+    return -(-rows // tile_size), -(-columns // tile_size)
+
+def create_matrix(path: str, rows: int, columns: int, tile_size: int = 0, dtype: str = "int32") -> None:
+    """Create a zeroed matrix file (sparse until it is written).
+
+    Args:
+        path (str): Path of the file (overwritten if it exists).
+        rows (int): Number of rows.
+        columns (int): Number of columns.
+        tile_size (int): Side of the tiles, or 0 for the row-major layout.
+        dtype (str): Element type (a key of utils.DTYPES).
+    """
+    lib.create_matrix_file(os.fsencode(path), rows, columns, tile_size, ELEMENT_TYPES[dtype][0])
+
+def open_matrix(path: str, mode: str = "r") -> np.memmap:
+    """Map the data of a matrix file with np.memmap.
+    Row-major files are mapped as rows x columns arrays; tiled files as
+    arrays of tile_rows x tile_columns x tile_size x tile_size.
+
+    Args:
+        path (str): Path of the file.
+        mode (str): 'r' to read or 'r+' to read and write.
+
+    Returns:
+        np.memmap: Data of the matrix.
+    """
+    header = read_header(path)
+    rows, columns, tile_size = int(header["rows"]), int(header["columns"]), int(header["tile_size"])
+    if header["layout"] == TILED:
+        shape = tile_grid(rows, columns, tile_size) + (tile_size, tile_size)
+    else:
+        shape = (rows, columns)
+    return np.memmap(path, dtype=DTYPES[int(header["dtype"])], mode=mode, offset=HEADER.itemsize, shape=shape)
+
+def store_band(tiles: np.ndarray, tile_row: int, band: np.ndarray) -> None:
+    """Store a band of tile_size rows (fewer in the last one) in a row of tiles."""
+    tile_size = tiles.shape[2]
+    padded = np.zeros((tile_size, tiles.shape[1] * tile_size), dtype=tiles.dtype)
+    padded[:band.shape[0], :band.shape[1]] = band
+    tiles[tile_row] = padded.reshape(tile_size, tiles.shape[1], tile_size).transpose(1, 0, 2)
+
+def load_band(tiles: np.ndarray, tile_row: int, rows: int, columns: int) -> np.ndarray:
+    """Load a row of tiles as a band of rows, without the padding."""
+    tile_size = tiles.shape[2]
+    band = tiles[tile_row].transpose(1, 0, 2).reshape(tile_size, -1)
+    return band[:min(tile_size, rows - tile_row * tile_size), :columns]
+
+def write_matrix(path: str, array: np.ndarray, tile_size: int = 0) -> None:
+    """Write a 2-D array of one of the element types to a matrix file,
+    row-major or in tiles of tile_size."""
+    rows, columns = array.shape
+    create_matrix(path, rows, columns, tile_size, array.dtype.name)
+    data = open_matrix(path, "r+")
+    if tile_size > 0:
+        for tile_row in range(data.shape[0]):
+            store_band(data, tile_row, array[tile_row * tile_size:(tile_row + 1) * tile_size])
+    else:
+        data[:] = array
+    data.flush()
+
+def read_matrix(path: str) -> np.ndarray:
+    """Read a matrix file into a row-major array in memory."""
+    header = read_header(path)
+    rows, columns = int(header["rows"]), int(header["columns"])
+    data = open_matrix(path)
+    if header["layout"] != TILED:
+        return np.array(data)
+    return np.concatenate([load_band(data, tile_row, rows, columns) for tile_row in range(data.shape[0])])
+
+def random_matrix(path: str, rows: int, columns: int, tile_size: int, seed: int = 0, dtype: str = "int32") -> None:
+    """Create a tiled matrix file with random values in [0, 9], one row of
+    tiles at a time so that matrices larger than memory can be generated."""
+    rng = np.random.default_rng(seed)
+    create_matrix(path, rows, columns, tile_size, dtype)
+    data = open_matrix(path, "r+")
+    for tile_row in range(data.shape[0]):
+        band_rows = min(tile_size, rows - tile_row * tile_size)
+        store_band(data, tile_row, rng.integers(0, 10, size=(band_rows, columns)).astype(data.dtype))
+        data.flush()
+
+def out_of_core_mul(a_path: str, b_path: str, c_path: str, num_threads: int = 1) -> None:
+    """Multiply two tiled matrix files with the C library without loading them
+    in memory, writing the product to a new tiled file of their element type.
+
+    Args:
+        a_path (str): Path of the first matrix (M x K).
+        b_path (str): Path of the second matrix (K x N).
+        c_path (str): Path of the resulting matrix (M x N), overwritten if it exists.
+        num_threads (int): Number of OpenMP threads used by the C kernel.
+    """
+    a_header, b_header = read_header(a_path), read_header(b_path)
+    create_matrix(c_path, int(a_header["rows"]), int(b_header["columns"]), int(a_header["tile_size"]),
+                  DTYPES[int(a_header["dtype"])].name)
+    lib.out_of_core_mul(os.fsencode(a_path), os.fsencode(b_path), os.fsencode(c_path), num_threads)
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4, 5, 6):
+        print("Usage: python matrix_file.py <matrix_size> <tile_size> [num_threads] [directory] [dtype]")
+        sys.exit(1)
+
+    matrix_size = int(sys.argv[1])
+    tile_size = int(sys.argv[2])
+    num_threads = int(sys.argv[3]) if len(sys.argv) >= 4 else 1
+    directory = sys.argv[4] if len(sys.argv) >= 5 else "."
+    dtype = sys.argv[5] if len(sys.argv) == 6 else "int32"
+
+    paths = [os.path.join(directory, f"{name}_{matrix_size}_{tile_size}.mat") for name in ("A", "B", "C")]
+
+    start = time.time()
+    random_matrix(paths[0], matrix_size, matrix_size, tile_size, seed=0, dtype=dtype)
+    random_matrix(paths[1], matrix_size, matrix_size, tile_size, seed=1, dtype=dtype)
+    print(f"Generation: {time.time() - start:.6f} s")
+
+    start = time.time()
+    out_of_core_mul(*paths, num_threads)
+    print(f"Out-of-core multiplication: {time.time() - start:.6f} s")
+
+    # Checking the product needs the three matrices in memory
+    if matrix_size <= 2048:
+        assert verify_multiplication(read_matrix(paths[0]), read_matrix(paths[1]), read_matrix(paths[2])), "Error in out-of-core multiplication"
+        print("Verification: OK")
+
+    for path in paths:
+        os.remove(path)
@@ -1,8 +1,12 @@
 import sys
 import random
 import time
-from utils import verify_multiplication, print_matrix
-from typing import List, Tuple
+import itertools
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+from utils import verify_multiplication, print_matrix, StageTimes, timed, operand_cache
+from typing import Dict, List, Tuple
 
 def generate_matrix(rows, cols) -> List[List[int]]:
     """Create an array in Python as a list of lists."""
@@ -11,124 +15,421 @@ def generate_matrix(rows, cols) -> List[List[int]]:
 def row_major_mul(a: List[List[int]], b: List[List[int]], c: List[List[int]]) -> None:
     """Multiplication of matrices in row-major order."""
     rows = len(a)
+    inner = len(b)
     columns = len(b[0])
     for i in range(rows):
         for j in range(columns):
-            for k in range(columns):
+            for k in range(inner):
                 c[i][j] += a[i][k] * b[k][j]
  
 def column_major_mul(a: List[List[int]], b: List[List[int]], c: List[List[int]]) -> None:
     """Multiplication of matrices in column-major order."""
     rows = len(a)
+    inner = len(b)
     columns = len(b[0])
     for j in range(columns):
         for i in range(rows):
-            for k in range(columns):
+            for k in range(inner):
                 c[i][j] += a[i][k] * b[k][j]
 
+def ikj_mul(a: List[List[int]], b: List[List[int]], c: List[List[int]]) -> None:
+    """Multiplication of matrices in i-k-j order (rows of B and C are walked contiguously)."""
+    rows = len(a)
+    inner = len(b)
+    columns = len(b[0])
+    for i in range(rows):
+        for k in range(inner):
+            for j in range(columns):
+                c[i][j] += a[i][k] * b[k][j]
+
+def transposed_mul(a: List[List[int]], b: List[List[int]], c: List[List[int]]) -> None:
+    """Multiplication of matrices transposing B first (dot products of rows of A and B^T)."""
+    rows = len(a)
+    inner = len(b)
+    columns = len(b[0])
+    bt = [list(column) for column in zip(*b)]
+    for i in range(rows):
+        for j in range(columns):
+            for k in range(inner):
+                c[i][j] += a[i][k] * bt[j][k]
+
 def zorder_mul(a: List[List[int]], b: List[List[int]], c: List[List[int]], block_size: int) -> None:
-    """Matrix multiplication in Z order (Morton Order)."""
+    """Matrix multiplication in Z order (Morton Order).
+    The block size does not need to divide the dimensions: edge blocks are smaller."""
     rows = len(a)
+    inner = len(b)
     columns = len(b[0])
     
-    if (rows % block_size != 0) or (columns % block_size != 0):
-        raise ValueError("Matrix size must be divisible by block size.")
+    if block_size < 1:
+        raise ValueError("Block size must be positive.")
         
     for i in range(0, rows, block_size):
         for j in range(0, columns, block_size):
-            for k in range(0, columns, block_size):
+            for k in range(0, inner, block_size):
                 for ii in range(i, min(i + block_size, rows)):
                     for jj in range(j, min(j + block_size, columns)):
-                        for kk in range(k, min(k + block_size, columns)):
+                        for kk in range(k, min(k + block_size, inner)):
                             c[ii][jj] += a[ii][kk] * b[kk][jj]
 
-def run_phase_1_row_col(matrix_size: int) -> Tuple[float, float]:
+def morton_tiles(size: int, tile_size: int) -> int:
+    """Number of tiles per side of a matrix in Z order: the smallest power of two covering it."""
+    if tile_size < 1:
+        raise ValueError("Block size must be positive.")
+    tiles = 1
+    while tiles * tile_size < size:
+        tiles *= 2
+    return tiles
+
+def morton_index(i: int, j: int) -> int:
+    """Position of tile (i, j) along the Z curve (interleaved bits, row bit first)."""
+    index = 0
+    bit = 0
+    while i or j:
+        index |= ((j & 1) << (2 * bit)) | ((i & 1) << (2 * bit + 1))
+        i >>= 1
+        j >>= 1
+        bit += 1
+    return index
+
+def to_morton(matrix: List[List[int]], tile_size: int, size: int = 0) -> List[int]:
+    """Copy a matrix into a flat buffer of row-major tiles stored in Z order.
+    The buffer covers a size x size matrix (by default the largest dimension of
+    the matrix); all the operands of a multiplication must share it."""
+    rows = len(matrix)
+    columns = len(matrix[0]) if rows else 0
+    tiles = morton_tiles(size or max(rows, columns), tile_size)
+    tile_area = tile_size * tile_size
+    buffer = [0] * (tiles * tiles * tile_area)
+    for i in range(rows):
+        for j in range(columns):
+            offset = morton_index(i // tile_size, j // tile_size) * tile_area
+            buffer[offset + (i % tile_size) * tile_size + j % tile_size] = matrix[i][j]
+    return buffer
+
+def from_morton(buffer: List[int], matrix: List[List[int]], tile_size: int) -> None:
+    """Copy a Z order buffer back into a matrix, dropping the padding."""
+    rows = len(matrix)
+    columns = len(matrix[0]) if rows else 0
+    tile_area = tile_size * tile_size
+    for i in range(rows):
+        for j in range(columns):
+            offset = morton_index(i // tile_size, j // tile_size) * tile_area
+            matrix[i][j] = buffer[offset + (i % tile_size) * tile_size + j % tile_size]
+
+def morton_mul_buffers(a: List[int], b: List[int], c: List[int], shape: Tuple[int, int, int], tile_size: int,
+                       tiles: int = 0, offset_a: int = 0, offset_b: int = 0, offset_c: int = 0,
+                       ti: int = 0, tj: int = 0, tk: int = 0) -> None:
+    """Multiplication of Z order buffers splitting them recursively in quadrants.
+    shape is (M, K, N) for an M x K by K x N product. The four quadrants of a
+    Z order buffer are contiguous: top-left, top-right, bottom-left and
+    bottom-right. Products of quadrants lying entirely in the padding are skipped."""
+    rows, inner, columns = shape
+    if tiles == 0:
+        tiles = morton_tiles(max(shape), tile_size)
+    if ti * tile_size >= rows or tj * tile_size >= columns or tk * tile_size >= inner:
+        return
+
+    if tiles == 1:
+        for i in range(tile_size):
+            for k in range(tile_size):
+                for j in range(tile_size):
+                    c[offset_c + i * tile_size + j] += a[offset_a + i * tile_size + k] * b[offset_b + k * tile_size + j]
+        return
+
+    half = tiles // 2
+    quadrant = half * half * tile_size * tile_size
+    for i in range(2):
+        for j in range(2):
+            for k in range(2):
+                morton_mul_buffers(a, b, c, shape, tile_size, half,
+                                   offset_a + (2 * i + k) * quadrant,
+                                   offset_b + (2 * k + j) * quadrant,
+                                   offset_c + (2 * i + j) * quadrant,
+                                   ti + i * half, tj + j * half, tk + k * half)
+
+def morton_mul(a: List[List[int]], b: List[List[int]], c: List[List[int]], tile_size: int) -> None:
+    """Matrix multiplication over matrices stored in Z order (Morton order)."""
+    shape = (len(a), len(b), len(b[0]))
+    c_morton = to_morton(c, tile_size, max(shape))
+    morton_mul_buffers(to_morton(a, tile_size, max(shape)), to_morton(b, tile_size, max(shape)), c_morton, shape, tile_size)
+    from_morton(c_morton, c, tile_size)
+
+# Non-blocked algorithms by the name used in the benchmark output
+algorithms = {
+    "row": row_major_mul,
+    "col": column_major_mul,
+    "ikj": ikj_mul,
+    "trn": transposed_mul
+}
+
+# Worker pools by number of workers, kept alive between multiplications
+_executors: Dict[int, ProcessPoolExecutor] = {}
+
+def _get_executor(num_workers: int) -> ProcessPoolExecutor:
+    """Process pool with the given number of workers, created on first use.
+    Workers are forked so they share the resource tracker of this process,
+    which then unlinks each shared memory block exactly once."""
+    if num_workers not in _executors:
+        _executors[num_workers] = ProcessPoolExecutor(max_workers=num_workers, mp_context=get_context("fork"))
+    return _executors[num_workers]
+
+def _multiply_band(names: Tuple[str, str, str], shape: Tuple[int, int, int], algorithm: str,
+                   block_size: int, first: int, last: int) -> None:
+    """Worker: multiply rows [first, last) of A by B and store them in the shared C.
+    The band of A and the whole B are read from shared memory into lists once,
+    so the same pure Python kernels are used as in the serial mode."""
+    rows, inner, columns = shape
+    shm_a, shm_b, shm_c = (shared_memory.SharedMemory(name=name) for name in names)
+    try:
+        with shm_a.buf.cast("q") as a_flat, shm_b.buf.cast("q") as b_flat, shm_c.buf.cast("q") as c_flat:
+            a_band = a_flat[first * inner:last * inner].tolist()
+            b_flat = b_flat.tolist()
+            a = [a_band[i * inner:(i + 1) * inner] for i in range(last - first)]
+            b = [b_flat[k * columns:(k + 1) * columns] for k in range(inner)]
+            c = [[0] * columns for _ in range(last - first)]
+
+            if algorithm == "zor":
+                zorder_mul(a, b, c, block_size)
+            else:
+                algorithms[algorithm](a, b, c)
+
+            c_flat[first * columns:last * columns] = array("q", itertools.chain.from_iterable(c))
+    finally:
+        shm_a.close()
+        shm_b.close()
+        shm_c.close()
+
+def _to_shared(matrix: List[List[int]]) -> shared_memory.SharedMemory:
+    """Copy a matrix into a new shared memory block of 64-bit integers (row-major)."""
+    rows = len(matrix)
+    columns = len(matrix[0]) if rows else 0
+    shm = shared_memory.SharedMemory(create=True, size=max(1, rows * columns) * 8)
+    with shm.buf.cast("q") as flat:
+        flat[:rows * columns] = array("q", itertools.chain.from_iterable(matrix))
+    return shm
+
+def parallel_mul(a: List[List[int]], b: List[List[int]], c: List[List[int]], algorithm: str,
+                 num_workers: int, block_size: int = 0) -> None:
+    """Matrix multiplication split in bands of rows of C among worker processes.
+    A and B are shared with the workers through shared memory instead of being
+    pickled, and every worker writes its band of C to a shared buffer. With the
+    'zor' algorithm the bands are made of whole rows of blocks, so every Z order
+    tile is computed by a single worker. Elements must fit in 64-bit integers.
+
+    Args:
+        a (List[List[int]]): First matrix (M x K).
+        b (List[List[int]]): Second matrix (K x N).
+        c (List[List[int]]): Resulting matrix (M x N), accumulated like in the serial kernels.
+        algorithm (str): Algorithm to use in the workers ('row', 'col', 'ikj', 'trn' or 'zor').
+        num_workers (int): Number of worker processes.
+        block_size (int): Block size for Z-order multiplication.
+    """
+    shape = (len(a), len(b), len(b[0]))
+    rows, _, columns = shape
+    if algorithm == "zor" and block_size < 1:
+        raise ValueError("Block size must be positive.")
+
+    band = -(-rows // max(1, num_workers))
+    if algorithm == "zor":
+        band = -(-band // block_size) * block_size
+
+    # Every worker overwrites its whole band of the shared C
+    shms = [_to_shared(a), _to_shared(b), shared_memory.SharedMemory(create=True, size=max(1, rows * columns) * 8)]
+    try:
+        names = tuple(shm.name for shm in shms)
+        executor = _get_executor(num_workers)
+        futures = [executor.submit(_multiply_band, names, shape, algorithm, block_size, first, min(first + band, rows))
+                   for first in range(0, rows, band)]
+        for future in futures:
+            future.result()
+
+        with shms[2].buf.cast("q") as c_flat:
+            c_values = c_flat[:rows * columns].tolist()
+        for i in range(rows):
+            row = c[i]
+            for j in range(columns):
+                row[j] += c_values[i * columns + j]
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+
+def generate_operands(matrix_size: int, seed: int) -> Tuple[List[List[int]], List[List[int]]]:
+    """Seeded operands of the operand cache as lists of Python lists."""
+    A, B = operand_cache.get(matrix_size, seed)
+    return A.tolist(), B.tolist()
+
+def run_phase_1_row_col(matrix_size: int, algorithm: str, num_workers: int = 1, seed: int = 0) -> StageTimes:
     """Run phase 1 of the experiment with validation.
-    This function measures the execution time of matrix multiplication using
-    row-major and column-major algorithms in Python.
+    This function measures the time of every stage of a matrix multiplication
+    using a non-blocked algorithm in Python.
 
     Args:
         matrix_size (int): Size of the matrix.
+        algorithm (str): Algorithm to use for multiplication ('row', 'col', 'ikj' or 'trn').
+        num_workers (int): Number of worker processes (1 runs in this process).
+        seed (int): Seed of the operands, shared through utils.operand_cache.
 
     Returns:
-        Tuple[float, float]: Execution times in seconds for row-major 
-        and column-major multiplications.
+        StageTimes: Time in seconds of every stage.
     """
-    A = generate_matrix(matrix_size, matrix_size)
-    B = generate_matrix(matrix_size, matrix_size)
+    times = StageTimes()
 
-    c_row = [[0] * matrix_size for _ in range(matrix_size)]
-    c_col = [[0] * matrix_size for _ in range(matrix_size)]
+    with timed(times, "generate"):
+        A, B = generate_operands(matrix_size, seed)
 
-    start_row = time.time()
-    row_major_mul(A, B, c_row)
-    exec_time_row = time.time() - start_row
+    with timed(times, "allocate"):
+        C = [[0] * matrix_size for _ in range(matrix_size)]
 
-    start_col = time.time()
-    column_major_mul(A, B, c_col)
-    exec_time_col = time.time() - start_col
+    with timed(times, "compute"):
+        if num_workers > 1:
+            parallel_mul(A, B, C, algorithm, num_workers)
+        else:
+            algorithms[algorithm](A, B, C)
 
-    assert verify_multiplication(A, B, c_row), "Error in row-major multiplication!"
-    assert verify_multiplication(A, B, c_col), "Error in column-major multiplication!"
+    with timed(times, "verify"):
+        assert verify_multiplication(A, B, C), f"Error in {algorithm} multiplication!"
 
-    return exec_time_row, exec_time_col
+    return times
  
-def run_phase_1_zorder(matrix_size: int, block_size: int) -> float:
+def run_phase_1_zorder(matrix_size: int, block_size: int, num_workers: int = 1, seed: int = 0) -> StageTimes:
     """Run phase 1 of the experiment with validation.
-    This function measures the execution time of matrix multiplication using
-    Z-order algorithm in Python.
+    This function measures the time of every stage of a matrix multiplication
+    using Z-order algorithm in Python.
 
     Args:
         matrix_size (int): Size of the matrix.
         block_size (int): Block size for Z-order multiplication.
+        num_workers (int): Number of worker processes (1 runs in this process).
+        seed (int): Seed of the operands, shared through utils.operand_cache.
 
     Returns:
-        float: Execution time in seconds.
+        StageTimes: Time in seconds of every stage.
     """
-    A = generate_matrix(matrix_size, matrix_size)
-    B = generate_matrix(matrix_size, matrix_size)
+    times = StageTimes()
 
-    C = [[0] * matrix_size for _ in range(matrix_size)]
+    with timed(times, "generate"):
+        A, B = generate_operands(matrix_size, seed)
 
-    start = time.time()
-    zorder_mul(A, B, C, block_size)
-    exec_time = time.time() - start
+    with timed(times, "allocate"):
+        C = [[0] * matrix_size for _ in range(matrix_size)]
 
-    assert verify_multiplication(A, B, C), "Error in Z order multiplication!"
+    with timed(times, "compute"):
+        if num_workers > 1:
+            parallel_mul(A, B, C, "zor", num_workers, block_size)
+        else:
+            zorder_mul(A, B, C, block_size)
+
+    with timed(times, "verify"):
+        assert verify_multiplication(A, B, C), "Error in Z order multiplication!"
     
-    return exec_time
+    return times
     
+def run_phase_1_morton(matrix_size: int, block_size: int, seed: int = 0) -> StageTimes:
+    """Run phase 1 of the experiment with validation.
+    This function measures the time of every stage of a matrix multiplication
+    over matrices stored in Z order in Python. The conversions to and from
+    Z order are the marshalling stages.
+
+    Args:
+        matrix_size (int): Size of the matrix.
+        block_size (int): Size of the tiles of the Z order layout.
+        seed (int): Seed of the operands, shared through utils.operand_cache.
+
+    Returns:
+        StageTimes: Time in seconds of every stage.
+    """
+    times = StageTimes()
+
+    with timed(times, "generate"):
+        A, B = generate_operands(matrix_size, seed)
+
+    with timed(times, "allocate"):
+        C = [[0] * matrix_size for _ in range(matrix_size)]
+
+    with timed(times, "marshal_in"):
+        a_morton = to_morton(A, block_size)
+        b_morton = to_morton(B, block_size)
+        c_morton = to_morton(C, block_size)
+
+    with timed(times, "compute"):
+        morton_mul_buffers(a_morton, b_morton, c_morton, (matrix_size, matrix_size, matrix_size), block_size)
+
+    with timed(times, "marshal_out"):
+        from_morton(c_morton, C, block_size)
+
+    with timed(times, "verify"):
+        assert verify_multiplication(A, B, C), "Error in Morton order multiplication!"
+
+    return times
+
 if __name__ == "__main__":  
-    if len(sys.argv) != 4:
-        print("Usage: python 2-multiply_matrices.py <rows> <columns> <block_size>")
+    if len(sys.argv) not in (4, 5):
+        print("Usage: python 2-multiply_matrices.py <rows> <columns> <block_size> [num_workers]")
         sys.exit(1)
     
     # Get matrices size
     rows = int(sys.argv[1])
     columns = int(sys.argv[2])
     block_size = int(sys.argv[3])
+    num_workers = int(sys.argv[4]) if len(sys.argv) == 5 else 1
     
-    # Generate random matrices
+    # Generate random matrices (A is rows x columns and B is columns x rows)
     A = generate_matrix(rows, columns)
-    B = generate_matrix(rows, columns)
+    B = generate_matrix(columns, rows)
     
     # Row-major order matrix multiplication
-    C_rows = [[0] * columns for _ in range(rows)] # Initialize C_rows with zeros
+    C_rows = [[0] * rows for _ in range(rows)] # Initialize C_rows with zeros
     start = time.time()
     row_major_mul(A, B, C_rows)
     print(f"Row-major order: {time.time() - start:.6f} seconds")
     print_matrix(C_rows)
     
     # Column-major order matrix multiplication
-    C_columns = [[0] * columns for _ in range(rows)] # Initialize C_columns with zeros
+    C_columns = [[0] * rows for _ in range(rows)] # Initialize C_columns with zeros
     start = time.time()
     column_major_mul(A, B, C_columns)
     print(f"Column-major order: {time.time() - start:.6f} seconds")
     print_matrix(C_columns)
     
+    # i-k-j order matrix multiplication
+    C_ikj = [[0] * rows for _ in range(rows)] # Initialize C_ikj with zeros
+    start = time.time()
+    ikj_mul(A, B, C_ikj)
+    print(f"i-k-j order: {time.time() - start:.6f} seconds")
+    print_matrix(C_ikj)
+    
+    # Transposed B matrix multiplication
+    C_transposed = [[0] * rows for _ in range(rows)] # Initialize C_transposed with zeros
+    start = time.time()
+    transposed_mul(A, B, C_transposed)
+    print(f"Transposed B: {time.time() - start:.6f} seconds")
+    print_matrix(C_transposed)
+    
     # Z order matrix multiplication
-    C_zorder = [[0] * columns for _ in range(rows)] # Initialize C_zorder with zeros
+    C_zorder = [[0] * rows for _ in range(rows)] # Initialize C_zorder with zeros
     start = time.time()
     zorder_mul(A, B, C_zorder, block_size)
     print(f"Z order: {time.time() - start:.6f} seconds")
     print_matrix(C_zorder)
+    
+    # Morton order matrix multiplication
+    C_morton = [[0] * rows for _ in range(rows)] # Initialize C_morton with zeros
+    start = time.time()
+    morton_mul(A, B, C_morton, block_size)
+    print(f"Morton order: {time.time() - start:.6f} seconds")
+    print_matrix(C_morton)
+    
+    if num_workers > 1:
+        # Row-major order and Z order split among worker processes
+        C_parallel = [[0] * rows for _ in range(rows)] # Initialize C_parallel with zeros
+        start = time.time()
+        parallel_mul(A, B, C_parallel, "row", num_workers)
+        print(f"Row-major order ({num_workers} workers): {time.time() - start:.6f} seconds")
+        print_matrix(C_parallel)
+        
+        C_parallel = [[0] * rows for _ in range(rows)] # Initialize C_parallel with zeros
+        start = time.time()
+        parallel_mul(A, B, C_parallel, "zor", num_workers, block_size)
+        print(f"Z order ({num_workers} workers): {time.time() - start:.6f} seconds")
+        print_matrix(C_parallel)
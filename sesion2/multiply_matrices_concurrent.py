@@ -0,0 +1,119 @@
+import asyncio
+import os
+import sys
+import time
+import numpy as np
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from multiply_matrices_hybrid_pro import multiply
+from utils import verify_multiplication, DTYPES
+from typing import List, Optional, Sequence, Tuple
+
+# ctypes releases the GIL during every call into the C library, so independent
+# multiplications submitted from Python threads run in parallel. The C library
+# is safe to call concurrently: kernels only touch their own operands and the
+# buffer pool is protected by a mutex. The tiles of 'mlz' are resolved before
+# submitting, because autotune.get_tiles may tune and write its cache.
+
+def default_workers(num_threads: int = 1) -> int:
+    """Number of concurrent multiplications that fill the CPUs of the node
+    when every one uses num_threads OpenMP threads."""
+    return max(1, (os.cpu_count() or 1) // max(1, num_threads))
+
+def resolve_tiles(A: np.ndarray, B: np.ndarray, algorithm: str, num_threads: int,
+                  tiles: Optional[Tuple[int, int, int]]) -> Optional[Tuple[int, int, int]]:
+    """Tiles of the multi-level Z-order multiplication, tuned in the calling thread if not given."""
+    if algorithm != "mlz" or tiles is not None:
+        return tiles
+    from autotune import get_tiles
+    return get_tiles(max(A.shape + B.shape), num_threads, A.dtype.name)
+
+def submit(executor: Executor, A: np.ndarray, B: np.ndarray, algorithm: str, block_size: int = 0,
+           num_threads: int = 1, tiles: Tuple[int, int, int] = None) -> Future:
+    """Submit a multiplication with the C library to an executor.
+
+    Args:
+        executor (Executor): Thread pool that runs the multiplication.
+        A (np.ndarray): First matrix, 2-D array of one of the utils.DTYPES.
+        B (np.ndarray): Second matrix, 2-D array of the same dtype.
+        algorithm (str): Algorithm to use for multiplication (see multiply_matrices_hybrid_pro.multiply).
+        block_size (int): Block size, tile size or Strassen cutoff of the algorithm.
+        num_threads (int): Number of OpenMP threads used by the C kernel.
+        tiles (Tuple[int, int, int]): L3, L2 and L1 block sizes for 'mlz'.
+
+    Returns:
+        Future: Future of the resulting matrix.
+    """
+    tiles = resolve_tiles(A, B, algorithm, num_threads, tiles)
+    return executor.submit(multiply, A, B, algorithm, block_size, num_threads, tiles)
+
+def multiply_batch(pairs: Sequence[Tuple[np.ndarray, np.ndarray]], algorithm: str, block_size: int = 0,
+                   num_threads: int = 1, workers: int = None) -> List[np.ndarray]:
+    """Multiply a batch of independent operand pairs concurrently.
+
+    Args:
+        pairs (Sequence[Tuple[np.ndarray, np.ndarray]]): Operands (A, B) of every product.
+        algorithm (str): Algorithm to use for multiplication.
+        block_size (int): Block size, tile size or Strassen cutoff of the algorithm.
+        num_threads (int): Number of OpenMP threads of every multiplication.
+        workers (int): Concurrent multiplications (default_workers by default).
+
+    Returns:
+        List[np.ndarray]: Resulting matrices, in the order of the pairs.
+    """
+    with ThreadPoolExecutor(max_workers=workers or default_workers(num_threads)) as executor:
+        futures = [submit(executor, A, B, algorithm, block_size, num_threads) for A, B in pairs]
+        return [future.result() for future in futures]
+
+async def multiply_async(A: np.ndarray, B: np.ndarray, algorithm: str, block_size: int = 0, num_threads: int = 1,
+                         tiles: Tuple[int, int, int] = None, executor: Executor = None) -> np.ndarray:
+    """Multiply two matrices with the C library without blocking the event loop.
+    The multiplication runs in executor, or in the default executor of the loop."""
+    tiles = resolve_tiles(A, B, algorithm, num_threads, tiles)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, multiply, A, B, algorithm, block_size, num_threads, tiles)
+
+async def multiply_batch_async(pairs: Sequence[Tuple[np.ndarray, np.ndarray]], algorithm: str, block_size: int = 0,
+                               num_threads: int = 1, workers: int = None) -> List[np.ndarray]:
+    """Asynchronous version of multiply_batch, for callers running an event loop."""
+    with ThreadPoolExecutor(max_workers=workers or default_workers(num_threads)) as executor:
+        return list(await asyncio.gather(*(multiply_async(A, B, algorithm, block_size, num_threads, executor=executor)
+                                           for A, B in pairs)))
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (4, 5, 6, 7):
+        print("Usage: python multiply_matrices_concurrent.py <matrix_size> <batch> <algorithm> [block_size] [workers] [dtype]")
+        sys.exit(1)
+
+    matrix_size = int(sys.argv[1])
+    batch = int(sys.argv[2])
+    algorithm = sys.argv[3]
+    block_size = int(sys.argv[4]) if len(sys.argv) >= 5 else 0
+    workers = int(sys.argv[5]) if len(sys.argv) >= 6 else default_workers()
+    dtype = sys.argv[6] if len(sys.argv) == 7 else "int32"
+
+    # Batch of random operand pairs
+    rng = np.random.default_rng(0)
+    pairs = [tuple(rng.integers(0, 10, size=(matrix_size, matrix_size)).astype(DTYPES[dtype][1]) for _ in range(2))
+             for _ in range(batch)]
+
+    # One product after another
+    start = time.time()
+    sequential = [multiply(A, B, algorithm, block_size) for A, B in pairs]
+    sequential_time = time.time() - start
+    print(f"Sequential: {sequential_time:.6f} s")
+
+    # Concurrent products with a thread pool
+    start = time.time()
+    concurrent = multiply_batch(pairs, algorithm, block_size, workers=workers)
+    concurrent_time = time.time() - start
+    print(f"Concurrent ({workers} workers): {concurrent_time:.6f} s (speedup {sequential_time / concurrent_time:.2f})")
+
+    # Concurrent products from an event loop
+    start = time.time()
+    gathered = asyncio.run(multiply_batch_async(pairs, algorithm, block_size, workers=workers))
+    print(f"Asyncio ({workers} workers): {time.time() - start:.6f} s")
+
+    for (A, B), C, C_concurrent, C_gathered in zip(pairs, sequential, concurrent, gathered):
+        assert verify_multiplication(A, B, C), f"Error in {algorithm} multiplication!"
+        assert np.array_equal(C, C_concurrent) and np.array_equal(C, C_gathered), "Concurrent products differ"
+    print("Verification: OK")
@@ -2,32 +2,93 @@ import ctypes
 import sys
 import random
 import time
-from utils import verify_multiplication, print_matrix, matrix_to_c, matrix_to_python
+import numpy as np
+from utils import Matrix, check_status, check_morton, verify_multiplication, print_matrix, matrix_to_c, matrix_to_python, matrix_from_numpy, matrix_view, StageTimes, timed, PerfCounters, counted, operand_cache, DTYPES, dtype_code, check_overflow
 from typing import List, Tuple
 
 # Load shared library
 lib = ctypes.CDLL('./lib/liboperations.so')
 
-# Common arguments for matrix multiplication functions
+# Common arguments for matrix multiplication functions (A, B and C).
+# They return a status code that check_status turns into an exception
 common_args = [
-    ctypes.c_int,
-    ctypes.c_int,
-    ctypes.POINTER(ctypes.POINTER(ctypes.c_int)),
-    ctypes.POINTER(ctypes.POINTER(ctypes.c_int)),
-    ctypes.POINTER(ctypes.POINTER(ctypes.c_int))
+    ctypes.POINTER(Matrix),
+    ctypes.POINTER(Matrix),
+    ctypes.POINTER(Matrix)
 ]
 
-# row_major_mul function prototype
-lib.row_major_mul.argtypes = common_args
-lib.row_major_mul.restype = None
+# row_major_mul function prototype (last argument is the number of threads)
+lib.row_major_mul.argtypes = common_args + [ctypes.c_int]
+lib.row_major_mul.restype = ctypes.c_int
+lib.row_major_mul.errcheck = check_status
 
-# column_major_mul function prototype
-lib.column_major_mul.argtypes = common_args
-lib.column_major_mul.restype = None
+# column_major_mul function prototype (last argument is the number of threads)
+lib.column_major_mul.argtypes = common_args + [ctypes.c_int]
+lib.column_major_mul.restype = ctypes.c_int
+lib.column_major_mul.errcheck = check_status
 
-# zorder_mul function prototype
-lib.zorder_mul.argtypes = common_args + [ctypes.c_int]
-lib.zorder_mul.restype = None
+# ikj_mul function prototype (last argument is the number of threads)
+lib.ikj_mul.argtypes = common_args + [ctypes.c_int]
+lib.ikj_mul.restype = ctypes.c_int
+lib.ikj_mul.errcheck = check_status
+
+# transposed_mul function prototype (last argument is the number of threads)
+lib.transposed_mul.argtypes = common_args + [ctypes.c_int]
+lib.transposed_mul.restype = ctypes.c_int
+lib.transposed_mul.errcheck = check_status
+
+# gemm_mul function prototype (last argument is the number of threads)
+lib.gemm_mul.argtypes = common_args + [ctypes.c_int]
+lib.gemm_mul.restype = ctypes.c_int
+lib.gemm_mul.errcheck = check_status
+
+# gemm_isa function prototype (instruction set of the gemm_mul micro-kernel)
+lib.gemm_isa.argtypes = []
+lib.gemm_isa.restype = ctypes.c_char_p
+
+# zorder_mul function prototype (block size and number of threads)
+lib.zorder_mul.argtypes = common_args + [ctypes.c_int, ctypes.c_int]
+lib.zorder_mul.restype = ctypes.c_int
+lib.zorder_mul.errcheck = check_status
+
+# multilevel_mul function prototype (L3, L2 and L1 block sizes and number of threads)
+lib.multilevel_mul.argtypes = common_args + [ctypes.c_int] * 4
+lib.multilevel_mul.restype = ctypes.c_int
+lib.multilevel_mul.errcheck = check_status
+
+# strassen_mul function prototype (cutoff and number of threads)
+lib.strassen_mul.argtypes = common_args + [ctypes.c_int, ctypes.c_int]
+lib.strassen_mul.restype = ctypes.c_int
+lib.strassen_mul.errcheck = check_status
+
+# Hardware counter function prototypes (see utils.counted)
+lib.perf_begin.argtypes = []
+lib.perf_begin.restype = ctypes.c_int
+
+lib.perf_end.argtypes = [ctypes.POINTER(PerfCounters)]
+lib.perf_end.restype = None
+
+# Z-order layout function prototypes
+lib.morton_tiles.argtypes = [ctypes.c_int, ctypes.c_int]
+lib.morton_tiles.restype = ctypes.c_int
+
+lib.allocate_morton.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int]
+lib.allocate_morton.restype = ctypes.c_void_p
+lib.allocate_morton.errcheck = check_morton
+
+lib.free_morton.argtypes = [ctypes.c_void_p]
+lib.free_morton.restype = None
+
+lib.to_morton.argtypes = [ctypes.POINTER(Matrix), ctypes.c_void_p, ctypes.c_int]
+lib.to_morton.restype = None
+
+lib.from_morton.argtypes = [ctypes.c_void_p, ctypes.POINTER(Matrix), ctypes.c_int]
+lib.from_morton.restype = None
+
+# morton_mul function prototype (M, K, N, tile size, element type and number of threads)
+lib.morton_mul.argtypes = [ctypes.c_void_p] * 3 + [ctypes.c_int] * 6
+lib.morton_mul.restype = ctypes.c_int
+lib.morton_mul.errcheck = check_status
 
 def generate_matrix(rows: int, cols: int) -> List[List[int]]:
     """Create an array in Python as a list of lists.
@@ -41,91 +102,231 @@ def generate_matrix(rows: int, cols: int) -> List[List[int]]:
     """
     return [[random.randint(0, 9) for _ in range(cols)] for _ in range(rows)]
 
-def run_phase_2_row_col(matrix_size: int, algorithm: str) -> float:
+def generate_operands(matrix_size: int, use_numpy: bool, times: StageTimes, seed: int = 0, dtype: str = "int32") -> Tuple[Matrix, Matrix, Matrix, object, object]:
+    """Generate the operands of a multiplication and convert them to C-compatible format.
+    The operands come from the operand cache. With use_numpy they are NumPy arrays
+    handed to C without copies; otherwise they are lists of lists copied into C buffers.
+
+    Args:
+        matrix_size (int): Size of the matrix.
+        use_numpy (bool): Whether to generate the matrices as NumPy arrays.
+        times (StageTimes): Record where the generate, allocate and marshal_in stages are added.
+        seed (int): Seed of the operands.
+        dtype (str): Element type of the matrices (a key of utils.DTYPES).
+
+    Returns:
+        Tuple[Matrix, Matrix, Matrix, object, object]: A, B and the zeroed result in
+        C format, followed by A and B in their Python format.
+    """
+    with timed(times, "generate"):
+        A, B = operand_cache.get(matrix_size, seed, DTYPES[dtype][1])
+        check_overflow(A, B)
+        if not use_numpy:
+            A, B = A.tolist(), B.tolist()
+
+    with timed(times, "allocate"):
+        if use_numpy:
+            c_c = matrix_from_numpy(np.zeros((matrix_size, matrix_size), dtype=DTYPES[dtype][1]))
+        else:
+            c_c = matrix_to_c([[0] * matrix_size for _ in range(matrix_size)], dtype)
+
+    with timed(times, "marshal_in"):
+        if use_numpy:
+            a_c, b_c = matrix_from_numpy(A), matrix_from_numpy(B)
+        else:
+            a_c, b_c = matrix_to_c(A, dtype), matrix_to_c(B, dtype)
+
+    return a_c, b_c, c_c, A, B
+
+def run_phase_2_row_col(matrix_size: int, algorithm: str, use_numpy: bool = False, num_threads: int = 1, seed: int = 0, dtype: str = "int32") -> StageTimes:
     """Run phase 2 of the experiment for row-major or column-major order.
-    This function measures the execution time of matrix multiplication usign
-    row-major and column-major order algorithms.
-    Time measuring starts before the matrix generation with python and ends
-    after the multiplication with C.
+    This function measures the time of every stage of a matrix multiplication
+    usign row-major and column-major order algorithms: the matrices are
+    generated with python, converted and multiplied with C.
 
     Args:
         matrix_size (int): Size of the matrix.
-        algorithm (str): Algorithm to use for multiplication ('row' or 'col').
+        algorithm (str): Algorithm to use for multiplication ('row', 'col', 'ikj', 'trn' or 'gem').
+        use_numpy (bool): Generate the matrices as NumPy arrays instead of lists.
+        num_threads (int): Number of OpenMP threads used by the C kernel.
+        seed (int): Seed of the operands, shared through utils.operand_cache.
+        dtype (str): Element type of the matrices (a key of utils.DTYPES).
 
     Returns:
-        float: Execution time in seconds.
+        StageTimes: Time in seconds of every stage.
     """
-    start = time.time()
+    times = StageTimes()
     
-    A = generate_matrix(matrix_size, matrix_size)
-    B = generate_matrix(matrix_size, matrix_size)
+    a_c, b_c, c_c_result, A, B = generate_operands(matrix_size, use_numpy, times, seed, dtype)
     
-    a_c = matrix_to_c(A)
-    b_c = matrix_to_c(B)
+    with counted(lib, times):
+        if algorithm == "row":
+            lib.row_major_mul(a_c, b_c, c_c_result, num_threads)
+        elif algorithm == "col":
+            lib.column_major_mul(a_c, b_c, c_c_result, num_threads)
+        elif algorithm == "ikj":
+            lib.ikj_mul(a_c, b_c, c_c_result, num_threads)
+        elif algorithm == "trn":
+            lib.transposed_mul(a_c, b_c, c_c_result, num_threads)
+        elif algorithm == "gem":
+            lib.gemm_mul(a_c, b_c, c_c_result, num_threads)
     
-    c_c_result = matrix_to_c([[0] * matrix_size for _ in range(matrix_size)])
+    with timed(times, "verify"):
+        assert verify_multiplication(A, B, matrix_view(c_c_result)), f"Error in {algorithm} multiplication"
+    
+    return times
+
+def run_phase_2_zorder(matrix_size: int, block_size: int, use_numpy: bool = False, num_threads: int = 1, seed: int = 0, dtype: str = "int32") -> StageTimes:
+    """Run phase 2 of the experiment for Z-order algorithm.
+    This function measures the time of every stage of a matrix multiplication
+    using Z-order algorithm: the matrices are generated with python, converted
+    and multiplied with C.
+
+    Args:
+        matrix_size (int): Size of the matrix.
+        block_size (int): Block size for Z-order multiplication.
+        use_numpy (bool): Generate the matrices as NumPy arrays instead of lists.
+        num_threads (int): Number of OpenMP threads used by the C kernel.
+        seed (int): Seed of the operands, shared through utils.operand_cache.
+        dtype (str): Element type of the matrices (a key of utils.DTYPES).
+
+    Returns:
+        StageTimes: Time in seconds of every stage.
+    """
+    times = StageTimes()
     
-    if algorithm == "row":
-        lib.row_major_mul(matrix_size, matrix_size, a_c, b_c, c_c_result)
-    elif algorithm == "col":
-        lib.column_major_mul(matrix_size, matrix_size, a_c, b_c, c_c_result)
+    a_c, b_c, c_c_zorder, A, B = generate_operands(matrix_size, use_numpy, times, seed, dtype)
     
-    exec_time = time.time() - start
+    with counted(lib, times):
+        lib.zorder_mul(a_c, b_c, c_c_zorder, block_size, num_threads)
     
-    c_python = matrix_to_python(c_c_result, matrix_size, matrix_size)
-    assert verify_multiplication(A, B, c_python), f"Error in r{algorithm}-major multiplication"
+    with timed(times, "verify"):
+        assert verify_multiplication(A, B, matrix_view(c_c_zorder)), "Error in Z order multiplication"
     
-    return exec_time
+    return times
 
-def run_phase_2_zorder(matrix_size: int, block_size: int) -> float:
-    """Run phase 2 of the experiment for Z-order algorithm.
-    This function measures the execution time of matrix multiplication using
-    Z-order algorithm.
-    Time measuring starts before the matrix generation with python and ends
-    after the multiplication with C.
+def run_phase_2_multilevel(matrix_size: int, tiles: Tuple[int, int, int], use_numpy: bool = False, num_threads: int = 1, seed: int = 0, dtype: str = "int32") -> StageTimes:
+    """Run phase 2 of the experiment for the multi-level Z-order algorithm.
+    This function measures the time of every stage of a matrix multiplication
+    with the L3, L2 and L1 blocks found by the autotuner: the matrices are
+    generated with python, converted and multiplied with C.
 
     Args:
         matrix_size (int): Size of the matrix.
-        block_size (int): Block size for Z-order multiplication.
+        tiles (Tuple[int, int, int]): L3, L2 and L1 block sizes.
+        use_numpy (bool): Generate the matrices as NumPy arrays instead of lists.
+        num_threads (int): Number of OpenMP threads used by the C kernel.
+        seed (int): Seed of the operands, shared through utils.operand_cache.
+        dtype (str): Element type of the matrices (a key of utils.DTYPES).
 
     Returns:
-        float: Execution time in seconds.
+        StageTimes: Time in seconds of every stage.
     """
-    start = time.time()
+    times = StageTimes()
+    
+    a_c, b_c, c_c_multilevel, A, B = generate_operands(matrix_size, use_numpy, times, seed, dtype)
     
-    A = generate_matrix(matrix_size, matrix_size)
-    B = generate_matrix(matrix_size, matrix_size)
+    with counted(lib, times):
+        lib.multilevel_mul(a_c, b_c, c_c_multilevel, *tiles, num_threads)
     
-    a_c = matrix_to_c(A)
-    b_c = matrix_to_c(B)
+    with timed(times, "verify"):
+        assert verify_multiplication(A, B, matrix_view(c_c_multilevel)), "Error in multi-level Z order multiplication"
     
-    c_c_zorder = matrix_to_c([[0] * matrix_size for _ in range(matrix_size)])
+    return times
+
+def run_phase_2_strassen(matrix_size: int, cutoff: int, use_numpy: bool = False, num_threads: int = 1, seed: int = 0, dtype: str = "int32") -> StageTimes:
+    """Run phase 2 of the experiment for the Strassen-Winograd algorithm.
+    This function measures the time of every stage of a matrix multiplication
+    with the sub-cubic Strassen-Winograd algorithm, which recurses down to
+    cutoff and multiplies smaller blocks in Z-order: the matrices are generated
+    with python, converted and multiplied with C.
+
+    Args:
+        matrix_size (int): Size of the matrix.
+        cutoff (int): Size below which the recursion stops.
+        use_numpy (bool): Generate the matrices as NumPy arrays instead of lists.
+        num_threads (int): Number of OpenMP threads used by the C kernel.
+        seed (int): Seed of the operands, shared through utils.operand_cache.
+        dtype (str): Element type of the matrices (a key of utils.DTYPES).
+
+    Returns:
+        StageTimes: Time in seconds of every stage.
+    """
+    times = StageTimes()
     
-    lib.zorder_mul(matrix_size, matrix_size, a_c, b_c, c_c_zorder, block_size)
+    a_c, b_c, c_c_strassen, A, B = generate_operands(matrix_size, use_numpy, times, seed, dtype)
     
-    exec_time = time.time() - start
+    with counted(lib, times):
+        lib.strassen_mul(a_c, b_c, c_c_strassen, cutoff, num_threads)
     
-    c_python_zorder = matrix_to_python(c_c_zorder, matrix_size, matrix_size)
-    assert verify_multiplication(A, B, c_python_zorder), "Error in Z order multiplication"
+    with timed(times, "verify"):
+        assert verify_multiplication(A, B, matrix_view(c_c_strassen)), "Error in Strassen-Winograd multiplication"
     
-    return exec_time
+    return times
+
+def run_phase_2_morton(matrix_size: int, block_size: int, use_numpy: bool = False, num_threads: int = 1, seed: int = 0, dtype: str = "int32") -> StageTimes:
+    """Run phase 2 of the experiment for the Z-order layout.
+    This function measures the time of every stage of a matrix multiplication
+    over matrices stored in Z-order with a recursive algorithm. The conversions
+    to and from Z-order are part of the marshalling stages.
+
+    Args:
+        matrix_size (int): Size of the matrix.
+        block_size (int): Size of the tiles of the Z-order layout.
+        use_numpy (bool): Generate the matrices as NumPy arrays instead of lists.
+        num_threads (int): Number of OpenMP threads used by the C kernel.
+        seed (int): Seed of the operands, shared through utils.operand_cache.
+        dtype (str): Element type of the matrices (a key of utils.DTYPES).
+
+    Returns:
+        StageTimes: Time in seconds of every stage.
+    """
+    times = StageTimes()
+    
+    a_c, b_c, c_c_morton, A, B = generate_operands(matrix_size, use_numpy, times, seed, dtype)
+    
+    with timed(times, "allocate"):
+        a_morton = lib.allocate_morton(matrix_size, block_size, dtype_code(dtype))
+        b_morton = lib.allocate_morton(matrix_size, block_size, dtype_code(dtype))
+        c_morton = lib.allocate_morton(matrix_size, block_size, dtype_code(dtype))
+
+    with timed(times, "marshal_in"):
+        lib.to_morton(a_c, a_morton, block_size)
+        lib.to_morton(b_c, b_morton, block_size)
+    
+    with counted(lib, times):
+        lib.morton_mul(a_morton, b_morton, c_morton, matrix_size, matrix_size, matrix_size, block_size, dtype_code(dtype), num_threads)
+    
+    with timed(times, "marshal_out"):
+        lib.from_morton(c_morton, c_c_morton, block_size)
+    
+    with timed(times, "free"):
+        lib.free_morton(a_morton)
+        lib.free_morton(b_morton)
+        lib.free_morton(c_morton)
+    
+    with timed(times, "verify"):
+        assert verify_multiplication(A, B, matrix_view(c_c_morton)), "Error in Morton order multiplication"
+    
+    return times
 
 if __name__ == "__main__":
-    if len(sys.argv) != 4:
-        print("Usage: python 2-multiply_matrices.py <rows> <columns> <block_size>")
+    if len(sys.argv) not in (4, 5):
+        print("Usage: python 2-multiply_matrices.py <rows> <columns> <block_size> [num_threads]")
         sys.exit(1)
 
     # Get matrices size
     rows = int(sys.argv[1])
     columns = int(sys.argv[2])
     block_size = int(sys.argv[3])
+    num_threads = int(sys.argv[4]) if len(sys.argv) == 5 else 1
 
     # Generate random matrices
     A = generate_matrix(rows, columns)
     B = generate_matrix(columns, rows)
 
-    # Initialize result matrix with zeros
-    C = [[0] * columns for _ in range(rows)]
+    # Initialize result matrix (rows x rows) with zeros
+    C = [[0] * rows for _ in range(rows)]
     
     # Convert matrices to C-compatible format
     A_c = matrix_to_c(A)
@@ -134,23 +335,72 @@ if __name__ == "__main__":
 
     # Row-major order matrix multiplication
     start = time.time()
-    lib.row_major_mul(rows, columns, A_c, B_c, C_c_rows)
+    lib.row_major_mul(A_c, B_c, C_c_rows, num_threads)
     print(f"Row-major order: {time.time() - start:.6f} s")
-    C_p_rows = matrix_to_python(C_c_rows, rows, columns)
+    C_p_rows = matrix_to_python(C_c_rows)
     print_matrix(C_p_rows)
     
     # Column-major order matrix multiplication
     C_c_columns = matrix_to_c(C)
     start = time.time()
-    lib.column_major_mul(rows, columns, A_c, B_c, C_c_columns)
+    lib.column_major_mul(A_c, B_c, C_c_columns, num_threads)
     print(f"Column-major order: {time.time() - start:.6f} s")
-    C_p_columns = matrix_to_python(C_c_columns, rows, columns)
+    C_p_columns = matrix_to_python(C_c_columns)
     print_matrix(C_p_columns)
     
+    # i-k-j order matrix multiplication
+    C_c_ikj = matrix_to_c(C)
+    start = time.time()
+    lib.ikj_mul(A_c, B_c, C_c_ikj, num_threads)
+    print(f"i-k-j order: {time.time() - start:.6f} s")
+    C_p_ikj = matrix_to_python(C_c_ikj)
+    print_matrix(C_p_ikj)
+    
+    # Transposed B matrix multiplication
+    C_c_transposed = matrix_to_c(C)
+    start = time.time()
+    lib.transposed_mul(A_c, B_c, C_c_transposed, num_threads)
+    print(f"Transposed B: {time.time() - start:.6f} s")
+    C_p_transposed = matrix_to_python(C_c_transposed)
+    print_matrix(C_p_transposed)
+    
+    # Packed, register-blocked matrix multiplication
+    C_c_gemm = matrix_to_c(C)
+    start = time.time()
+    lib.gemm_mul(A_c, B_c, C_c_gemm, num_threads)
+    print(f"Packed GEMM ({lib.gemm_isa().decode()}): {time.time() - start:.6f} s")
+    C_p_gemm = matrix_to_python(C_c_gemm)
+    print_matrix(C_p_gemm)
+    
     # Z order matrix multiplication
     C_c_zorder = matrix_to_c(C)
     start = time.time()
-    lib.zorder_mul(rows, columns, A_c, B_c, C_c_zorder, block_size)
+    lib.zorder_mul(A_c, B_c, C_c_zorder, block_size, num_threads)
     print(f"Z order: {time.time() - start:.6f} s")
-    C_p_zorder = matrix_to_python(C_c_zorder, rows, columns)
-    print_matrix(C_p_zorder)
\ No newline at end of file
+    C_p_zorder = matrix_to_python(C_c_zorder)
+    print_matrix(C_p_zorder)
+    
+    # Strassen-Winograd matrix multiplication (block size as cutoff)
+    C_c_strassen = matrix_to_c(C)
+    start = time.time()
+    lib.strassen_mul(A_c, B_c, C_c_strassen, block_size, num_threads)
+    print(f"Strassen-Winograd: {time.time() - start:.6f} s")
+    C_p_strassen = matrix_to_python(C_c_strassen)
+    print_matrix(C_p_strassen)
+    
+    # Morton order matrix multiplication
+    C_c_morton = matrix_to_c(C)
+    start = time.time()
+    A_morton = lib.allocate_morton(max(rows, columns), block_size, dtype_code("int32"))
+    B_morton = lib.allocate_morton(max(rows, columns), block_size, dtype_code("int32"))
+    C_morton = lib.allocate_morton(max(rows, columns), block_size, dtype_code("int32"))
+    lib.to_morton(A_c, A_morton, block_size)
+    lib.to_morton(B_c, B_morton, block_size)
+    lib.morton_mul(A_morton, B_morton, C_morton, rows, columns, rows, block_size, dtype_code("int32"), num_threads)
+    lib.from_morton(C_morton, C_c_morton, block_size)
+    print(f"Morton order: {time.time() - start:.6f} s")
+    C_p_morton = matrix_to_python(C_c_morton)
+    print_matrix(C_p_morton)
+    lib.free_morton(A_morton)
+    lib.free_morton(B_morton)
+    lib.free_morton(C_morton)
\ No newline at end of file
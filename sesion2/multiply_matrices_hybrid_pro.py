@@ -1,187 +1,501 @@
 import ctypes
 import sys
 import time
-from utils import verify_multiplication, print_matrix, matrix_to_python
+import numpy as np
+from utils import Matrix, check_status, check_morton, verify_multiplication, print_matrix, matrix_to_python, matrix_from_numpy, matrix_view, StageTimes, timed, PerfCounters, counted, operand_cache, DTYPES, dtype_code, check_overflow
 from typing import List, Tuple
 
 # Load shared library
 lib = ctypes.CDLL('./lib/liboperations.so')
 
-# allocate_matrix and free_matrix function prototypes
-lib.allocate_matrix.argtypes = [ctypes.c_int, ctypes.c_int]
-lib.allocate_matrix.restype = ctypes.POINTER(ctypes.POINTER(ctypes.c_int))
+# allocate_matrix and free_matrix function prototypes (rows, columns and element type)
+lib.allocate_matrix.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int]
+lib.allocate_matrix.restype = ctypes.POINTER(Matrix)
 
 # free_matrix function prototype
-lib.free_matrix.argtypes = [ctypes.c_int, ctypes.POINTER(ctypes.POINTER(ctypes.c_int))]
+lib.free_matrix.argtypes = [ctypes.POINTER(Matrix)]
 lib.free_matrix.restype = None
 
 # generate_matrix function prototype
-lib.generate_matrix.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.POINTER(ctypes.c_int))]
+lib.generate_matrix.argtypes = [ctypes.POINTER(Matrix)]
 lib.generate_matrix.restype = None
 
 # fill_matrix function prototype
-lib.fill_matrix.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.POINTER(ctypes.c_int)), ctypes.c_int]
+lib.fill_matrix.argtypes = [ctypes.POINTER(Matrix), ctypes.c_double]
 lib.fill_matrix.restype = None
 
-# Common arguments for matrix multiplication functions
+# Buffer pool function prototypes (maximum cached bytes and huge pages flag).
+# Matrices and scratch buffers of the kernels are reused across calls until trimmed
+lib.configure_matrix_pool.argtypes = [ctypes.c_size_t, ctypes.c_int]
+lib.configure_matrix_pool.restype = None
+
+lib.trim_matrix_pool.argtypes = []
+lib.trim_matrix_pool.restype = None
+
+# Common arguments for matrix multiplication functions (A, B and C).
+# They return a status code that check_status turns into an exception
 common_args = [
-    ctypes.c_int,
-    ctypes.c_int,
-    ctypes.POINTER(ctypes.POINTER(ctypes.c_int)),
-    ctypes.POINTER(ctypes.POINTER(ctypes.c_int)),
-    ctypes.POINTER(ctypes.POINTER(ctypes.c_int))
+    ctypes.POINTER(Matrix),
+    ctypes.POINTER(Matrix),
+    ctypes.POINTER(Matrix)
 ]
 
-# row_major_mul function prototype
-lib.row_major_mul.argtypes = common_args
-lib.row_major_mul.restype = None
+# row_major_mul function prototype (last argument is the number of threads)
+lib.row_major_mul.argtypes = common_args + [ctypes.c_int]
+lib.row_major_mul.restype = ctypes.c_int
+lib.row_major_mul.errcheck = check_status
 
-# column_major_mul function prototype
-lib.column_major_mul.argtypes = common_args
-lib.column_major_mul.restype = None
+# column_major_mul function prototype (last argument is the number of threads)
+lib.column_major_mul.argtypes = common_args + [ctypes.c_int]
+lib.column_major_mul.restype = ctypes.c_int
+lib.column_major_mul.errcheck = check_status
 
-# zorder_mul function prototype
-lib.zorder_mul.argtypes = common_args + [ctypes.c_int]
-lib.zorder_mul.restype = None
+# ikj_mul function prototype (last argument is the number of threads)
+lib.ikj_mul.argtypes = common_args + [ctypes.c_int]
+lib.ikj_mul.restype = ctypes.c_int
+lib.ikj_mul.errcheck = check_status
 
-def run_phase_3_row_col(matrix_size: int, algorithm: str) -> float:
-    """Run phase 3 of the experiment for row-major or column-major order.
-    This function measures the execution time of matrix multiplication using
-    row-major or column-major algorithm. 
-    Time measuring starts before the matrix generation with C and ends
-    after the multiplication with C.
+# transposed_mul function prototype (last argument is the number of threads)
+lib.transposed_mul.argtypes = common_args + [ctypes.c_int]
+lib.transposed_mul.restype = ctypes.c_int
+lib.transposed_mul.errcheck = check_status
+
+# gemm_mul function prototype (last argument is the number of threads)
+lib.gemm_mul.argtypes = common_args + [ctypes.c_int]
+lib.gemm_mul.restype = ctypes.c_int
+lib.gemm_mul.errcheck = check_status
+
+# gemm_isa function prototype (instruction set of the gemm_mul micro-kernel)
+lib.gemm_isa.argtypes = []
+lib.gemm_isa.restype = ctypes.c_char_p
+
+# zorder_mul function prototype (block size and number of threads)
+lib.zorder_mul.argtypes = common_args + [ctypes.c_int, ctypes.c_int]
+lib.zorder_mul.restype = ctypes.c_int
+lib.zorder_mul.errcheck = check_status
+
+# multilevel_mul function prototype (L3, L2 and L1 block sizes and number of threads)
+lib.multilevel_mul.argtypes = common_args + [ctypes.c_int] * 4
+lib.multilevel_mul.restype = ctypes.c_int
+lib.multilevel_mul.errcheck = check_status
+
+# strassen_mul function prototype (cutoff and number of threads)
+lib.strassen_mul.argtypes = common_args + [ctypes.c_int, ctypes.c_int]
+lib.strassen_mul.restype = ctypes.c_int
+lib.strassen_mul.errcheck = check_status
+
+# Hardware counter function prototypes (see utils.counted)
+lib.perf_begin.argtypes = []
+lib.perf_begin.restype = ctypes.c_int
+
+lib.perf_end.argtypes = [ctypes.POINTER(PerfCounters)]
+lib.perf_end.restype = None
+
+# Z-order layout function prototypes
+lib.morton_tiles.argtypes = [ctypes.c_int, ctypes.c_int]
+lib.morton_tiles.restype = ctypes.c_int
+
+lib.allocate_morton.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int]
+lib.allocate_morton.restype = ctypes.c_void_p
+lib.allocate_morton.errcheck = check_morton
+
+lib.free_morton.argtypes = [ctypes.c_void_p]
+lib.free_morton.restype = None
+
+lib.to_morton.argtypes = [ctypes.POINTER(Matrix), ctypes.c_void_p, ctypes.c_int]
+lib.to_morton.restype = None
+
+lib.from_morton.argtypes = [ctypes.c_void_p, ctypes.POINTER(Matrix), ctypes.c_int]
+lib.from_morton.restype = None
+
+# morton_mul function prototype (M, K, N, tile size, element type and number of threads)
+lib.morton_mul.argtypes = [ctypes.c_void_p] * 3 + [ctypes.c_int] * 6
+lib.morton_mul.restype = ctypes.c_int
+lib.morton_mul.errcheck = check_status
+
+# Matrix file function prototypes (paths are bytes, see matrix_file)
+lib.create_matrix_file.argtypes = [ctypes.c_char_p] + [ctypes.c_int] * 4
+lib.create_matrix_file.restype = ctypes.c_int
+lib.create_matrix_file.errcheck = check_status
+
+# out_of_core_mul function prototype (paths of A, B and C and number of threads)
+lib.out_of_core_mul.argtypes = [ctypes.c_char_p] * 3 + [ctypes.c_int]
+lib.out_of_core_mul.restype = ctypes.c_int
+lib.out_of_core_mul.errcheck = check_status
+
+def multiply(A: np.ndarray, B: np.ndarray, algorithm: str, block_size: int = 0, num_threads: int = 1,
+             tiles: Tuple[int, int, int] = None) -> np.ndarray:
+    """Multiply two NumPy arrays with the C library without intermediate copies.
+    The operands and the result are handed to C through their own buffers.
+
+    Args:
+        A (np.ndarray): First matrix, 2-D array of one of the utils.DTYPES.
+        B (np.ndarray): Second matrix, 2-D array of the same dtype.
+        algorithm (str): Algorithm to use for multiplication ('row', 'col', 'ikj', 'trn', 'gem', 'zor', 'mor', 'mlz' or 'str').
+        block_size (int): Block size for Z-order multiplication, tile size of the Z-order layout
+            or cutoff of the Strassen-Winograd recursion.
+        num_threads (int): Number of OpenMP threads used by the C kernel.
+        tiles (Tuple[int, int, int]): L3, L2 and L1 block sizes for the multi-level
+            Z-order multiplication (tuned with autotune.get_tiles by default).
+
+    Returns:
+        np.ndarray: Resulting matrix, of the dtype of the operands.
+    """
+    if A.shape[1] != B.shape[0]:
+        raise ValueError(f"Cannot multiply a {A.shape} matrix by a {B.shape} matrix.")
+    if A.dtype != B.dtype:
+        raise TypeError(f"Cannot multiply a {A.dtype} matrix by a {B.dtype} matrix.")
+    if algorithm in ("zor", "mor", "str") and block_size < 1:
+        raise ValueError(f"Algorithm {algorithm} needs a positive block size.")
+    check_overflow(A, B)
+
+    C = np.zeros((A.shape[0], B.shape[1]), dtype=A.dtype)
+    a_c, b_c, c_c = matrix_from_numpy(A), matrix_from_numpy(B), matrix_from_numpy(C)
+
+    if algorithm == "row":
+        lib.row_major_mul(a_c, b_c, c_c, num_threads)
+    elif algorithm == "col":
+        lib.column_major_mul(a_c, b_c, c_c, num_threads)
+    elif algorithm == "ikj":
+        lib.ikj_mul(a_c, b_c, c_c, num_threads)
+    elif algorithm == "trn":
+        lib.transposed_mul(a_c, b_c, c_c, num_threads)
+    elif algorithm == "gem":
+        lib.gemm_mul(a_c, b_c, c_c, num_threads)
+    elif algorithm == "zor":
+        lib.zorder_mul(a_c, b_c, c_c, block_size, num_threads)
+    elif algorithm == "str":
+        lib.strassen_mul(a_c, b_c, c_c, block_size, num_threads)
+    elif algorithm == "mor":
+        morton = []
+        try:
+            for _ in range(3):
+                morton.append(lib.allocate_morton(max(A.shape + B.shape), block_size, dtype_code(A.dtype)))
+            lib.to_morton(a_c, morton[0], block_size)
+            lib.to_morton(b_c, morton[1], block_size)
+            lib.morton_mul(*morton, A.shape[0], A.shape[1], B.shape[1], block_size, dtype_code(A.dtype), num_threads)
+            lib.from_morton(morton[2], c_c, block_size)
+        finally:
+            for buffer in morton:
+                lib.free_morton(buffer)
+    elif algorithm == "mlz":
+        if tiles is None:
+            from autotune import get_tiles
+            tiles = get_tiles(max(A.shape + B.shape), num_threads, A.dtype.name)
+        lib.multilevel_mul(a_c, b_c, c_c, *tiles, num_threads)
+    else:
+        raise ValueError(f"Unknown algorithm: {algorithm}")
+
+    return C
+
+def allocate_operands(matrix_size: int, times: StageTimes, seed: int = 0, dtype: str = "int32") -> Tuple["ctypes._Pointer", "ctypes._Pointer", "ctypes._Pointer"]:
+    """Allocate the operands of a multiplication with C and fill them with the
+    seeded operands of the operand cache (copied, so C owns its memory).
 
     Args:
         matrix_size (int): Size of the matrix.
-        algorithm (str): Algorithm to use for multiplication ('row' or 'col').
+        times (StageTimes): Record where the allocate and generate stages are added.
+        seed (int): Seed of the operands.
+        dtype (str): Element type of the matrices (a key of utils.DTYPES).
 
     Returns:
-        float: Execution time in seconds.
+        Tuple: A and B filled with random values and the zeroed result, as pointers to C matrices.
     """
-    start = time.time()
-    
-    A = lib.allocate_matrix(matrix_size, matrix_size)
-    B = lib.allocate_matrix(matrix_size, matrix_size)
-    c_result = lib.allocate_matrix(matrix_size, matrix_size)
+    with timed(times, "allocate"):
+        A = lib.allocate_matrix(matrix_size, matrix_size, dtype_code(dtype))
+        B = lib.allocate_matrix(matrix_size, matrix_size, dtype_code(dtype))
+        C = lib.allocate_matrix(matrix_size, matrix_size, dtype_code(dtype))
+        lib.fill_matrix(C, 0)
 
-    lib.generate_matrix(matrix_size, matrix_size, A)
-    lib.generate_matrix(matrix_size, matrix_size, B)
+    with timed(times, "generate"):
+        a, b = operand_cache.get(matrix_size, seed, DTYPES[dtype][1])
+        check_overflow(a, b)
+        matrix_view(A)[:] = a
+        matrix_view(B)[:] = b
 
-    lib.fill_matrix(matrix_size, matrix_size, c_result, 0)
+    return A, B, C
 
-    if algorithm == "row":
-        lib.row_major_mul(matrix_size, matrix_size, A, B, c_result)
+def free_operands(times: StageTimes, *matrices: "ctypes._Pointer") -> None:
+    """Free C matrices, adding the time to the free stage."""
+    with timed(times, "free"):
+        for matrix in matrices:
+            lib.free_matrix(matrix)
 
-    elif algorithm == "col":
-        lib.column_major_mul(matrix_size, matrix_size, A, B, c_result)
+def run_phase_3_row_col(matrix_size: int, algorithm: str, num_threads: int = 1, seed: int = 0, dtype: str = "int32") -> StageTimes:
+    """Run phase 3 of the experiment for row-major or column-major order.
+    This function measures the time of every stage of a matrix multiplication
+    using row-major or column-major algorithm, with the matrices allocated and
+    multiplied with C.
 
-    c_python = matrix_to_python(c_result, matrix_size, matrix_size)
-    a_python = matrix_to_python(A, matrix_size, matrix_size)
-    b_python = matrix_to_python(B, matrix_size, matrix_size)
-    assert verify_multiplication(a_python, b_python, c_python), f"Error in {algorithm}-major multiplication"
+    Args:
+        matrix_size (int): Size of the matrix.
+        algorithm (str): Algorithm to use for multiplication ('row', 'col', 'ikj', 'trn' or 'gem').
+        num_threads (int): Number of OpenMP threads used by the C kernel.
+        seed (int): Seed of the operands, shared through utils.operand_cache.
+        dtype (str): Element type of the matrices (a key of utils.DTYPES).
 
-    lib.free_matrix(matrix_size, A)
-    lib.free_matrix(matrix_size, B)
-    lib.free_matrix(matrix_size, c_result)
+    Returns:
+        StageTimes: Time in seconds of every stage.
+    """
+    times = StageTimes()
     
-    exec_time = time.time() - start
+    A, B, c_result = allocate_operands(matrix_size, times, seed, dtype)
+
+    with counted(lib, times):
+        if algorithm == "row":
+            lib.row_major_mul(A, B, c_result, num_threads)
+        elif algorithm == "col":
+            lib.column_major_mul(A, B, c_result, num_threads)
+        elif algorithm == "ikj":
+            lib.ikj_mul(A, B, c_result, num_threads)
+        elif algorithm == "trn":
+            lib.transposed_mul(A, B, c_result, num_threads)
+        elif algorithm == "gem":
+            lib.gemm_mul(A, B, c_result, num_threads)
+
+    with timed(times, "verify"):
+        assert verify_multiplication(matrix_view(A), matrix_view(B), matrix_view(c_result)), f"Error in {algorithm}-major multiplication"
+
+    free_operands(times, A, B, c_result)
 
-    return exec_time
+    return times
 
-def run_phase_3_zorder(matrix_size: int, block_size: int) -> float:
+def run_phase_3_zorder(matrix_size: int, block_size: int, num_threads: int = 1, seed: int = 0, dtype: str = "int32") -> StageTimes:
     """Run phase 3 of the experiment for Z-order algorithm.
-    This function measures the execution time of matrix multiplication using
-    Z-order algorithm.
-    Time measuring starts before the matrix generation with C and ends
-    after the multiplication with C.
+    This function measures the time of every stage of a matrix multiplication
+    using Z-order algorithm, with the matrices allocated and multiplied with C.
 
     Args:
         matrix_size (int): Size of the matrix.
         block_size (int): Block size for Z-order multiplication.
+        num_threads (int): Number of OpenMP threads used by the C kernel.
+        seed (int): Seed of the operands, shared through utils.operand_cache.
+        dtype (str): Element type of the matrices (a key of utils.DTYPES).
 
     Returns:
-        float: Execution time in seconds.
+        StageTimes: Time in seconds of every stage.
     """
-    start = time.time()
+    times = StageTimes()
    
-    A = lib.allocate_matrix(matrix_size, matrix_size)
-    B = lib.allocate_matrix(matrix_size, matrix_size)
-    c_zorder = lib.allocate_matrix(matrix_size, matrix_size)
+    A, B, c_zorder = allocate_operands(matrix_size, times, seed, dtype)
 
-    lib.generate_matrix(matrix_size, matrix_size, A)
-    lib.generate_matrix(matrix_size, matrix_size, B)
+    with counted(lib, times):
+        lib.zorder_mul(A, B, c_zorder, block_size, num_threads)
 
-    # Fill result matrices with zeros
-    lib.fill_matrix(matrix_size, matrix_size, c_zorder, 0)
+    with timed(times, "verify"):
+        assert verify_multiplication(matrix_view(A), matrix_view(B), matrix_view(c_zorder)), "Error in Z order multiplication"
+
+    free_operands(times, A, B, c_zorder)
+
+    return times
+
+def run_phase_3_multilevel(matrix_size: int, tiles: Tuple[int, int, int], num_threads: int = 1, seed: int = 0, dtype: str = "int32") -> StageTimes:
+    """Run phase 3 of the experiment for the multi-level Z-order algorithm.
+    This function measures the time of every stage of a matrix multiplication
+    with the L3, L2 and L1 blocks found by the autotuner, with the matrices
+    allocated and multiplied with C.
+
+    Args:
+        matrix_size (int): Size of the matrix.
+        tiles (Tuple[int, int, int]): L3, L2 and L1 block sizes.
+        num_threads (int): Number of OpenMP threads used by the C kernel.
+        seed (int): Seed of the operands, shared through utils.operand_cache.
+        dtype (str): Element type of the matrices (a key of utils.DTYPES).
+
+    Returns:
+        StageTimes: Time in seconds of every stage.
+    """
+    times = StageTimes()
+   
+    A, B, c_multilevel = allocate_operands(matrix_size, times, seed, dtype)
 
-    lib.zorder_mul(matrix_size, matrix_size, A, B, c_zorder, block_size)
+    with counted(lib, times):
+        lib.multilevel_mul(A, B, c_multilevel, *tiles, num_threads)
 
-    c_python_zorder = matrix_to_python(c_zorder, matrix_size, matrix_size)
-    a_python = matrix_to_python(A, matrix_size, matrix_size)
-    b_python = matrix_to_python(B, matrix_size, matrix_size)
-    assert verify_multiplication(a_python, b_python, c_python_zorder), "Error in Z order multiplication"
+    with timed(times, "verify"):
+        assert verify_multiplication(matrix_view(A), matrix_view(B), matrix_view(c_multilevel)), "Error in multi-level Z order multiplication"
 
-    lib.free_matrix(matrix_size, A)
-    lib.free_matrix(matrix_size, B)
-    lib.free_matrix(matrix_size, c_zorder)
+    free_operands(times, A, B, c_multilevel)
+
+    return times
     
-    exec_time = time.time() - start
+def run_phase_3_strassen(matrix_size: int, cutoff: int, num_threads: int = 1, seed: int = 0, dtype: str = "int32") -> StageTimes:
+    """Run phase 3 of the experiment for the Strassen-Winograd algorithm.
+    This function measures the time of every stage of a matrix multiplication
+    with the sub-cubic Strassen-Winograd algorithm, which recurses down to
+    cutoff and multiplies smaller blocks in Z-order, with the matrices
+    allocated and multiplied with C.
+
+    Args:
+        matrix_size (int): Size of the matrix.
+        cutoff (int): Size below which the recursion stops.
+        num_threads (int): Number of OpenMP threads used by the C kernel.
+        seed (int): Seed of the operands, shared through utils.operand_cache.
+        dtype (str): Element type of the matrices (a key of utils.DTYPES).
+
+    Returns:
+        StageTimes: Time in seconds of every stage.
+    """
+    times = StageTimes()
+   
+    A, B, c_strassen = allocate_operands(matrix_size, times, seed, dtype)
+
+    with counted(lib, times):
+        lib.strassen_mul(A, B, c_strassen, cutoff, num_threads)
 
-    return exec_time
+    with timed(times, "verify"):
+        assert verify_multiplication(matrix_view(A), matrix_view(B), matrix_view(c_strassen)), "Error in Strassen-Winograd multiplication"
+
+    free_operands(times, A, B, c_strassen)
+
+    return times
     
+def run_phase_3_morton(matrix_size: int, block_size: int, num_threads: int = 1, seed: int = 0, dtype: str = "int32") -> StageTimes:
+    """Run phase 3 of the experiment for the Z-order layout.
+    This function measures the time of every stage of a matrix multiplication
+    over matrices stored in Z-order with a recursive algorithm, with the
+    matrices allocated and multiplied with C. The conversions to and from
+    Z-order are the marshalling stages.
+
+    Args:
+        matrix_size (int): Size of the matrix.
+        block_size (int): Size of the tiles of the Z-order layout.
+        num_threads (int): Number of OpenMP threads used by the C kernel.
+        seed (int): Seed of the operands, shared through utils.operand_cache.
+        dtype (str): Element type of the matrices (a key of utils.DTYPES).
+
+    Returns:
+        StageTimes: Time in seconds of every stage.
+    """
+    times = StageTimes()
+
+    A, B, c_morton = allocate_operands(matrix_size, times, seed, dtype)
+
+    with timed(times, "allocate"):
+        a_buffer = lib.allocate_morton(matrix_size, block_size, dtype_code(dtype))
+        b_buffer = lib.allocate_morton(matrix_size, block_size, dtype_code(dtype))
+        c_buffer = lib.allocate_morton(matrix_size, block_size, dtype_code(dtype))
+
+    with timed(times, "marshal_in"):
+        lib.to_morton(A, a_buffer, block_size)
+        lib.to_morton(B, b_buffer, block_size)
+
+    with counted(lib, times):
+        lib.morton_mul(a_buffer, b_buffer, c_buffer, matrix_size, matrix_size, matrix_size, block_size, dtype_code(dtype), num_threads)
+
+    with timed(times, "marshal_out"):
+        lib.from_morton(c_buffer, c_morton, block_size)
+
+    with timed(times, "free"):
+        lib.free_morton(a_buffer)
+        lib.free_morton(b_buffer)
+        lib.free_morton(c_buffer)
+
+    with timed(times, "verify"):
+        assert verify_multiplication(matrix_view(A), matrix_view(B), matrix_view(c_morton)), "Error in Morton order multiplication"
+
+    free_operands(times, A, B, c_morton)
+
+    return times
+
 if __name__ == "__main__":
-    if len(sys.argv) != 4:
-        print("Usage: python 2-multiply_matrices.py <rows> <columns> <block_size>")
+    if len(sys.argv) not in (4, 5):
+        print("Usage: python 2-multiply_matrices.py <rows> <columns> <block_size> [num_threads]")
         sys.exit(1)
 
     # Get matrices size
     rows = int(sys.argv[1])
     columns = int(sys.argv[2])
     block_size = int(sys.argv[3])
+    num_threads = int(sys.argv[4]) if len(sys.argv) == 5 else 1
 
     # Allocate space for matrices
-    A = lib.allocate_matrix(rows, columns)
-    B = lib.allocate_matrix(rows, columns)
-    C_rows = lib.allocate_matrix(rows, columns)
-    C_columns = lib.allocate_matrix(rows, columns)
-    C_zorder = lib.allocate_matrix(rows, columns)
+    A = lib.allocate_matrix(rows, columns, dtype_code("int32"))
+    B = lib.allocate_matrix(columns, rows, dtype_code("int32"))
+    C_rows = lib.allocate_matrix(rows, rows, dtype_code("int32"))
+    C_columns = lib.allocate_matrix(rows, rows, dtype_code("int32"))
+    C_ikj = lib.allocate_matrix(rows, rows, dtype_code("int32"))
+    C_transposed = lib.allocate_matrix(rows, rows, dtype_code("int32"))
+    C_zorder = lib.allocate_matrix(rows, rows, dtype_code("int32"))
     
     # Generate random matrices
-    lib.generate_matrix(rows, columns, A)
-    lib.generate_matrix(rows, columns, B)
+    lib.generate_matrix(A)
+    lib.generate_matrix(B)
     
     # Fill result matrices with zeros
-    lib.fill_matrix(rows, columns, C_rows, 0)
-    lib.fill_matrix(rows, columns, C_columns, 0)
-    lib.fill_matrix(rows, columns, C_zorder, 0)
+    lib.fill_matrix(C_rows, 0)
+    lib.fill_matrix(C_columns, 0)
+    lib.fill_matrix(C_ikj, 0)
+    lib.fill_matrix(C_transposed, 0)
+    lib.fill_matrix(C_zorder, 0)
 
     # Row-major order matrix multiplication
     start = time.time()
-    lib.row_major_mul(rows, columns, A, B, C_rows)
+    lib.row_major_mul(A, B, C_rows, num_threads)
     end = time.time()
     print(f"Row-major order: {end - start:f} s")
-    C_p_rows = matrix_to_python(C_rows, rows, columns)
+    C_p_rows = matrix_to_python(C_rows)
     print_matrix(C_p_rows)
     
     # Column-major order matrix multiplication
     start = time.time()
-    lib.column_major_mul(rows, columns, A, B, C_columns)
+    lib.column_major_mul(A, B, C_columns, num_threads)
     end = time.time()
     print(f"Column-major order: {end - start:f} s")
-    C_p_columns = matrix_to_python(C_columns, rows, columns)
+    C_p_columns = matrix_to_python(C_columns)
     print_matrix(C_p_columns)
     
+    # i-k-j order matrix multiplication
+    start = time.time()
+    lib.ikj_mul(A, B, C_ikj, num_threads)
+    end = time.time()
+    print(f"i-k-j order: {end - start:f} s")
+    C_p_ikj = matrix_to_python(C_ikj)
+    print_matrix(C_p_ikj)
+    
+    # Transposed B matrix multiplication
+    start = time.time()
+    lib.transposed_mul(A, B, C_transposed, num_threads)
+    end = time.time()
+    print(f"Transposed B: {end - start:f} s")
+    C_p_transposed = matrix_to_python(C_transposed)
+    print_matrix(C_p_transposed)
+    
+    # Packed, register-blocked matrix multiplication
+    C_p_gemm = np.zeros((rows, rows), dtype=np.intc)
+    start = time.time()
+    lib.gemm_mul(A, B, matrix_from_numpy(C_p_gemm), num_threads)
+    end = time.time()
+    print(f"Packed GEMM ({lib.gemm_isa().decode()}): {end - start:f} s")
+    print_matrix(C_p_gemm.tolist())
+    
     # Z order matrix multiplication
     start = time.time()
-    lib.zorder_mul(rows, columns, A, B, C_zorder, block_size)
+    lib.zorder_mul(A, B, C_zorder, block_size, num_threads)
     end = time.time()
     print(f"Z order: {end - start:f} s")
-    C_p_zorder = matrix_to_python(C_zorder, rows, columns)
+    C_p_zorder = matrix_to_python(C_zorder)
     print_matrix(C_p_zorder)
     
+    # Morton order matrix multiplication
+    start = time.time()
+    C_p_morton = multiply(matrix_view(A), matrix_view(B), "mor", block_size, num_threads)
+    end = time.time()
+    print(f"Morton order: {end - start:f} s")
+    print_matrix(C_p_morton.tolist())
+    
+    # Strassen-Winograd matrix multiplication (block size as cutoff)
+    start = time.time()
+    C_p_strassen = multiply(matrix_view(A), matrix_view(B), "str", block_size, num_threads)
+    end = time.time()
+    print(f"Strassen-Winograd: {end - start:f} s")
+    print_matrix(C_p_strassen.tolist())
+    
     # Free matrices
-    lib.free_matrix(rows, A)
-    lib.free_matrix(rows, B)
-    lib.free_matrix(rows, C_rows)
-    lib.free_matrix(rows, C_columns)
-    lib.free_matrix(rows, C_zorder)
\ No newline at end of file
+    lib.free_matrix(A)
+    lib.free_matrix(B)
+    lib.free_matrix(C_rows)
+    lib.free_matrix(C_columns)
+    lib.free_matrix(C_ikj)
+    lib.free_matrix(C_transposed)
+    lib.free_matrix(C_zorder)
\ No newline at end of file
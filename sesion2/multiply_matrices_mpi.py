@@ -0,0 +1,174 @@
+import sys
+import time
+import numpy as np
+from mpi4py import MPI
+from multiply_matrices_hybrid_pro import lib
+from utils import matrix_from_numpy, DTYPES
+from dataclasses import dataclass
+from typing import List, Tuple
+
+# SUMMA on a 2-D grid of ranks. Every matrix is split into grid blocks:
+# rank (i, j) holds rows_i x k_j of A, k_i x columns_j of B and rows_i x
+# columns_j of C (k split by the grid columns for A and by the grid rows for B).
+# The inner dimension is walked in panels: the owner of a panel of A
+# broadcasts it along its grid row, the owner of a panel of B along its grid
+# column, and every rank adds their product to its block of C with the
+# Z-order kernel of the C library. The next panels are broadcast with
+# non-blocking collectives while the current ones are multiplied.
+
+@dataclass
+class RankTimes:
+    """Time in seconds spent by a rank in every part of a distributed multiplication."""
+    generate: float = 0.0
+    compute: float = 0.0
+    communicate: float = 0.0
+    verify: float = 0.0
+
+def bounds(size: int, parts: int, index: int) -> Tuple[int, int]:
+    """First and last (excluded) positions of part index of size split in parts
+    as evenly as possible (the first ones get the remainder)."""
+    base, extra = divmod(size, parts)
+    start = index * base + min(index, extra)
+    return start, start + base + (index < extra)
+
+def owner(size: int, parts: int, position: int) -> int:
+    """Part of size split in parts that holds a position."""
+    return next(index for index in range(parts) if position < bounds(size, parts, index)[1])
+
+def panels(size: int, grid_rows: int, grid_columns: int, block_size: int) -> List[Tuple[int, int]]:
+    """Panels of the inner dimension: at most block_size wide and never crossing
+    a boundary of the blocks of A (grid columns) or of B (grid rows)."""
+    cuts = {0, size}
+    cuts.update(bounds(size, grid_columns, index)[0] for index in range(grid_columns))
+    cuts.update(bounds(size, grid_rows, index)[0] for index in range(grid_rows))
+    cuts.update(range(0, size, block_size))
+    cuts = sorted(cuts)
+    return list(zip(cuts[:-1], cuts[1:]))
+
+def generate_block(shape: Tuple[int, int], seed: List[int], dtype: str) -> np.ndarray:
+    """Block of a random matrix with values in [0, 9], generated in its rank."""
+    return np.random.default_rng(seed).integers(0, 10, size=shape).astype(DTYPES[dtype][1])
+
+def summa(comm: MPI.Comm, matrix_size: int, block_size: int, num_threads: int = 1, seed: int = 0,
+          dtype: str = "int32", verify: bool = True) -> RankTimes:
+    """Multiply two random matrix_size x matrix_size matrices distributed over the ranks of comm.
+
+    Args:
+        comm (MPI.Comm): Communicator of the ranks, arranged in a grid with MPI.Compute_dims.
+        matrix_size (int): Size of the matrices.
+        block_size (int): Width of the panels and block size of the Z-order kernel.
+        num_threads (int): Number of OpenMP threads of the kernel in every rank.
+        seed (int): Seed of the operands (the blocks of A use seed and those of B seed + 1).
+        dtype (str): Element type of the matrices (a key of utils.DTYPES).
+        verify (bool): Check the product with a distributed Freivalds test.
+
+    Returns:
+        RankTimes: Time in seconds of every part in this rank.
+    """
+    times = RankTimes()
+    grid_rows, grid_columns = MPI.Compute_dims(comm.Get_size(), 2)
+    grid = comm.Create_cart((grid_rows, grid_columns))
+    i, j = grid.Get_coords(grid.Get_rank())
+    row_comm, column_comm = grid.Sub([False, True]), grid.Sub([True, False])
+
+    rows, columns = bounds(matrix_size, grid_rows, i), bounds(matrix_size, grid_columns, j)
+    a_inner, b_inner = bounds(matrix_size, grid_columns, j), bounds(matrix_size, grid_rows, i)
+
+    start = time.perf_counter()
+    A = generate_block((rows[1] - rows[0], a_inner[1] - a_inner[0]), [seed, i, j], dtype)
+    B = generate_block((b_inner[1] - b_inner[0], columns[1] - columns[0]), [seed + 1, i, j], dtype)
+    C = np.zeros((rows[1] - rows[0], columns[1] - columns[0]), dtype=A.dtype)
+    times.generate = time.perf_counter() - start
+
+    def post(panel: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray, List[MPI.Request]]:
+        """Start the broadcasts of the panels of A and B for panel of the inner dimension."""
+        k0, k1 = panel
+        a_owner, b_owner = owner(matrix_size, grid_columns, k0), owner(matrix_size, grid_rows, k0)
+        if a_owner == j:
+            a_panel = np.ascontiguousarray(A[:, k0 - a_inner[0]:k1 - a_inner[0]])
+        else:
+            a_panel = np.empty((A.shape[0], k1 - k0), dtype=A.dtype)
+        if b_owner == i:
+            b_panel = B[k0 - b_inner[0]:k1 - b_inner[0]]
+        else:
+            b_panel = np.empty((k1 - k0, B.shape[1]), dtype=B.dtype)
+        return a_panel, b_panel, [row_comm.Ibcast(a_panel, root=a_owner), column_comm.Ibcast(b_panel, root=b_owner)]
+
+    steps = panels(matrix_size, grid_rows, grid_columns, block_size)
+    start = time.perf_counter()
+    pending = post(steps[0])
+    times.communicate += time.perf_counter() - start
+    c_c = matrix_from_numpy(C)
+
+    for step in range(len(steps)):
+        # Wait for the current panels and start broadcasting the next ones
+        start = time.perf_counter()
+        a_panel, b_panel, requests = pending
+        MPI.Request.Waitall(requests)
+        if step + 1 < len(steps):
+            pending = post(steps[step + 1])
+        times.communicate += time.perf_counter() - start
+
+        start = time.perf_counter()
+        if C.size:
+            lib.zorder_mul(matrix_from_numpy(a_panel), matrix_from_numpy(b_panel), c_c, block_size, num_threads)
+        times.compute += time.perf_counter() - start
+
+    if verify:
+        start = time.perf_counter()
+        assert freivalds(comm, A, B, C, rows, columns, a_inner, b_inner, matrix_size, seed), \
+            "Error in distributed multiplication!"
+        times.verify = time.perf_counter() - start
+
+    for communicator in (row_comm, column_comm, grid):
+        communicator.Free()
+    return times
+
+def freivalds(comm: MPI.Comm, A: np.ndarray, B: np.ndarray, C: np.ndarray, rows: Tuple[int, int],
+              columns: Tuple[int, int], a_inner: Tuple[int, int], b_inner: Tuple[int, int],
+              matrix_size: int, seed: int, trials: int = 16) -> bool:
+    """Distributed Freivalds test of C = A * B: compares A (B R) with C R for a
+    random 0/1 matrix R of trials columns, generated with the same seed in
+    every rank. Every rank adds the products of its blocks to vectors of the
+    full size that are summed over the ranks, so no block is moved."""
+    exact = np.issubdtype(C.dtype, np.integer)
+    accumulator = np.int64 if exact else np.float64
+    r = np.random.default_rng([seed, matrix_size]).integers(0, 2, size=(matrix_size, trials)).astype(accumulator)
+
+    br = np.zeros((matrix_size, trials), dtype=accumulator)
+    br[b_inner[0]:b_inner[1]] = B.astype(accumulator) @ r[columns[0]:columns[1]]
+    comm.Allreduce(MPI.IN_PLACE, br)
+
+    products = np.zeros((2, matrix_size, trials), dtype=accumulator)
+    products[0, rows[0]:rows[1]] = A.astype(accumulator) @ br[a_inner[0]:a_inner[1]]
+    products[1, rows[0]:rows[1]] = C.astype(accumulator) @ r[columns[0]:columns[1]]
+    comm.Allreduce(MPI.IN_PLACE, products)
+
+    return bool(np.array_equal(products[0], products[1]) if exact else np.allclose(products[0], products[1]))
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4, 5):
+        print("Usage: mpirun -np <ranks> python multiply_matrices_mpi.py <matrix_size> <block_size> [num_threads] [dtype]")
+        sys.exit(1)
+
+    matrix_size = int(sys.argv[1])
+    block_size = int(sys.argv[2])
+    num_threads = int(sys.argv[3]) if len(sys.argv) >= 4 else 1
+    dtype = sys.argv[4] if len(sys.argv) == 5 else "int32"
+
+    comm = MPI.COMM_WORLD
+    comm.Barrier()
+    start = time.perf_counter()
+    times = summa(comm, matrix_size, block_size, num_threads, dtype=dtype)
+    comm.Barrier()
+    total = time.perf_counter() - start
+
+    # Times of every rank, printed by rank 0
+    grid_rows, grid_columns = MPI.Compute_dims(comm.Get_size(), 2)
+    all_times = comm.gather(times, root=0)
+    if comm.Get_rank() == 0:
+        print(f"Grid: {grid_rows} x {grid_columns}")
+        print("Rank;Generate(s);Compute(s);Communication(s);Verify(s)")
+        for rank, rank_times in enumerate(all_times):
+            print(f"{rank};{rank_times.generate:f};{rank_times.compute:f};{rank_times.communicate:f};{rank_times.verify:f}")
+        print(f"SUMMA: {total:f} s")
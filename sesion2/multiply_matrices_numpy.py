@@ -0,0 +1,145 @@
+import sys
+import time
+import numpy as np
+from utils import verify_multiplication, print_matrix, StageTimes, timed, operand_cache, DTYPES
+from typing import Tuple
+
+# Integers up to this magnitude are exactly representable in float64
+FLOAT64_EXACT = 2 ** 53
+
+def generate_matrix(rows: int, cols: int) -> np.ndarray:
+    """Create an array in Python as a NumPy array of C ints.
+
+    Args:
+        rows (int): Number of rows of the matrix
+        cols (int): Number of columns of the matrix
+
+    Returns:
+        np.ndarray: Random generated matrix
+    """
+    return np.random.randint(0, 10, size=(rows, cols), dtype=np.intc)
+
+def blas_operands(a: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Operands of a product in a dtype that NumPy multiplies with BLAS.
+    NumPy does not use BLAS for integers, so integer matrices are converted to
+    float64 when every result is exactly representable (below 2^53); products
+    of the converted operands are then cast back without rounding errors."""
+    if np.issubdtype(a.dtype, np.floating) and np.issubdtype(b.dtype, np.floating):
+        return a, b
+
+    bound = float(np.abs(a).max(initial=0)) * float(np.abs(b).max(initial=0)) * a.shape[1]
+    if bound >= FLOAT64_EXACT:
+        return a, b
+    return a.astype(np.float64), b.astype(np.float64)
+
+def row_band_mul(a: np.ndarray, b: np.ndarray, c: np.ndarray, block_size: int) -> None:
+    """Multiplication of matrices in bands of block_size rows of A and C.
+    Every band is a single vectorized product against the whole B."""
+    if block_size < 1:
+        raise ValueError("Block size must be positive.")
+
+    a, b = blas_operands(a, b)
+    for i in range(0, a.shape[0], block_size):
+        c[i:i + block_size] += (a[i:i + block_size] @ b).astype(c.dtype)
+
+def tiled_mul(a: np.ndarray, b: np.ndarray, c: np.ndarray, block_size: int) -> None:
+    """Multiplication of matrices in Z order with vectorized products of tiles.
+    The block size does not need to divide the dimensions: edge tiles are smaller."""
+    rows, inner = a.shape
+    columns = b.shape[1]
+
+    if block_size < 1:
+        raise ValueError("Block size must be positive.")
+
+    a, b = blas_operands(a, b)
+    for i in range(0, rows, block_size):
+        for j in range(0, columns, block_size):
+            c_tile = np.zeros_like(c[i:i + block_size, j:j + block_size], dtype=a.dtype)
+            for k in range(0, inner, block_size):
+                c_tile += a[i:i + block_size, k:k + block_size] @ b[k:k + block_size, j:j + block_size]
+            c[i:i + block_size, j:j + block_size] += c_tile.astype(c.dtype)
+
+def blas_mul(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> None:
+    """Multiplication of matrices with a single BLAS call (dgemm or sgemm)."""
+    a, b = blas_operands(a, b)
+    c += (a @ b).astype(c.dtype)
+
+# Non-blocked algorithms by the name used in the benchmark output
+algorithms = {
+    "npb": blas_mul
+}
+
+# Blocked algorithms by the name used in the benchmark output
+blocked_algorithms = {
+    "npr": row_band_mul,
+    "npt": tiled_mul
+}
+
+def run_phase_4(matrix_size: int, algorithm: str, block_size: int = 0, seed: int = 0, dtype: str = "int32") -> StageTimes:
+    """Run phase 4 of the experiment with validation.
+    This function measures the time of every stage of a matrix multiplication
+    with vectorized NumPy operations, the baseline of the hand-written kernels.
+
+    Args:
+        matrix_size (int): Size of the matrix.
+        algorithm (str): Algorithm to use for multiplication ('npb', 'npr' or 'npt').
+        block_size (int): Band height for 'npr' or tile size for 'npt'.
+        seed (int): Seed of the operands, shared through utils.operand_cache.
+        dtype (str): Element type of the matrices (a key of utils.DTYPES).
+
+    Returns:
+        StageTimes: Time in seconds of every stage.
+    """
+    times = StageTimes()
+
+    with timed(times, "generate"):
+        A, B = operand_cache.get(matrix_size, seed, DTYPES[dtype][1])
+
+    with timed(times, "allocate"):
+        C = np.zeros((matrix_size, matrix_size), dtype=A.dtype)
+
+    with timed(times, "compute"):
+        if algorithm in blocked_algorithms:
+            blocked_algorithms[algorithm](A, B, C, block_size)
+        else:
+            algorithms[algorithm](A, B, C)
+
+    with timed(times, "verify"):
+        assert verify_multiplication(A, B, C), f"Error in {algorithm} multiplication!"
+
+    return times
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        print("Usage: python multiply_matrices_numpy.py <rows> <columns> <block_size>")
+        sys.exit(1)
+
+    # Get matrices size
+    rows = int(sys.argv[1])
+    columns = int(sys.argv[2])
+    block_size = int(sys.argv[3])
+
+    # Generate random matrices (A is rows x columns and B is columns x rows)
+    A = generate_matrix(rows, columns)
+    B = generate_matrix(columns, rows)
+
+    # Single BLAS call
+    C_blas = np.zeros((rows, rows), dtype=np.intc)
+    start = time.time()
+    blas_mul(A, B, C_blas)
+    print(f"BLAS: {time.time() - start:.6f} seconds")
+    print_matrix(C_blas.tolist())
+
+    # Bands of rows
+    C_bands = np.zeros((rows, rows), dtype=np.intc)
+    start = time.time()
+    row_band_mul(A, B, C_bands, block_size)
+    print(f"Row bands: {time.time() - start:.6f} seconds")
+    print_matrix(C_bands.tolist())
+
+    # Tiles in Z order
+    C_tiles = np.zeros((rows, rows), dtype=np.intc)
+    start = time.time()
+    tiled_mul(A, B, C_tiles, block_size)
+    print(f"Tiles: {time.time() - start:.6f} seconds")
+    print_matrix(C_tiles.tolist())
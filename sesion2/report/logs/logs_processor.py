@@ -0,0 +1,250 @@
+import argparse
+import locale
+import os
+import numpy as np
+from numpy.lib import recfunctions
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# Record of a measurement read from a log
+RECORD = np.dtype([
+    ("phase", "U8"),
+    ("algorithm", "U8"),
+    ("size", "i4"),
+    ("block", "U24"),
+    ("threads", "i4"),
+    ("dtype", "U8"),
+    ("time", "f8"),
+])
+
+# Fields that identify a configuration
+KEY_FIELDS = ["phase", "algorithm", "size", "block", "threads", "dtype"]
+
+# Running statistics of the times of every configuration, merged chunk by chunk
+RUNNING = np.dtype([(name, RECORD[name]) for name in KEY_FIELDS] + [
+    ("count", "i8"),
+    ("mean", "f8"),
+    ("m2", "f8"),      # Sum of the squared deviations from the mean
+    ("minimum", "f8"),
+])
+
+# Statistics of the times of every configuration, over all the logs
+STATS = np.dtype([(name, RECORD[name]) for name in KEY_FIELDS] + [
+    ("count", "i4"),
+    ("mean", "f8"),
+    ("minimum", "f8"),
+    ("stddev", "f8"),
+    ("speedup", "f8"),
+])
+
+# Best block size of every blocked algorithm, matrix size and number of threads
+BEST = np.dtype([(name, RECORD[name]) for name in KEY_FIELDS] + [("mean", "f8")])
+
+# Columns of the phase 1 logs of sesion2, one per algorithm (row-major and
+# column-major times are repeated for every block size)
+WIDE_COLUMNS = {"Row-major order (s)": "row", "Column-major order (s)": "col", "Z order (s)": "zor"}
+
+# Records converted to NumPy and merged into the running statistics at a time
+CHUNK_ROWS = 65536
+
+def read_log(path: str, phase: str = "-") -> Iterator[tuple]:
+    """Read the measurements of a benchmark log line by line.
+    Every header found in the log applies to the lines that follow it, so
+    logs of several phases, sessions or merged shards can be read; lines that
+    do not match the header (summaries, blank lines) are skipped. Logs
+    without a Phase column (sesion1) get phase."""
+    columns: Optional[Dict[str, int]] = None
+    seen = set()
+    with open(path) as file:
+        for line in file:
+            fields = line.rstrip("\n").split(";")
+            if fields[0] == "Matrix size":
+                columns = {name: index for index, name in enumerate(fields)}
+                continue
+            if columns is None or len(fields) != len(columns) or not fields[0].isdigit():
+                continue
+
+            size = int(fields[0])
+            block = fields[columns["Block size"]] if "Block size" in columns else "-"
+            row_phase = fields[columns["Phase"]] if "Phase" in columns else phase
+            threads = int(fields[columns["Threads"]]) if "Threads" in columns else 1
+            dtype = fields[columns["Dtype"]] if "Dtype" in columns else "-"
+
+            if "Algorithm" in columns:
+                if fields[columns["Time(s)"]]:
+                    yield (row_phase, fields[columns["Algorithm"]], size, block, threads, dtype,
+                           float(fields[columns["Time(s)"]]))
+                continue
+
+            for column, algorithm in WIDE_COLUMNS.items():
+                if column not in columns or not fields[columns[column]]:
+                    continue
+                if algorithm == "zor":
+                    yield (row_phase, algorithm, size, block, threads, dtype, float(fields[columns[column]]))
+                elif (row_phase, algorithm, size) not in seen:
+                    seen.add((row_phase, algorithm, size))
+                    yield (row_phase, algorithm, size, "-", threads, dtype, float(fields[columns[column]]))
+
+def combine(partial: np.ndarray) -> np.ndarray:
+    """Merge the rows of RUNNING of the same configuration, grouped with
+    np.unique (pairwise update of the mean and squared deviations of Chan et al.)."""
+    groups, inverse = np.unique(recfunctions.repack_fields(partial[KEY_FIELDS]), return_inverse=True)
+    inverse = inverse.ravel()
+    counts = np.bincount(inverse, weights=partial["count"], minlength=len(groups))
+    means = np.bincount(inverse, weights=partial["count"] * partial["mean"], minlength=len(groups)) / counts
+    deviations = partial["m2"] + partial["count"] * (partial["mean"] - means[inverse]) ** 2
+
+    merged = np.zeros(len(groups), dtype=RUNNING)
+    for name in KEY_FIELDS:
+        merged[name] = groups[name]
+    merged["count"] = counts
+    merged["mean"] = means
+    merged["m2"] = np.bincount(inverse, weights=deviations, minlength=len(groups))
+    merged["minimum"] = np.inf
+    np.minimum.at(merged["minimum"], inverse, partial["minimum"])
+    return merged
+
+def summarize(records: np.ndarray) -> np.ndarray:
+    """Running statistics of the configurations of an array of RECORD."""
+    partial = np.zeros(len(records), dtype=RUNNING)
+    for name in KEY_FIELDS:
+        partial[name] = records[name]
+    partial["count"] = 1
+    partial["mean"] = partial["minimum"] = records["time"]
+    return combine(partial)
+
+def load(paths: Iterable[str], phase: str = "-") -> np.ndarray:
+    """Read the measurements of every log into the RUNNING statistics of every
+    configuration. Measurements are converted and merged in chunks of
+    CHUNK_ROWS, so memory grows with the configurations, not the measurements."""
+    totals = np.zeros(0, dtype=RUNNING)
+    pending = []
+    for path in paths:
+        for record in read_log(path, phase):
+            pending.append(record)
+            if len(pending) == CHUNK_ROWS:
+                totals = combine(np.concatenate((totals, summarize(np.array(pending, dtype=RECORD)))))
+                pending = []
+    return combine(np.concatenate((totals, summarize(np.array(pending, dtype=RECORD)))))
+
+def block_order(blocks: np.ndarray) -> np.ndarray:
+    """Numeric sort key of the block sizes ('-' and multi-level tiles first)."""
+    return np.array([int(block) if block.isdigit() else -1 for block in blocks])
+
+def aggregate(totals: np.ndarray, baseline: str = "1") -> np.ndarray:
+    """Statistics of the times of every configuration from their RUNNING
+    statistics (no median: it would need every time in memory).
+    The speedup of a configuration is the mean time of the same algorithm,
+    matrix size, block size and element type in the baseline phase (with its
+    fewest threads; any element type if the baseline has none, as phase 1)
+    divided by its own mean time (NaN without a baseline)."""
+    stats = np.zeros(len(totals), dtype=STATS)
+    for name in KEY_FIELDS:
+        stats[name] = totals[name]
+    stats["count"] = totals["count"]
+    stats["mean"] = totals["mean"]
+    stats["minimum"] = totals["minimum"]
+    stats["stddev"] = np.sqrt(totals["m2"] / np.maximum(totals["count"] - 1, 1))
+
+    stats = stats[np.lexsort((stats["threads"], block_order(stats["block"]), stats["size"],
+                              stats["algorithm"], stats["dtype"], stats["phase"]))]
+
+    # Baseline times, from the fewest threads first (stats is sorted by threads last)
+    reference = {}
+    for row in stats[stats["phase"] == baseline]:
+        reference.setdefault((row["algorithm"], row["size"], row["block"], row["dtype"]), row["mean"])
+    stats["speedup"] = [reference.get((row["algorithm"], row["size"], row["block"], row["dtype"]),
+                                      reference.get((row["algorithm"], row["size"], row["block"], "-"), np.nan)) / row["mean"]
+                        for row in stats]
+    return stats
+
+def best_blocks(stats: np.ndarray) -> np.ndarray:
+    """Block size with the lowest mean time of every phase, blocked algorithm,
+    matrix size, number of threads and element type."""
+    blocked = stats[np.char.isdigit(stats["block"])]
+    fields = ["phase", "algorithm", "size", "threads", "dtype"]
+    _, inverse = np.unique(recfunctions.repack_fields(blocked[fields]), return_inverse=True)
+    inverse = inverse.ravel()
+    order = np.lexsort((blocked["mean"], inverse))
+    first = np.concatenate(([True], inverse[order][1:] != inverse[order][:-1]))
+
+    best = np.zeros(np.count_nonzero(first), dtype=BEST)
+    for name in BEST.names:
+        best[name] = blocked[order[first]][name]
+    return best[np.lexsort((best["threads"], best["size"], best["algorithm"], best["dtype"], best["phase"]))]
+
+def format_value(value, decimal: str) -> str:
+    """Format a field for the CSV of the report: integers as they are, times
+    with six decimals and the decimal separator of the locale or decimal."""
+    if isinstance(value, (float, np.floating)):
+        if decimal is None:
+            return locale.format_string("%f", value)
+        return f"{value:f}".replace(".", decimal)
+    return str(value)
+
+def write_csv(path: str, table: np.ndarray, decimal: Optional[str] = ",") -> None:
+    """Write a table as a semicolon-separated CSV. decimal None uses the
+    separator of the current LC_NUMERIC locale."""
+    with open(path, "w") as file:
+        file.write(";".join(table.dtype.names) + "\n")
+        for row in table:
+            file.write(";".join(format_value(value, decimal) for value in row.tolist()) + "\n")
+
+def write_columnar(path: str, tables: Dict[str, np.ndarray]) -> List[str]:
+    """Write the tables in a columnar format chosen by the extension of path:
+    a single compressed .npz with a '<table>_<column>' array per column, or a
+    .parquet file per table (requires pyarrow).
+
+    Returns:
+        List[str]: Paths of the written files.
+    """
+    stem, extension = os.path.splitext(path)
+    if extension == ".npz":
+        np.savez_compressed(path, **{f"{name}_{column}": table[column]
+                                     for name, table in tables.items() for column in table.dtype.names})
+        return [path]
+    if extension == ".parquet":
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Writing Parquet requires pyarrow; use an .npz output instead.")
+        paths = []
+        for name, table in tables.items():
+            paths.append(f"{stem}_{name}.parquet")
+            pyarrow.parquet.write_table(
+                pyarrow.table({column: table[column] for column in table.dtype.names}), paths[-1])
+        return paths
+    raise ValueError(f"Unknown columnar format: {extension} (use .npz or .parquet).")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregate benchmark logs into statistics for the report.")
+    parser.add_argument("logs", nargs="+", help="Benchmark logs (any session, phase or shard)")
+    parser.add_argument("--phase", default="-",
+                        help="Phase of the logs without a Phase column, e.g. those of sesion1 (default: %(default)s)")
+    parser.add_argument("--baseline", default="1",
+                        help="Phase the speedups are relative to (default: %(default)s)")
+    parser.add_argument("--output", default="stats.npz",
+                        help="Columnar output, .npz or .parquet (default: %(default)s)")
+    parser.add_argument("--csv-dir", default=".",
+                        help="Directory of the CSV files for the report (default: current directory)")
+    parser.add_argument("--decimal", default=",",
+                        help="Decimal separator of the CSV files (default: %(default)s)")
+    parser.add_argument("--locale",
+                        help="Format the numbers of the CSV files with this locale instead, e.g. es_ES.UTF-8")
+    args = parser.parse_args()
+
+    if args.locale:
+        locale.setlocale(locale.LC_NUMERIC, args.locale)
+
+    totals = load(args.logs, args.phase)
+    stats = aggregate(totals, args.baseline)
+    best = best_blocks(stats)
+
+    decimal = None if args.locale else args.decimal
+    os.makedirs(args.csv_dir, exist_ok=True)
+    write_csv(os.path.join(args.csv_dir, "stats.csv"), stats, decimal)
+    write_csv(os.path.join(args.csv_dir, "best_blocks.csv"), best, decimal)
+    outputs = write_columnar(args.output, {"stats": stats, "best": best})
+
+    print(f"{totals['count'].sum()} measurements of {len(stats)} configurations read from {len(args.logs)} logs.")
+    print(f"Written: {', '.join(outputs + [os.path.join(args.csv_dir, name) for name in ('stats.csv', 'best_blocks.csv')])}")
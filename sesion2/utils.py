@@ -1,33 +1,267 @@
 import ctypes
-import numpy as np 
-from typing import List
+import itertools
+import time
+import numpy as np
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field, fields
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+MatrixLike = Union[List[List[int]], np.ndarray]
+
+# Status codes returned by the multiplication functions of liboperations
+MUL_OK = 0
+MUL_ERROR_DIMENSIONS = 1
+MUL_ERROR_BLOCK_SIZE = 2
+MUL_ERROR_MEMORY = 3
+MUL_ERROR_FILE = 4
+MUL_ERROR_DTYPE = 5
+
+# Element types of liboperations: name -> (MATRIX_DTYPE_* code, NumPy type, ctypes type)
+DTYPES = {
+    "int32": (0, np.int32, ctypes.c_int32),
+    "int64": (1, np.int64, ctypes.c_int64),
+    "float32": (2, np.float32, ctypes.c_float),
+    "float64": (3, np.float64, ctypes.c_double),
+}
+
+class Matrix(ctypes.Structure):
+    """Contiguous row-major matrix shared with liboperations (mirrors its Matrix struct)."""
+    _fields_ = [
+        ("rows", ctypes.c_int),
+        ("columns", ctypes.c_int),
+        ("stride", ctypes.c_int),
+        ("dtype", ctypes.c_int),
+        ("data", ctypes.c_void_p),
+    ]
+
+class PerfCounters(ctypes.Structure):
+    """Hardware counters read by liboperations around a kernel (mirrors its PerfCounters struct)."""
+    _fields_ = [
+        ("available", ctypes.c_int),
+        ("cycles", ctypes.c_longlong),
+        ("instructions", ctypes.c_longlong),
+        ("l1d_misses", ctypes.c_longlong),
+        ("llc_misses", ctypes.c_longlong),
+        ("dtlb_misses", ctypes.c_longlong),
+    ]
+
+# Names of the hardware counters of PerfCounters
+COUNTERS = ("cycles", "instructions", "l1d_misses", "llc_misses", "dtlb_misses")
+
+def check_status(status: int, function: Callable, arguments: Tuple) -> int:
+    """ctypes errcheck hook turning the status codes of liboperations into exceptions."""
+    if status == MUL_ERROR_DIMENSIONS:
+        raise ValueError(f"{function.__name__}: incompatible matrix dimensions.")
+    if status == MUL_ERROR_BLOCK_SIZE:
+        raise ValueError(f"{function.__name__}: invalid block size.")
+    if status == MUL_ERROR_MEMORY:
+        raise MemoryError(f"{function.__name__}: out of memory.")
+    if status == MUL_ERROR_FILE:
+        raise OSError(f"{function.__name__}: matrix file missing, unreadable or malformed.")
+    if status == MUL_ERROR_DTYPE:
+        raise TypeError(f"{function.__name__}: unknown or mismatched element types.")
+    return status
+
+def check_morton(buffer: Optional[int], function: Callable, arguments: Tuple) -> int:
+    """ctypes errcheck hook of allocate_morton, which returns NULL for a tile
+    size below 1 (the block size of the Z-order layout) or without memory."""
+    if not buffer:
+        if arguments[1] < 1:
+            raise ValueError(f"{function.__name__}: invalid block size.")
+        raise MemoryError(f"{function.__name__}: out of memory.")
+    return buffer
+
+def dtype_code(dtype: Any) -> int:
+    """MATRIX_DTYPE_* code of liboperations for a dtype name or NumPy dtype."""
+    for code, np_dtype, _ in DTYPES.values():
+        if np.dtype(dtype) == np_dtype:
+            return code
+    raise TypeError(f"Unsupported element type: {dtype}")
+
+def check_overflow(a: np.ndarray, b: np.ndarray) -> None:
+    """Raise OverflowError if the product of two integer matrices may not fit in their type.
+    The kernels accumulate in the element type, so int32 products silently wrap around."""
+    if not np.issubdtype(a.dtype, np.integer) or a.size == 0 or b.size == 0:
+        return
+    bound = int(np.abs(a).max()) * int(np.abs(b).max()) * a.shape[1]
+    if bound > np.iinfo(a.dtype).max:
+        raise OverflowError(f"The product of these {a.dtype} matrices may overflow; use a wider dtype.")
+
+def elapsed(start: int) -> float:
+    """Seconds elapsed since a reading of the monotonic clock time.perf_counter_ns()."""
+    return (time.perf_counter_ns() - start) / 1e9
+
+@dataclass
+class StageTimes:
+    """Time in seconds spent in every stage of a run_phase_* function.
+    Stages a phase does not have (e.g. freeing memory managed by Python) stay at 0.
+    counters holds the hardware counters of the compute stage when they could be read."""
+    generate: float = 0.0
+    allocate: float = 0.0
+    marshal_in: float = 0.0
+    compute: float = 0.0
+    marshal_out: float = 0.0
+    verify: float = 0.0
+    free: float = 0.0
+    counters: Dict[str, int] = field(default_factory=dict)
+
+# Names of the stages in the order they are run
+STAGES = tuple(stage.name for stage in fields(StageTimes) if stage.name != "counters")
+
+@contextmanager
+def timed(times: StageTimes, stage: str) -> Iterator[None]:
+    """Add the time spent in the body of a with statement to a stage."""
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        setattr(times, stage, getattr(times, stage) + elapsed(start))
+
+@contextmanager
+def counted(lib: Any, times: StageTimes) -> Iterator[None]:
+    """Time the body of a with statement as the compute stage and read the
+    hardware counters of liboperations around it (left empty if unavailable)."""
+    counters = PerfCounters()
+    lib.perf_begin()
+    with timed(times, "compute"):
+        yield
+    lib.perf_end(ctypes.byref(counters))
+    if counters.available:
+        times.counters = {name: getattr(counters, name) for name in COUNTERS if getattr(counters, name) >= 0}
+
+class OperandCache:
+    """Seeded operands of the multiplications, generated once and reused.
+    A and B are generated with NumPy for every (size, seed, dtype) and shared by
+    every algorithm, block size and iteration. They are read-only so a kernel
+    cannot alter the operands of the next one. The least recently used entries
+    are evicted when the cached arrays exceed max_bytes."""
+
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[Tuple[int, int, str], Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        self.nbytes = 0
+
+    def get(self, size: int, seed: int = 0, dtype: Any = np.intc) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the operands A and B of size x size with values in [0, 9]."""
+        key = (size, seed, np.dtype(dtype).str)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        rng = np.random.default_rng(seed)
+        operands = tuple(rng.integers(0, 10, size=(size, size)).astype(dtype) for _ in range(2))
+        for operand in operands:
+            operand.flags.writeable = False
+
+        self.entries[key] = operands
+        self.nbytes += sum(operand.nbytes for operand in operands)
+        while self.nbytes > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.nbytes -= sum(operand.nbytes for operand in evicted)
+        return operands
+
+# Operands shared by the run_phase_* functions of every phase
+operand_cache = OperandCache()
 
 def print_matrix(matrix: List[List[int]]) -> None:
     """Prints a matrix."""
     if len(matrix) > 10:
         print("Matrix too large to print\n")
         return
-    
+
     for row in matrix:
         print(row)
     print()
-    
-def matrix_to_c(matrix: List[List[int]]) -> ctypes.POINTER:
-    """Convert a list of Python lists to an array of pointers in C."""
-    row_pointers = (ctypes.POINTER(ctypes.c_int) * len(matrix))()
-    for i, row in enumerate(matrix):
-        row_pointers[i] = (ctypes.c_int * len(row))(*row)
-    return row_pointers
-
-def matrix_to_python(matrix_c: List[List[int]], rows: int, columns: int) -> List[List[int]]:
+
+def matrix_to_c(matrix: List[List[int]], dtype: str = "int32") -> Matrix:
+    """Convert a list of Python lists to a contiguous row-major matrix in C of the given element type."""
+    code, _, c_type = DTYPES[dtype]
+    rows = len(matrix)
+    columns = len(matrix[0]) if rows else 0
+    buffer = (c_type * (rows * columns))(*itertools.chain.from_iterable(matrix))
+    matrix_c = Matrix(rows, columns, columns, code, ctypes.cast(buffer, ctypes.c_void_p))
+    matrix_c._buffer = buffer # Keep the buffer alive as long as the matrix
+    return matrix_c
+
+def matrix_from_numpy(array: np.ndarray) -> Matrix:
+    """Wrap a 2-D ndarray of one of the DTYPES as a matrix in C sharing its buffer (no copies)."""
+    if array.ndim != 2 or array.strides[1] != array.itemsize:
+        raise ValueError("Array must be 2-D and with contiguous rows.")
+    matrix_c = Matrix(array.shape[0], array.shape[1], array.strides[0] // array.itemsize,
+                      dtype_code(array.dtype), array.ctypes.data_as(ctypes.c_void_p))
+    matrix_c._buffer = array # Keep the array alive as long as the matrix
+    return matrix_c
+
+def matrix_view(matrix_c: Union[Matrix, "ctypes._Pointer"]) -> np.ndarray:
+    """Return a NumPy view over the buffer of a C matrix (no copies)."""
+    if isinstance(matrix_c, ctypes._Pointer):
+        matrix_c = matrix_c.contents
+    rows, columns, stride = matrix_c.rows, matrix_c.columns, matrix_c.stride
+    c_type = next(c_type for code, _, c_type in DTYPES.values() if code == matrix_c.dtype)
+    data = ctypes.cast(matrix_c.data, ctypes.POINTER(c_type))
+    buffer = np.ctypeslib.as_array(data, shape=((rows - 1) * stride + columns,))
+    return np.lib.stride_tricks.as_strided(buffer, shape=(rows, columns),
+                                           strides=(stride * buffer.itemsize, buffer.itemsize))
+
+def matrix_to_python(matrix_c: Union[Matrix, "ctypes._Pointer"]) -> List[List[int]]:
     """Convert a matrix in C format to a list of Python lists."""
-    matrix = [[0] * columns for _ in range(rows)]
-    for i in range(rows):
-        for j in range(columns):
-            matrix[i][j] = matrix_c[i][j]
-    return matrix
-
-def verify_multiplication(a: List[List[int]], b: List[List[int]], c: List[List[int]]) -> bool:
-    """"Verify the result of a matrix multiplication using numpy."""
-    c_expected = np.dot(np.array(a), np.array(b))
-    return np.array_equal(np.array(c), c_expected)
\ No newline at end of file
+    return matrix_view(matrix_c).tolist()
+
+@dataclass
+class VerificationPolicy:
+    """How verify_multiplication checks products.
+    method is 'freivalds' (probabilistic, O(n^2) per trial) or 'exact' (full product).
+    With first_only, only the first product after every call to new_configuration
+    is checked, e.g. the first run of every algorithm and block size."""
+    method: str = "freivalds"
+    trials: int = 16
+    first_only: bool = False
+    pending: bool = True
+
+    def new_configuration(self) -> None:
+        """Check the next product again when first_only is set."""
+        self.pending = True
+
+# Policy used by verify_multiplication (set from the benchmark command line)
+verification = VerificationPolicy()
+
+def as_array(matrix: Union[MatrixLike, Matrix, "ctypes._Pointer"]) -> np.ndarray:
+    """View a matrix of any of the supported formats as a NumPy array (no copies but for lists)."""
+    if isinstance(matrix, (Matrix, ctypes._Pointer)):
+        return matrix_view(matrix)
+    return np.asarray(matrix)
+
+def freivalds(a: MatrixLike, b: MatrixLike, c: MatrixLike, trials: int = 16) -> bool:
+    """Check that c is the product of a and b with Freivalds' algorithm.
+    Every trial compares a (b r) with c r for a random vector r of zeros and ones,
+    which costs O(n^2) instead of the O(n^3) of the product. A wrong product
+    passes all the trials with probability at most 2^-trials. The trials are
+    run together as a matrix of random columns and in 64-bit integers, so the
+    products of int matrices cannot overflow."""
+    a, b, c = as_array(a), as_array(b), as_array(c)
+    if a.ndim != 2 or b.ndim != 2 or c.shape != (a.shape[0], b.shape[1]) or a.shape[1] != b.shape[0]:
+        return False
+
+    dtype = np.int64 if np.issubdtype(c.dtype, np.integer) else np.float64
+    r = np.random.default_rng().integers(0, 2, size=(b.shape[1], trials)).astype(dtype)
+    expected = a.astype(dtype, copy=False) @ (b.astype(dtype, copy=False) @ r)
+    actual = c.astype(dtype, copy=False) @ r
+    if dtype is np.int64:
+        return np.array_equal(actual, expected)
+    return np.allclose(actual, expected)
+
+def verify_multiplication(a: MatrixLike, b: MatrixLike, c: MatrixLike) -> bool:
+    """"Verify the result of a matrix multiplication following the verification policy.
+    NumPy arrays (e.g. views from matrix_view) and C matrices are used as they are,
+    without copies. Products skipped by the policy count as verified."""
+    if verification.first_only and not verification.pending:
+        return True
+    verification.pending = False
+
+    if verification.method == "exact":
+        a, b, c = as_array(a), as_array(b), as_array(c)
+        if np.issubdtype(c.dtype, np.integer):
+            return np.array_equal(c, np.dot(a, b))
+        return np.allclose(c, np.dot(a.astype(np.float64), b.astype(np.float64)))
+    return freivalds(a, b, c, verification.trials)